@@ -0,0 +1,236 @@
+import gzip
+import json
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+from datetime import datetime, timezone
+
+
+FSYNC_POLICIES = ('never', 'interval', 'always')
+
+# Что попадает в архив по умолчанию: сообщения и события модерации
+DEFAULT_COMMANDS = ('PRIVMSG', 'USERNOTICE', 'CLEARCHAT', 'CLEARMSG', 'NOTICE')
+
+# Имя сегмента: 2024-05-01.0003.jsonl (или .jsonl.gz после сжатия)
+SEGMENT_RE = re.compile(r'^(\d{4}-\d{2}-\d{2})\.(\d{4})\.jsonl(\.gz)?$')
+
+
+def segment_day(timestamp):
+    """День сегмента (по UTC, чтобы переход на летнее время не ломал порядок)"""
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime('%Y-%m-%d')
+
+
+def message_record(msg, timestamp):
+    """Компактная запись архива для разобранного сообщения IRC"""
+    record = {'ts': round(timestamp, 3), 'cmd': msg.command}
+    if msg.source:
+        record['user'] = msg.nick
+    display_name = msg.tag('display-name')
+    if display_name and display_name.lower() != msg.nick.lower():
+        record['name'] = display_name
+    if len(msg.params) > 1:
+        record['text'] = msg.params[-1]
+    for tag, key in (('id', 'id'), ('user-id', 'uid'), ('target-user-id', 'target')):
+        value = msg.tag(tag)
+        if value:
+            record[key] = value
+    return record
+
+
+class ChatArchive:
+    """Фоновая запись сообщений чата в сегменты JSON Lines
+
+    Каждый канал пишется в свой каталог, файлы делятся по дням (UTC) и по
+    размеру max_segment_bytes. Закрытые сегменты сжимаются gzip. append()
+    только кладет сообщение в очередь и не блокирует поток чтения; запись,
+    сериализация и сжатие выполняются в отдельном потоке.
+
+    fsync: "never" - только flush, "interval" - не чаще раза в
+    fsync_interval секунд, "always" - после каждой пачки записей.
+    """
+
+    def __init__(self, directory, fsync='interval', fsync_interval=1.0, compress=True,
+                 max_segment_bytes=64 * 1024 * 1024, max_queue=100000, on_error=None):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Неизвестный режим fsync: {fsync}")
+        self.directory = directory
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.compress = compress
+        self.max_segment_bytes = max_segment_bytes
+        self.on_error = on_error
+
+        self._queue = queue.Queue(max_queue)
+        self._segments = {}
+        self._thread = None
+        self._last_fsync = 0.0
+
+        self.written = 0
+        self.dropped = 0
+        self.bytes_written = 0
+        self.segments_closed = 0
+
+    # --- Поток чтения ---
+
+    def append(self, channel, msg, timestamp=None):
+        """Поставить сообщение в очередь на запись (из любого потока)"""
+        try:
+            self._queue.put_nowait((timestamp or time.time(), channel, msg))
+        except queue.Full:
+            self.dropped += 1
+
+    def start(self):
+        if self._thread is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._thread = threading.Thread(target=self._run, name='chat-archive', daemon=True)
+            self._thread.start()
+
+    def close(self, timeout=10):
+        """Запись оставшихся сообщений и закрытие сегментов"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self):
+        return {
+            'queued': self._queue.qsize(),
+            'written': self.written,
+            'dropped': self.dropped,
+            'bytes': self.bytes_written,
+            'segments_closed': self.segments_closed,
+        }
+
+    # --- Поток записи ---
+
+    def _run(self):
+        self._compress_leftovers()
+        running = True
+        while running:
+            try:
+                item = self._queue.get(timeout=self.fsync_interval)
+            except queue.Empty:
+                self._maybe_fsync(force=False)
+                continue
+
+            # Забираем все, что накопилось, и пишем одной пачкой
+            batch = [item]
+            while len(batch) < 5000:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            if None in batch:
+                running = False
+                batch = [entry for entry in batch if entry is not None]
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                self._report(e)
+
+        for channel in list(self._segments):
+            self._close_segment(channel, final=False)
+
+    def _write_batch(self, batch):
+        touched = set()
+        for timestamp, channel, msg in batch:
+            segment = self._segment_for(channel, timestamp)
+            line = json.dumps(message_record(msg, timestamp), ensure_ascii=False, separators=(',', ':')) + '\n'
+            data = line.encode('utf-8')
+            segment['file'].write(data)
+            segment['size'] += len(data)
+            self.bytes_written += len(data)
+            self.written += 1
+            touched.add(channel)
+
+        for channel in touched:
+            self._segments[channel]['file'].flush()
+        self._maybe_fsync(force=self.fsync == 'always')
+
+    def _maybe_fsync(self, force):
+        if self.fsync == 'never' or not self._segments:
+            return
+        now = time.monotonic()
+        if force or now - self._last_fsync >= self.fsync_interval:
+            for segment in self._segments.values():
+                segment['file'].flush()
+                os.fsync(segment['file'].fileno())
+            self._last_fsync = now
+
+    def _segment_for(self, channel, timestamp):
+        day = segment_day(timestamp)
+        segment = self._segments.get(channel)
+        if segment is not None:
+            if segment['day'] == day and segment['size'] < self.max_segment_bytes:
+                return segment
+            self._close_segment(channel)
+            if segment['day'] == day:
+                number = segment['number'] + 1
+            else:
+                number = self._last_segment_number(channel, day)
+        else:
+            number = self._last_segment_number(channel, day)
+
+        channel_dir = os.path.join(self.directory, channel)
+        os.makedirs(channel_dir, exist_ok=True)
+        path = os.path.join(channel_dir, f'{day}.{number:04d}.jsonl')
+        # Незакрытый сегмент прошлого запуска продолжаем, а не перезаписываем
+        segment = {'day': day, 'number': number, 'path': path,
+                   'file': open(path, 'ab', buffering=64 * 1024),
+                   'size': os.path.getsize(path) if os.path.exists(path) else 0}
+        self._segments[channel] = segment
+        return segment
+
+    def _last_segment_number(self, channel, day):
+        channel_dir = os.path.join(self.directory, channel)
+        number = 0
+        if os.path.isdir(channel_dir):
+            for name in os.listdir(channel_dir):
+                match = SEGMENT_RE.match(name)
+                if match and match.group(1) == day:
+                    # Сжатый сегмент уже закрыт, пишем в следующий
+                    number = max(number, int(match.group(2)) + (1 if match.group(3) else 0))
+        return number
+
+    def _close_segment(self, channel, final=True):
+        segment = self._segments.pop(channel)
+        segment['file'].flush()
+        if self.fsync != 'never':
+            os.fsync(segment['file'].fileno())
+        segment['file'].close()
+        self.segments_closed += 1
+        if final and self.compress:
+            self._compress(segment['path'])
+
+    def _compress(self, path):
+        """Сжатие закрытого сегмента в .gz (через временный файл)"""
+        try:
+            tmp_path = path + '.gz.tmp'
+            with open(path, 'rb') as src, gzip.open(tmp_path, 'wb') as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            os.replace(tmp_path, path + '.gz')
+            os.remove(path)
+        except Exception as e:
+            self._report(e)
+
+    def _compress_leftovers(self):
+        """Сжатие несжатых сегментов прошлых дней (например, после сбоя)"""
+        if not self.compress or not os.path.isdir(self.directory):
+            return
+        today = segment_day(time.time())
+        for channel in os.listdir(self.directory):
+            channel_dir = os.path.join(self.directory, channel)
+            if not os.path.isdir(channel_dir):
+                continue
+            for name in os.listdir(channel_dir):
+                match = SEGMENT_RE.match(name)
+                if match and not match.group(3) and match.group(1) < today:
+                    self._compress(os.path.join(channel_dir, name))
+
+    def _report(self, error):
+        if self.on_error:
+            self.on_error(error)
@@ -0,0 +1,304 @@
+import argparse
+import gzip
+import json
+import mmap
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+from archive import SEGMENT_RE
+
+
+INDEX_NAME = 'index.db'
+
+
+def parse_time(value):
+    """Время из "2024-05-01", "2024-05-01 12:30" или относительного "7d", "12h", "30m" """
+    if value is None or isinstance(value, (int, float)):
+        return value
+    value = value.strip()
+    units = {'m': 60, 'h': 3600, 'd': 86400, 'w': 7 * 86400}
+    if value[-1:] in units and value[:-1].isdigit():
+        return time.time() - int(value[:-1]) * units[value[-1]]
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(value, fmt).timestamp()
+        except ValueError:
+            continue
+    raise ValueError(f"Неверный формат времени: {value}")
+
+
+def command_of(text, prefixes=('!',)):
+    """Имя команды из текста сообщения или None"""
+    for prefix in prefixes:
+        if text.startswith(prefix):
+            word = text[len(prefix):].split(maxsplit=1)
+            return word[0].casefold() if word else None
+    return None
+
+
+def format_record(record, channel):
+    when = datetime.fromtimestamp(record['ts']).strftime('%Y-%m-%d %H:%M:%S')
+    user = record.get('name') or record.get('user') or '*'
+    text = record.get('text', '')
+    if record.get('cmd', 'PRIVMSG') != 'PRIVMSG':
+        text = f"[{record['cmd']}] {text}"
+    return f"[{when}] #{channel} {user}: {text}"
+
+
+class Segment:
+    """Чтение сегмента архива: несжатый - через mmap, .gz - распаковкой в память"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        if path.endswith('.gz'):
+            with gzip.open(path, 'rb') as f:
+                self.data = f.read()
+        else:
+            self._file = open(path, 'rb')
+            size = os.fstat(self._file.fileno()).st_size
+            self.data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+
+    def line_at(self, offset):
+        end = self.data.find(b'\n', offset)
+        if end == -1:
+            return None
+        return self.data[offset:end]
+
+    def lines(self, start=0):
+        """(смещение, строка) для всех полных строк начиная со start"""
+        data = self.data
+        offset = start
+        while True:
+            end = data.find(b'\n', offset)
+            if end == -1:
+                return
+            yield offset, data[offset:end]
+            offset = end + 1
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        if self._file:
+            self._file.close()
+
+
+class ArchiveIndex:
+    """Индекс архива чата в SQLite: по пользователю, команде и времени
+
+    Для каждой записи хранится сегмент и смещение строки в распакованных
+    данных сегмента. Растущий сегмент дочитывается с последнего
+    проиндексированного байта; после сжатия сегмент переиндексируется.
+    """
+
+    def __init__(self, directory, prefixes=('!',)):
+        self.directory = directory
+        self.prefixes = tuple(prefixes)
+        self._conn = sqlite3.connect(os.path.join(directory, INDEX_NAME))
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS segments (
+                id INTEGER PRIMARY KEY, path TEXT UNIQUE, channel TEXT,
+                min_ts REAL, max_ts REAL, indexed_bytes INTEGER, mtime REAL);
+            CREATE TABLE IF NOT EXISTS entries (
+                segment INTEGER, offset INTEGER, ts REAL, user TEXT, command TEXT);
+            CREATE INDEX IF NOT EXISTS entries_user ON entries (user, ts);
+            CREATE INDEX IF NOT EXISTS entries_command ON entries (command, ts);
+            CREATE INDEX IF NOT EXISTS entries_segment ON entries (segment, ts);
+        """)
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+    def _segment_files(self):
+        for channel in sorted(os.listdir(self.directory)):
+            channel_dir = os.path.join(self.directory, channel)
+            if not os.path.isdir(channel_dir):
+                continue
+            for name in sorted(os.listdir(channel_dir)):
+                if SEGMENT_RE.match(name):
+                    yield channel, os.path.join(channel, name)
+
+    def update(self):
+        """Индексация новых и изменившихся сегментов, возвращает число новых записей"""
+        conn = self._conn
+        known = {path: (segment_id, indexed, mtime) for segment_id, path, indexed, mtime
+                 in conn.execute("SELECT id, path, indexed_bytes, mtime FROM segments")}
+        added = 0
+        present = set()
+
+        for channel, path in self._segment_files():
+            present.add(path)
+            full_path = os.path.join(self.directory, path)
+            try:
+                stat = os.stat(full_path)
+            except FileNotFoundError:
+                continue
+
+            segment_id, indexed, mtime = known.get(path, (None, 0, None))
+            if segment_id is not None and mtime == stat.st_mtime:
+                continue
+            if path.endswith('.gz'):
+                # Сжатый сегмент не меняется: индексируем целиком один раз
+                indexed = 0
+            with conn:
+                if segment_id is None:
+                    segment_id = conn.execute(
+                        "INSERT INTO segments (path, channel, indexed_bytes, mtime) VALUES (?, ?, 0, ?)",
+                        (path, channel, stat.st_mtime)).lastrowid
+                elif indexed == 0:
+                    conn.execute("DELETE FROM entries WHERE segment = ?", (segment_id,))
+                added += self._index_segment(segment_id, full_path, indexed, stat.st_mtime)
+
+        # Сегменты, которых больше нет (например, .jsonl после сжатия в .gz)
+        with conn:
+            for path, (segment_id, _, _) in known.items():
+                if path not in present:
+                    conn.execute("DELETE FROM entries WHERE segment = ?", (segment_id,))
+                    conn.execute("DELETE FROM segments WHERE id = ?", (segment_id,))
+        return added
+
+    def _index_segment(self, segment_id, path, start, mtime):
+        segment = Segment(path)
+        rows = []
+        end = start
+        try:
+            for offset, line in segment.lines(start):
+                end = offset + len(line) + 1
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                command = command_of(record.get('text', ''), self.prefixes)
+                rows.append((segment_id, offset, record['ts'], record.get('user', '').lower(), command))
+        finally:
+            segment.close()
+
+        self._conn.executemany(
+            "INSERT INTO entries (segment, offset, ts, user, command) VALUES (?, ?, ?, ?, ?)", rows)
+        if rows:
+            self._conn.execute(
+                "UPDATE segments SET min_ts = min(coalesce(min_ts, ?), ?), max_ts = max(coalesce(max_ts, ?), ?) "
+                "WHERE id = ?", (rows[0][2], rows[0][2], rows[-1][2], rows[-1][2], segment_id))
+        self._conn.execute("UPDATE segments SET indexed_bytes = ?, mtime = ? WHERE id = ?",
+                           (end, mtime, segment_id))
+        return len(rows)
+
+    def _open_segment(self, path):
+        full_path = os.path.join(self.directory, path)
+        try:
+            return Segment(full_path)
+        except FileNotFoundError:
+            if path.endswith('.gz'):
+                raise
+            # Сегмент сжали после update(): смещения в распакованных данных те же
+            return Segment(full_path + '.gz')
+
+    def search(self, channel=None, user=None, command=None, text=None, since=None, until=None,
+               limit=None, newest_first=False):
+        """Ленивый поиск: генератор (канал, запись) в порядке времени"""
+        conditions = []
+        params = []
+        if user:
+            conditions.append("e.user = ?")
+            params.append(user.lower().lstrip('@'))
+        if command:
+            conditions.append("e.command = ?")
+            params.append(command.lstrip('!').casefold())
+        if channel:
+            conditions.append("s.channel = ?")
+            params.append(channel.lower().lstrip('#'))
+        if since is not None:
+            conditions.append("e.ts >= ?")
+            params.append(parse_time(since))
+        if until is not None:
+            conditions.append("e.ts <= ?")
+            params.append(parse_time(until))
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        order = 'DESC' if newest_first else 'ASC'
+        cursor = self._conn.execute(
+            f"SELECT s.path, s.channel, e.offset FROM entries e JOIN segments s ON s.id = e.segment "
+            f"{where} ORDER BY e.ts {order}, e.rowid {order}", params)
+
+        needle = text.casefold() if text else None
+        opened = {}
+        found = 0
+        try:
+            for path, segment_channel, offset in cursor:
+                segment = opened.get(path)
+                if segment is None:
+                    # Открытыми держим несколько последних сегментов
+                    if len(opened) >= 8:
+                        opened.pop(next(iter(opened))).close()
+                    segment = opened[path] = self._open_segment(path)
+                line = segment.line_at(offset)
+                if line is None:
+                    continue
+                record = json.loads(line)
+                if needle and needle not in record.get('text', '').casefold():
+                    continue
+                yield segment_channel, record
+                found += 1
+                if limit and found >= limit:
+                    return
+        finally:
+            cursor.close()
+            for segment in opened.values():
+                segment.close()
+
+
+def replay(results, speed=1.0, output=print):
+    """Вывод результатов с исходными паузами между сообщениями (ускоренными в speed раз)"""
+    previous = None
+    for channel, record in results:
+        if previous is not None and speed > 0:
+            time.sleep(min(max(0.0, record['ts'] - previous) / speed, 5.0))
+        previous = record['ts']
+        output(format_record(record, channel))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Поиск по архиву чата")
+    parser.add_argument('--archive', default='archive', help="Каталог архива")
+    parser.add_argument('--channel', help="Канал")
+    parser.add_argument('--user', help="Пользователь (логин)")
+    parser.add_argument('--command', help="Команда, например sens или !sens")
+    parser.add_argument('--text', help="Подстрока в тексте сообщения")
+    parser.add_argument('--since', help="С какого времени: 2024-05-01, '2024-05-01 12:00' или 7d/12h/30m")
+    parser.add_argument('--until', help="По какое время (тот же формат)")
+    parser.add_argument('--limit', type=int, default=100, help="Максимум результатов (0 - без ограничения)")
+    parser.add_argument('--newest', action='store_true', help="Сначала новые")
+    parser.add_argument('--replay', action='store_true', help="Воспроизвести с исходными паузами")
+    parser.add_argument('--speed', type=float, default=10.0, help="Ускорение воспроизведения")
+    parser.add_argument('--prefix', action='append', help="Префикс команд (по умолчанию !)")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.archive):
+        print(f"Каталог архива не найден: {args.archive}", file=sys.stderr)
+        raise SystemExit(1)
+
+    index = ArchiveIndex(args.archive, args.prefix or ('!',))
+    try:
+        started = time.perf_counter()
+        added = index.update()
+        print(f"Индекс обновлен: +{added} записей за {time.perf_counter() - started:.2f} с", file=sys.stderr)
+
+        results = index.search(args.channel, args.user, args.command, args.text,
+                               args.since, args.until, args.limit or None, args.newest)
+        if args.replay:
+            replay(results, args.speed)
+        else:
+            for channel, record in results:
+                print(format_record(record, channel))
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
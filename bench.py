@@ -0,0 +1,689 @@
+import argparse
+import copy
+import json
+import os
+import random
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from irc_reader import LineDecoder
+from irc_parser import IrcMessage, parse_message, parse_tags, escape_tag_value
+
+
+SAMPLE_USERS = ['newwwrld', 'viewer_01', 'пельмень', 'kappa_fan', 'ночной_дозор', 'modbot']
+SAMPLE_MESSAGES = [
+    '!sens', '!commands', '!рука', 'привет всем', 'Kappa Kappa PogChamp',
+    'когда стрим завтра?', 'LUL LUL LUL', 'gg wp', '!какули', 'это было мощно 🔥🔥',
+]
+
+
+def load_chat(path):
+    """Загрузка записанного чата (одна строка IRC на строку файла)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.rstrip('\r\n') for line in f if line.strip()]
+
+
+def twitch_tags(user, rnd):
+    """Теги, которые Twitch присылает с twitch.tv/tags"""
+    return (f"@badge-info=;badges=subscriber/12,premium/1;color=#1E90FF;display-name={user};"
+            f"emotes=25:0-4;first-msg=0;flags=;id={rnd.getrandbits(64):016x};mod=0;returning-chatter=0;"
+            f"room-id=12345;subscriber=1;tmi-sent-ts={1700000000000 + rnd.randrange(10 ** 6)};turbo=0;"
+            f"user-id={rnd.randrange(10 ** 8)};user-type= ")
+
+
+def synthetic_chat(count, channel='newwwrld', seed=1, tags=False):
+    """Генерация пачки строк IRC, похожих на реальный чат"""
+    rnd = random.Random(seed)
+    lines = []
+    for i in range(count):
+        if i % 500 == 0:
+            lines.append('PING :tmi.twitch.tv')
+            continue
+        user = rnd.choice(SAMPLE_USERS)
+        text = rnd.choice(SAMPLE_MESSAGES)
+        prefix = twitch_tags(user, rnd) if tags else ''
+        lines.append(f"{prefix}:{user}!{user}@{user}.tmi.twitch.tv PRIVMSG #{channel} :{text}")
+    return lines
+
+
+def _replay(lines, chunk_size=4096):
+    """Отправляет строки в один конец socketpair, возвращает другой конец"""
+    payload = ''.join(f"{line}\r\n" for line in lines).encode('utf-8')
+    server, client = socket.socketpair()
+
+    def writer():
+        # Режем поток на куски фиксированного размера, как это делает TCP
+        for i in range(0, len(payload), chunk_size):
+            server.sendall(payload[i:i + chunk_size])
+        server.close()
+
+    thread = threading.Thread(target=writer, daemon=True)
+    return client, thread
+
+
+def bench_reader(args):
+    """Пропускная способность построчного чтения IRC"""
+    lines = load_chat(args.file) if args.file else synthetic_chat(args.lines)
+    expected = len(lines)
+
+    # Старый способ: recv(1024) и отдельный decode каждого куска
+    client, thread = _replay(lines, args.chunk)
+    thread.start()
+    start = time.perf_counter()
+    legacy_lines = 0
+    broken = 0
+    while True:
+        data = client.recv(1024)
+        if not data:
+            break
+        try:
+            text = data.decode('utf-8')
+        except UnicodeDecodeError:
+            broken += 1
+            continue
+        legacy_lines += len([l for l in text.split('\r\n') if l])
+    legacy_time = time.perf_counter() - start
+    thread.join()
+    client.close()
+
+    # Новый способ: recv(65536) и LineDecoder движка
+    client, thread = _replay(lines, args.chunk)
+    thread.start()
+    decoder = LineDecoder()
+    start = time.perf_counter()
+    received = 0
+    while True:
+        data = client.recv(65536)
+        if not data:
+            break
+        received += len(decoder.feed(data))
+    reader_time = time.perf_counter() - start
+    thread.join()
+    client.close()
+
+    print(f"Строк в записи: {expected}")
+    print(f"recv(1024):    {legacy_lines} фрагментов, {broken} кусков с ошибкой UTF-8, "
+          f"{legacy_lines / legacy_time:,.0f} фрагм/с (без sleep(0.1))")
+    print(f"LineDecoder:   {received} строк, {received / reader_time:,.0f} строк/с")
+
+
+def _temp_core(commands=None, accept_replies=False):
+    """BotCore в отдельном каталоге с тихим логом
+
+    accept_replies - ядро считает себя подключенным, а каждый ответ -
+    поставленным в очередь (без этого execute() не трогает счетчики).
+    """
+    from bot_core import BotCore
+
+    directory = tempfile.mkdtemp(prefix='chatbench-')
+    commands = commands or {'sens': {'response': '0.04 in game 800 dpi', 'usage_count': 0}}
+    with open(os.path.join(directory, 'commands.json'), 'w', encoding='utf-8') as f:
+        json.dump(commands, f, ensure_ascii=False)
+
+    core = BotCore(config_path=os.path.join(directory, 'config.json'),
+                   commands_path=os.path.join(directory, 'commands.json'),
+                   auto_messages_path=os.path.join(directory, 'auto_messages.json'))
+    core.on_log = lambda message: None
+    if accept_replies:
+        core.engine._session = {}
+        core.engine.send_privmsg = lambda *args: True
+        core.engine.send_privmsgs = lambda *args: True
+    return core, directory
+
+
+def bench_persistence(args):
+    """Команд в секунду: запись commands.json на каждый вызов против отложенной записи"""
+    count = args.lines // 20
+    commands = {f'cmd{i}': {'response': f'ответ {i}', 'usage_count': 0} for i in range(200)}
+    commands['sens'] = {'response': '0.04 in game 800 dpi', 'usage_count': 0}
+    line = ':viewer!viewer@viewer.tmi.twitch.tv PRIVMSG #newwwrld :!sens'
+
+    core, directory = _temp_core(commands, accept_replies=True)
+    try:
+        # Как было: полная перезапись файла после каждой команды
+        def legacy_save(key=None):
+            with open(core.commands_path, 'w', encoding='utf-8') as f:
+                json.dump(core.commands, f, ensure_ascii=False, indent=2)
+
+        core.commands_store.mark_dirty = legacy_save
+        start = time.perf_counter()
+        for _ in range(count):
+            core.handle_line(line)
+        before = count / (time.perf_counter() - start)
+
+        # Как стало: счетчик в памяти, запись по таймеру
+        del core.commands_store.mark_dirty
+        start = time.perf_counter()
+        for _ in range(count):
+            core.handle_line(line)
+        after = count / (time.perf_counter() - start)
+        core.flush()
+
+        with open(core.commands_path, 'r', encoding='utf-8') as f:
+            saved = json.load(f)['sens']['usage_count']
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    print(f"Команд: {count} x 2, в таблице {len(commands)} команд")
+    print(f"Сохранение на каждый вызов: {before:,.0f} команд/с")
+    print(f"Отложенная запись:          {after:,.0f} команд/с")
+    print(f"Счетчик на диске после flush: {saved}")
+    if saved != count * 2:
+        print(f"Ожидалось {count * 2}: ответы не дошли до счетчика")
+        raise SystemExit(1)
+
+
+def bench_storage(args):
+    """Время записи одного измененного счетчика: JSON-файл против SQLite"""
+    from storage import WriteBehindStore, SqliteDatabase, SqliteStore
+
+    count = max(1, args.lines // 40)
+    rounds = 200
+    commands = {f'cmd{i}': {'response': f'ответ {i}', 'usage_count': 0} for i in range(count)}
+    directory = tempfile.mkdtemp(prefix='chatbench-')
+    try:
+        database = SqliteDatabase(os.path.join(directory, 'chatbot.db'))
+        stores = {
+            'JSON': WriteBehindStore(os.path.join(directory, 'commands.json'), copy.deepcopy(commands), delay=3600),
+            'SQLite': SqliteStore(database, 'commands', copy.deepcopy(commands), delay=3600),
+        }
+        for name, store in stores.items():
+            store.save()
+            start = time.perf_counter()
+            for i in range(rounds):
+                key = f'cmd{i % count}'
+                store.data[key]['usage_count'] += 1
+                store.save(key)
+            elapsed = time.perf_counter() - start
+            print(f"{name:7} {count} команд: {elapsed / rounds * 1000:.2f} мс на запись счетчика")
+
+        saved = SqliteDatabase(database.path).load('commands')['cmd0']['usage_count']
+        print(f"Счетчик cmd0 в базе: {saved}")
+        database.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def bench_matcher(args):
+    """Время поиска команды в зависимости от размера таблицы команд"""
+    from command_matcher import CommandMatcher
+
+    rnd = random.Random(args.seed)
+    lookups = max(1000, args.lines // 4)
+    for size in (10, 100, 1000, 10000, 100000):
+        commands = {f'команда{i}': {'response': 'ответ', 'aliases': [f'alias{i}', f'два слова{i}']}
+                    for i in range(size)}
+        commands['рука'] = {'response': 'ответ'}
+
+        matcher = CommandMatcher()
+        start = time.perf_counter()
+        matcher.rebuild(commands)
+        build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        matcher.update('новая', {'response': 'ответ', 'aliases': ['ещё одна']})
+        matcher.update('новая', None)
+        update = time.perf_counter() - start
+
+        messages = []
+        for _ in range(lookups):
+            i = rnd.randrange(size)
+            messages.append(rnd.choice((f'!КОМАНДА{i} арг', f'!alias{i}', f'!два СЛОВА{i} x y',
+                                        '!Рука', '!нет_такой', 'просто текст')))
+
+        start = time.perf_counter()
+        hits = 0
+        for message in messages:
+            match = matcher.match(message)
+            if match and match[0]:
+                hits += 1
+        elapsed = time.perf_counter() - start
+
+        print(f"{size:>7} команд: сборка {build * 1000:8.1f} мс, изменение одной {update * 1e6:6.1f} мкс, "
+              f"поиск {elapsed / lookups * 1e6:.2f} мкс/сообщ. (совпало {hits / lookups:.0%})")
+
+
+def bench_moderation(args):
+    """Проверка запрещенных фраз: Ахо-Корасик против цикла по "in" """
+    from moderation import Moderator
+
+    rnd = random.Random(args.seed)
+    messages = [rnd.choice(SAMPLE_MESSAGES) + ' ' + rnd.choice(SAMPLE_MESSAGES)
+                for _ in range(max(1000, args.lines // 20))]
+    for size in (10, 100, 1000, 10000, 100000):
+        phrases = [f'плохо{i}слово' for i in range(size)] + ['мощно']
+        start = time.perf_counter()
+        moderator = Moderator({'enabled': True, 'banned_phrases': {'list': phrases, 'whole_words': False}})
+        build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        hits = sum(1 for message in messages if moderator._check_phrases(message))
+        automaton = (time.perf_counter() - start) / len(messages)
+
+        naive_messages = messages[:max(10, len(messages) * 10 // size)]
+        start = time.perf_counter()
+        for message in naive_messages:
+            folded = message.casefold()
+            any(phrase in folded for phrase in phrases)
+        naive = (time.perf_counter() - start) / len(naive_messages)
+
+        print(f"{size:>7} фраз: сборка {build * 1000:8.1f} мс, Ахо-Корасик {automaton * 1e6:6.2f} мкс/сообщ., "
+              f"цикл in {naive * 1e6:10.2f} мкс/сообщ. (нарушений {hits / len(messages):.0%})")
+
+
+def bench_archive(args):
+    """Архив чата: стоимость append() в потоке чтения и скорость фоновой записи"""
+    from archive import ChatArchive
+
+    lines = load_chat(args.file) if args.file else synthetic_chat(args.lines, tags=True)
+    messages = [parse_message(line) for line in lines]
+    messages = [msg for msg in messages if msg.command == 'PRIVMSG']
+    directory = tempfile.mkdtemp(prefix='chatbench-')
+    try:
+        for fsync in ('never', 'interval', 'always'):
+            archive = ChatArchive(os.path.join(directory, fsync), fsync=fsync,
+                                  max_segment_bytes=8 * 1024 * 1024, max_queue=len(messages) + 1)
+            archive.start()
+            start = time.perf_counter()
+            for msg in messages:
+                archive.append(msg.channel, msg)
+            append_time = time.perf_counter() - start
+            archive.close(timeout=300)
+            total_time = time.perf_counter() - start
+
+            files = sorted(os.listdir(os.path.join(directory, fsync, 'newwwrld')))
+            size = sum(os.path.getsize(os.path.join(directory, fsync, 'newwwrld', name)) for name in files)
+            print(f"fsync={fsync:8} append: {len(messages) / append_time:,.0f} сообщ./с, "
+                  f"запись: {archive.written / total_time:,.0f} сообщ./с, "
+                  f"сегментов: {len(files)}, на диске {size / 1024 / 1024:.1f} МБ "
+                  f"(записано {archive.bytes_written / 1024 / 1024:.1f} МБ), потеряно: {archive.dropped}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def bench_metrics(args):
+    """Стоимость метрик: observe() гистограммы и выгрузка /metrics"""
+    from metrics import Metrics
+
+    rounds = max(100000, args.lines)
+    rnd = random.Random(args.seed)
+    values = [rnd.expovariate(200) for _ in range(1000)]
+    metrics = Metrics()
+    histogram = metrics.histogram('latency_seconds', "test")
+    counter = metrics.counter('events_total', "test")
+
+    start = time.perf_counter()
+    for i in range(rounds):
+        histogram.observe(values[i % 1000])
+    observe_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        counter.inc()
+    inc_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(100):
+        metrics.render()
+    render_time = (time.perf_counter() - start) / 100
+
+    print(f"observe(): {observe_time / rounds * 1e9:.0f} нс, inc(): {inc_time / rounds * 1e9:.0f} нс, "
+          f"render(): {render_time * 1e6:.0f} мкс")
+    print(f"p50 {histogram.quantile(0.5) * 1000:.1f} мс, p99 {histogram.quantile(0.99) * 1000:.1f} мс "
+          f"(ожидалось ~{0.69 / 200 * 1000:.1f} и ~{4.6 / 200 * 1000:.1f} мс с точностью до корзины)")
+
+
+def bench_plugins(args):
+    """Плагины: ленивый импорт, задержка вызова и изоляция медленного плагина"""
+    from irc_engine import IrcEngine
+    from plugins import PluginManager, PluginContext
+
+    directory = tempfile.mkdtemp(prefix='chatbench-')
+    with open(os.path.join(directory, 'bench_lazy_plugin.py'), 'w', encoding='utf-8') as f:
+        f.write("def roll(ctx):\n    return f'{ctx.user}: {len(ctx.args)}'\n")
+    sys.path.insert(0, directory)
+
+    engine = IrcEngine()
+    engine.start()
+    replies = []
+    replied = threading.Event()
+
+    def send(channel, messages, received_at=None):
+        replies.append((channel, messages))
+        replied.set()
+
+    def call(plugins, command, count=1):
+        context = PluginContext(plugins, 'bench', 'viewer', command=command, args=['d20'])
+        for _ in range(count):
+            engine.call_soon(plugins.run_command, command, context)
+
+    try:
+        # Ленивая загрузка: модуль импортируется при первом вызове команды
+        plugins = PluginManager(engine, send, queue_limit=100000)
+        plugins.discover({'entry_points': False, 'commands': {'roll': 'bench_lazy_plugin:roll'}})
+        before = 'bench_lazy_plugin' in sys.modules
+        start = time.perf_counter()
+        call(plugins, 'roll')
+        replied.wait(10)
+        first = time.perf_counter() - start
+        print(f"Импорт до первого вызова: {'да' if before else 'нет'}, первый вызов с импортом "
+              f"{first * 1000:.1f} мс, после: {'загружен' if 'bench_lazy_plugin' in sys.modules else 'нет'}")
+
+        # Задержка одного вызова: цикл движка -> поток плагина -> ответ
+        latencies = []
+        for _ in range(min(2000, max(200, args.lines // 100))):
+            replied.clear()
+            start = time.perf_counter()
+            call(plugins, 'roll')
+            replied.wait(10)
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        count = max(2000, args.lines // 10)
+        replies.clear()
+        start = time.perf_counter()
+        call(plugins, 'roll', count)
+        while len(replies) < count and time.perf_counter() - start < 30:
+            time.sleep(0.001)
+        throughput = len(replies) / (time.perf_counter() - start)
+        print(f"Вызов плагина: p50 {latencies[len(latencies) // 2] * 1e6:.0f} мкс, "
+              f"p99 {latencies[int(len(latencies) * 0.99)] * 1e6:.0f} мкс; {throughput:,.0f} вызовов/с")
+        plugins.stop()
+
+        # Изоляция: зависающий плагин не задерживает цикл движка и быстрый плагин
+        plugins = PluginManager(engine, send, on_log=lambda message, level: None, budget=0.2, queue_limit=4)
+        plugins.command('slow', lambda ctx: time.sleep(1) or 'slow')
+        plugins.add('command', 'fast', lambda ctx: 'fast', plugin='fast_plugin')
+        lags = []
+
+        def probe(expected):
+            lags.append(time.perf_counter() - expected)
+            if len(lags) < 300:
+                engine.loop.call_later(0.01, probe, time.perf_counter() + 0.01)
+
+        replies.clear()
+        engine.call_soon(probe, time.perf_counter())
+        for _ in range(30):
+            call(plugins, 'slow', 5)
+            call(plugins, 'fast', 3)
+            time.sleep(0.1)
+        time.sleep(0.5)
+        slow = plugins.commands['slow']
+        fast = sum(1 for _, messages in replies if messages == ['fast'])
+        print(f"Медленный плагин (1 с при бюджете 0.2 с): вызовов {slow.calls}, таймаутов {slow.timeouts}, "
+              f"пропущено {slow.skipped}, отключен: {'да' if slow.disabled_until else 'нет'}; "
+              f"быстрый ответил {fast}/90; задержка цикла движка макс. {max(lags) * 1000:.1f} мс")
+        plugins.stop()
+    finally:
+        engine.stop()
+        sys.path.remove(directory)
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def _self_signed_cert(directory):
+    """Самоподписанный сертификат для 127.0.0.1 (нужна утилита openssl)"""
+    cert = os.path.join(directory, 'cert.pem')
+    key = os.path.join(directory, 'key.pem')
+    subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+                    '-keyout', key, '-out', cert, '-subj', '/CN=localhost',
+                    '-addext', 'subjectAltName=IP:127.0.0.1,DNS:localhost'],
+                   check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return cert, key
+
+
+def _run_bot_against(server, directory, duration, config=None, reply_timeout=10):
+    """Запуск headless.py против MockIrcServer в отдельном процессе
+
+    Возвращает результаты сервера и ресурсы процесса бота (CPU, пиковая
+    память), если система умеет их отдавать (os.wait4 есть не везде).
+    """
+    import asyncio
+
+    async def scenario():
+        await server.start()
+        with open(os.path.join(directory, 'config.json'), 'w', encoding='utf-8') as f:
+            json.dump({
+                'oauth_token': 'oauth:benchmark',
+                'channels': server.channels,
+                'irc_host': server.host,
+                'irc_port': server.port,
+                'irc_tls': False,
+                'rate_limits': {'tier': 'verified'},
+                **(config or {}),
+            }, f)
+
+        log = open(os.path.join(directory, 'bot.log'), 'wb')
+        headless = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'headless.py')
+        process = subprocess.Popen(
+            [sys.executable, headless, '--no-auto-messages',
+             '--config', os.path.join(directory, 'config.json'),
+             '--commands', os.path.join(directory, 'commands.json'),
+             '--auto-messages', os.path.join(directory, 'auto_messages.json')],
+            stdout=log, stderr=subprocess.STDOUT)
+        try:
+            try:
+                await asyncio.wait_for(server.joined.wait(), 30)
+            except asyncio.TimeoutError:
+                raise RuntimeError(f"Бот не вошел в канал, см. {log.name}")
+            await server.replay(duration)
+            await server.wait_replies(reply_timeout)
+        finally:
+            if process.poll() is None:
+                process.send_signal(signal.SIGTERM if hasattr(signal, 'SIGTERM') else signal.SIGINT)
+            await server.stop()
+            log.close()
+        return process
+
+    process = asyncio.run(scenario())
+    usage = None
+    if hasattr(os, 'wait4') and process.returncode is None:
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+    else:
+        process.wait(30)
+    return server.results(), usage
+
+
+def bench_e2e(args):
+    """Сквозной тест: локальный IRC-сервер, бот в отдельном процессе, задержка ответов
+
+    Сеть не нужна. Чат (записанный --file или синтетический с командами и
+    смайлами) проигрывается со скоростями --rates строк в минуту, задержка
+    измеряется по ответам на пробы !ping. С --max-p99 (мс) бенчмарк
+    завершается с кодом 1 при превышении порога или потере ответов -
+    так его можно запускать в CI.
+
+    --tls - соединение через TLS (самоподписанный сертификат), --standby -
+    резервное соединение бота, --reconnect-every N - RECONNECT от сервера
+    каждые N секунд; выводится время переключения до нового JOIN.
+    --channels и --connections - много каналов на пуле соединений,
+    --kill-every N - обрыв соединения с отказом в переподключении (каналы
+    должны переехать на другие соединения). --workers N - обработка чата в
+    N процессах, --moderation - модерация с 10000 запрещенных фраз, капсом
+    и повторами (нагрузка, которую процессы делят между ядрами).
+    """
+    import ssl
+    from mock_irc import MockIrcServer, PROBE_COMMAND, PROBE_REPLY
+
+    lines = load_chat(args.file) if args.file else synthetic_chat(20000, channel='benchmark', seed=args.seed,
+                                                                  tags=True)
+    channel = next((msg.channel for msg in map(parse_message, lines) if msg.channel), 'benchmark')
+    channels = [channel] + [f'{channel}_{i}' for i in range(1, args.channels)]
+    commands = {
+        PROBE_COMMAND: {'response': f'{PROBE_REPLY} {{args}}', 'usage_count': 0},
+        'sens': {'response': '0.04 in game 800 dpi', 'usage_count': 0, 'cooldown': 5},
+        'рука': {'response': '{user}, Logitech G Pro {random:X|Superlight}', 'usage_count': 0, 'user_cooldown': 10},
+        'какули': {'response': 'какули сказал {user}: {args}', 'usage_count': 0},
+    }
+
+    failed = False
+    for rate in (int(rate) for rate in args.rates.split(',')):
+        directory = tempfile.mkdtemp(prefix='chatbench-')
+        try:
+            with open(os.path.join(directory, 'commands.json'), 'w', encoding='utf-8') as f:
+                json.dump(commands, f, ensure_ascii=False)
+            config = {'standby_connection': args.standby, 'connections': args.connections,
+                      'shard_policy': args.shard_policy, 'workers': args.workers}
+            if args.moderation:
+                config['moderation'] = {
+                    # Команды в чат мок-сервера, без запросов к Helix
+                    'enabled': True, 'action': 'delete', 'api': 'irc',
+                    'banned_phrases': {'list': [f'плохо{i}слово' for i in range(10000)]},
+                    'links': {'enabled': True}, 'caps': {'enabled': True}, 'repeat': {'enabled': True},
+                }
+            server_context = None
+            if args.tls:
+                cert, key = _self_signed_cert(directory)
+                server_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+                server_context.load_cert_chain(cert, key)
+                config.update({'irc_tls': True, 'irc_ca_file': cert})
+            server = MockIrcServer(lines, rate, channels, ssl_context=server_context,
+                                   reconnect_every=args.reconnect_every, kill_every=args.kill_every)
+            result, usage = _run_bot_against(server, directory, args.duration, config)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+        resources = "CPU/память: н/д"
+        if usage:
+            # ru_maxrss: килобайты в Linux, байты в macOS
+            peak = usage.ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+            cpu = usage.ru_utime + usage.ru_stime
+            resources = f"CPU {cpu:.2f} с ({cpu / args.duration * 100:.0f}%), пик памяти {peak:.0f} МБ"
+        print(f"{rate:>6} строк/мин: отправлено {result['sent']}, ответов {result['replies']}/{result['probes']}, "
+              f"задержка p50 {result['p50'] * 1000:.1f} мс, p90 {result['p90'] * 1000:.1f} мс, "
+              f"p99 {result['p99'] * 1000:.1f} мс, макс. {result['max'] * 1000:.1f} мс; {resources}")
+        if result['switches']:
+            switches = result['switches']
+            print(f"       переключений: {len(switches)}, "
+                  f"до JOIN: медиана {switches[len(switches) // 2] * 1000:.1f} мс, "
+                  f"макс. {switches[-1] * 1000:.1f} мс; соединений {result['connections']}, "
+                  f"строк пропущено ботом {result['missed']}")
+        if len(channels) > 1 or result['kills']:
+            print(f"       каналов: {len(channels)}, соединений одновременно: {result['max_clients']}, "
+                  f"всего подключений {result['connections']}, обрывов {result['kills']}, "
+                  f"строк пропущено ботом {result['missed']}")
+        if result['send_lag'] > 1:
+            print(f"       сервер отстал от заданной скорости на {result['send_lag']:.1f} с")
+
+        if args.max_p99 is not None and (result['lost'] or result['p99'] * 1000 > args.max_p99):
+            failed = True
+    if failed:
+        print(f"Превышен порог: p99 > {args.max_p99} мс или потеряны ответы")
+        raise SystemExit(1)
+
+
+def bench_parser(args):
+    """Строк в секунду для разбора IRC без тегов и с тегами Twitch"""
+    for tags in (False, True):
+        lines = load_chat(args.file) if args.file else synthetic_chat(args.lines, tags=tags)
+
+        start = time.perf_counter()
+        for line in lines:
+            parse_message(line)
+        parse_only = len(lines) / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for line in lines:
+            msg = parse_message(line)
+            msg.tag('display-name')
+        with_tags = len(lines) / (time.perf_counter() - start)
+
+        title = "с тегами" if tags else "без тегов"
+        print(f"{title:10} разбор: {parse_only:,.0f} строк/с, разбор + теги: {with_tags:,.0f} строк/с")
+        if args.file:
+            break
+
+
+def _random_token(rnd, alphabet, max_length=12):
+    return ''.join(rnd.choice(alphabet) for _ in range(rnd.randint(1, max_length)))
+
+
+def bench_parser_fuzz(args):
+    """Случайные строки: разбор не падает и совпадает после обратной сборки"""
+    rnd = random.Random(args.seed)
+    noise = 'abcXYZ019 :;@!#\\=/-_,.\tпривет🔥'
+    plain = 'abcdefXYZ0123456789-_.'
+    value_chars = 'ab c;d\\e\r\nё= :'
+    failures = 0
+
+    for i in range(args.lines // 10):
+        # 1. Мусор: разбор либо удается, либо дает ValueError
+        garbage = ''.join(rnd.choice(noise) for _ in range(rnd.randint(0, 60)))
+        try:
+            parse_message(garbage)
+        except ValueError:
+            pass
+        except Exception as e:
+            failures += 1
+            print(f"Исключение {type(e).__name__} на {garbage!r}")
+
+        # 2. Корректное сообщение: сборка и повторный разбор дают то же самое
+        tags = {_random_token(rnd, plain): ''.join(rnd.choice(value_chars) for _ in range(rnd.randint(0, 8)))
+                for _ in range(rnd.randint(0, 4))}
+        params = [_random_token(rnd, plain) for _ in range(rnd.randint(0, 3))]
+        params.append(''.join(rnd.choice(value_chars.replace('\r', '').replace('\n', ''))
+                              for _ in range(rnd.randint(0, 20))))
+        source = f"{_random_token(rnd, plain)}!u@h" if rnd.random() < 0.8 else None
+        original = IrcMessage(_random_token(rnd, 'ABCDEFGHIJ'), params, source, tags=tags)
+
+        line = original.format()
+        parsed = parse_message(line)
+        if (parsed.command, parsed.params, parsed.source, parsed.tags) != \
+                (original.command, original.params, original.source, original.tags):
+            failures += 1
+            print(f"Не совпало: {line!r}\n  было  {original!r} {original.tags}\n  стало {parsed!r} {parsed.tags}")
+
+    # 3. Значения тегов из спецификации IRCv3
+    assert parse_tags('a=\\:\\s\\\\\\r\\n;b;c=x\\') == {'a': '; \\\r\n', 'b': '', 'c': 'x'}
+    assert escape_tag_value('; \\') == '\\:\\s\\\\'
+
+    print(f"Проверено {args.lines // 10 * 2} строк, ошибок: {failures}")
+    if failures:
+        raise SystemExit(1)
+
+
+BENCHMARKS = {
+    'reader': bench_reader,
+    'persistence': bench_persistence,
+    'storage': bench_storage,
+    'parser': bench_parser,
+    'parser-fuzz': bench_parser_fuzz,
+    'matcher': bench_matcher,
+    'moderation': bench_moderation,
+    'archive': bench_archive,
+    'metrics': bench_metrics,
+    'plugins': bench_plugins,
+    'e2e': bench_e2e,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарки Twitch Chat Manager")
+    parser.add_argument('name', choices=sorted(BENCHMARKS))
+    parser.add_argument('--file', help="Файл с записанным чатом")
+    parser.add_argument('--lines', type=int, default=200000)
+    parser.add_argument('--chunk', type=int, default=4096)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--rates', default='1000,10000,50000', help="e2e: скорости чата, строк в минуту")
+    parser.add_argument('--duration', type=float, default=20, help="e2e: длительность прогона, с")
+    parser.add_argument('--max-p99', type=float, help="e2e: порог p99 задержки ответа, мс (для CI)")
+    parser.add_argument('--tls', action='store_true', help="e2e: соединение через TLS")
+    parser.add_argument('--standby', action='store_true', help="e2e: резервное соединение бота")
+    parser.add_argument('--reconnect-every', type=float, help="e2e: RECONNECT от сервера каждые N секунд")
+    parser.add_argument('--channels', type=int, default=1, help="e2e: число каналов")
+    parser.add_argument('--connections', type=int, default=1, help="e2e: соединений в пуле бота")
+    parser.add_argument('--shard-policy', default='hash', help="e2e: распределение каналов (hash, balanced)")
+    parser.add_argument('--kill-every', type=float, help="e2e: обрыв соединения каждые N секунд")
+    parser.add_argument('--workers', default=0, help="e2e: процессов-обработчиков чата (число или auto)")
+    parser.add_argument('--moderation', action='store_true', help="e2e: включить тяжелую модерацию")
+    args = parser.parse_args()
+    BENCHMARKS[args.name](args)
+
+
+if __name__ == "__main__":
+    main()
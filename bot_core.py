@@ -0,0 +1,851 @@
+import collections
+import copy
+import json
+import os
+import time
+from datetime import datetime
+
+from irc_engine import IrcEngine, TWITCH_IRC_HOST, TWITCH_IRC_PORT, TWITCH_IRC_TLS_PORT, create_ssl_context
+from rate_limit import PRIORITY_MODERATION, PRIORITY_REPLY, PRIORITY_AUTO
+from storage import WriteBehindStore, SqliteDatabase, SqliteStore, atomic_write_json
+from log_buffer import DEBUG, INFO, WARNING, ERROR, parse_level
+from scheduler import Scheduler
+from chat_handler import ChatHandler, MESSAGE_LIMIT, REPLY, MODERATE, COOLDOWN, PLUGIN, LOG, is_available_in
+from workers import WorkerPool, COMMAND, COMMANDS, CONFIG, SETTING, worker_count
+from plugins import PluginManager, PluginContext
+from moderation import Moderator, chat_command, moderation_result
+from helix import HelixClient, HELIX_URL, VALIDATE_URL
+from archive import ChatArchive, DEFAULT_COMMANDS
+from metrics import Metrics, MetricsServer, FAST_BUCKETS
+from irc_parser import IrcMessage, parse_message
+
+
+def parse_channels(value):
+    """Список каналов из строки "a, #b c" или из списка"""
+    if isinstance(value, str):
+        value = value.replace(' ', ',').split(',')
+    channels = []
+    for channel in value or []:
+        channel = channel.strip().lstrip('#').lower()
+        if channel and channel not in channels:
+            channels.append(channel)
+    return channels
+
+
+class BotCore:
+    """Логика бота без интерфейса: подключение, команды и автосообщения"""
+
+    def __init__(self, config_path='config.json', commands_path='commands.json',
+                 auto_messages_path='auto_messages.json'):
+        self.config_path = config_path
+        self.commands_path = commands_path
+        self.auto_messages_path = auto_messages_path
+
+        # Обработчики событий (интерфейс или консоль подставляют свои)
+        self.on_log = None
+        self.on_commands_changed = None        # (ключ команды)
+        self.on_auto_messages_changed = None   # (id автосообщения)
+        self.on_disconnected = None
+        self.on_status_changed = None
+
+        self.channels = []
+        self.nick = None
+        self.connected_at = None
+        self.auto_messages_enabled = False
+
+        # Модерация через Helix API (start_helix) и команды в чат, ждущие NOTICE
+        self.helix = None
+        self._oauth_token = None
+        self._moderation_pending = {}
+
+        self.engine = IrcEngine(on_line=self.handle_line,
+                                on_disconnect=self.on_connection_lost,
+                                on_log=self.add_log,
+                                on_state=self.on_connection_state)
+        # Процессы-обработчики чата (config "workers"), запускаются в start()
+        self.workers = None
+
+        # Загрузка конфигурации
+        self.log_level = INFO
+        self.config = self.load_config()
+        self.set_log_level(self.config.get('log_level', 'info'))
+
+        # Хранилище: JSON-файлы (по умолчанию) или база SQLite
+        self.database = None
+        if self.config.get('storage', 'json') == 'sqlite':
+            self.database = self.open_database()
+
+        # Счетчики живут в памяти и сбрасываются на диск с задержкой
+        save_delay = self.config.get('save_delay', 5)
+        self.commands_store = self._create_store(
+            'commands', self.commands_path, self.load_commands(), save_delay,
+            on_error=lambda e: self.add_log(f"Ошибка сохранения команд: {e}", ERROR))
+        self.auto_messages_store = self._create_store(
+            'auto_messages', self.auto_messages_path, self.load_auto_messages(), save_delay,
+            on_error=lambda e: self.add_log(f"Ошибка сохранения автосообщений: {e}", ERROR))
+        self.commands = self.commands_store.data
+        self.moderator = self.load_moderator()
+        self.plugins = self.load_plugins()
+        # Решения по сообщениям чата; в режиме workers - и в процессах-обработчиках
+        self.chat = ChatHandler(self.commands, self.config, self.moderator, self.plugins.command_data())
+        self.plugins.on_commands_changed = self._on_plugin_commands_changed
+        self.archive = self.open_archive()
+        self.metrics = Metrics()
+        self.metrics_server = None
+        self.setup_metrics()
+        self.auto_messages = self.auto_messages_store.data
+
+        self.auto_scheduler = Scheduler(
+            self.send_auto_message,
+            on_error=lambda e: self.add_log(f"❌ Ошибка в цикле автосообщений: {e}", ERROR),
+            lateness=self.auto_lateness)
+
+        self.ensure_default_commands()
+
+    @property
+    def debug_enabled(self):
+        return self.log_level <= DEBUG
+
+    def set_log_level(self, level):
+        """Установка уровня логирования (имя из конфигурации или число)"""
+        self.log_level = parse_level(level)
+        self.engine.debug = self.debug_enabled
+        if self.workers:
+            self.workers.broadcast((SETTING, 'debug', self.debug_enabled))
+
+    def add_log(self, message, level=INFO):
+        """Добавление записи в лог"""
+        if level < self.log_level:
+            return
+        if self.on_log:
+            self.on_log(message)
+        else:
+            timestamp = datetime.now().strftime("%H:%M:%S")
+            print(f"[{timestamp}] {message}", flush=True)
+
+    def _notify(self, handler, *args):
+        if handler:
+            handler(*args)
+
+    # --- Хранение данных ---
+
+    def _load_json(self, path, what):
+        try:
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception as e:
+            self.add_log(f"Ошибка загрузки {what}: {e}", ERROR)
+        return {}
+
+    def open_database(self):
+        """Открытие базы SQLite и перенос данных из JSON при первом запуске"""
+        default_path = os.path.join(os.path.dirname(os.path.abspath(self.config_path)), 'chatbot.db')
+        database_path = self.config.get('database', default_path)
+        try:
+            database = SqliteDatabase(database_path)
+        except Exception as e:
+            # Без базы бот продолжает работать с JSON-файлами
+            self.add_log(f"Ошибка открытия базы {database_path}, используются JSON-файлы: {e}", ERROR)
+            return None
+        for table, path in (('commands', self.commands_path), ('auto_messages', self.auto_messages_path)):
+            try:
+                count = database.migrate_json(table, path)
+                if count:
+                    self.add_log(f"📦 Перенесено в SQLite из {path}: {count} записей")
+            except Exception as e:
+                self.add_log(f"Ошибка переноса {path} в SQLite: {e}", ERROR)
+        return database
+
+    def _create_store(self, table, path, data, delay, on_error):
+        if self.database:
+            return SqliteStore(self.database, table, data, delay, on_error)
+        return WriteBehindStore(path, data, delay, on_error)
+
+    def load_config(self):
+        """Загрузка конфигурации"""
+        return self._load_json(self.config_path, "конфигурации")
+
+    def save_config(self):
+        """Сохранение конфигурации (исключения обрабатывает вызывающий)"""
+        atomic_write_json(self.config_path, self.config)
+        self.apply_config()
+
+    def apply_config(self):
+        """Изменения кулдаунов, префиксов и модерации - в обработку чата и процессы-обработчики"""
+        try:
+            self.chat.apply_config(self.config)
+        except Exception as e:
+            self.add_log(f"Ошибка загрузки настроек модерации: {e}", ERROR)
+        if self.workers:
+            self.workers.broadcast((CONFIG, copy.deepcopy(self.config)))
+        if self.connected:
+            self.start_helix()
+
+    def _load_table(self, table, path, what):
+        if self.database:
+            try:
+                return self.database.load(table)
+            except Exception as e:
+                self.add_log(f"Ошибка загрузки {what}: {e}", ERROR)
+                return {}
+        return self._load_json(path, what)
+
+    def load_commands(self):
+        """Загрузка команд"""
+        return self._load_table('commands', self.commands_path, "команд")
+
+    def save_commands(self, command=None):
+        """Сохранение команд (сразу, для правок из интерфейса)
+
+        command - измененная команда; без него сохраняется вся таблица.
+        """
+        self.chat.command_changed(command)
+        if self.workers:
+            if command is None:
+                self.workers.broadcast((COMMANDS, copy.deepcopy(self.commands)))
+            else:
+                self.workers.broadcast((COMMAND, command, copy.deepcopy(self.commands.get(command))))
+        self.commands_store.save(command)
+
+    def load_auto_messages(self):
+        """Загрузка автосообщений"""
+        return self._load_table('auto_messages', self.auto_messages_path, "автосообщений")
+
+    def save_auto_messages(self, msg_id=None):
+        """Сохранение автосообщений (сразу, для правок из интерфейса)"""
+        self.auto_messages_store.save(msg_id)
+
+    def flush(self):
+        """Запись всех отложенных изменений"""
+        self.commands_store.close()
+        self.auto_messages_store.close()
+
+    def close_storage(self):
+        """Запись изменений и закрытие базы"""
+        self.flush()
+        if self.database:
+            self.database.close()
+            self.database = None
+
+    # --- Команды ---
+
+    def ensure_default_commands(self):
+        """Обеспечивает наличие команды !commands по умолчанию"""
+        if 'commands' not in self.commands:
+            self.commands['commands'] = {
+                'response': 'Доступные команды: !commands',
+                'usage_count': 0,
+                'is_default': True
+            }
+            self.save_commands('commands')
+
+    def config_channels(self):
+        """Каналы из конфигурации (поддерживается старый ключ channel)"""
+        return parse_channels(self.config.get('channels') or self.config.get('channel', ''))
+
+    def is_available_in(self, data, channel):
+        """Доступна ли команда или автосообщение в канале (пустой список - во всех)"""
+        return is_available_in(data, channel)
+
+    def get_commands_list(self, channel=None):
+        """Страницы ответа !commands для канала (кэшируются в ChatHandler)"""
+        return self.chat.get_commands_list(channel)
+
+    def invalidate_commands_list(self):
+        """Сброс кэша ответа !commands (после добавления, правки или удаления)"""
+        self.chat.invalidate_commands_list()
+
+    # --- Подключение ---
+
+    @property
+    def connected(self):
+        """Бот подключен (в том числе во время автоматического переподключения)"""
+        return self.engine.active
+
+    def start(self):
+        """Запуск потока движка"""
+        self.engine.start()
+        self.start_workers()
+        self.plugins.start()
+        self.start_metrics_server()
+
+    def shutdown(self):
+        """Остановка автосообщений, отключение и остановка движка"""
+        if self.auto_messages_enabled:
+            self.stop_auto_messages()
+        self.plugins.stop()
+        if self.metrics_server:
+            try:
+                self.engine.submit(self.metrics_server.stop()).result(timeout=5)
+            except Exception:
+                pass
+        self.engine.stop()
+        # После остановки движка строки в процессы больше не уходят
+        self.stop_workers()
+        if self.archive:
+            self.archive.close()
+        self.close_storage()
+
+    def connect(self, oauth_token, channels, nick=None, timeout=15, host=None, port=None):
+        """Подключение к Twitch и вход во все каналы одним соединением
+
+        Адрес сервера берется из irc_host/irc_port конфигурации (например,
+        для локального тестового сервера), по умолчанию - irc.chat.twitch.tv.
+        irc_tls (по умолчанию включен) - TLS на порту 6697 вместо открытого
+        текста на 6667; irc_ca_file - свой сертификат сервера для проверки.
+        standby_connection - держать резервное соединение для быстрого
+        переподключения. Много каналов делятся между несколькими
+        соединениями: connections (число) или channels_per_connection,
+        политика shard_policy - "hash" или "balanced".
+        """
+        channels = parse_channels(channels)
+        if not channels:
+            raise ValueError("Не указан ни один канал")
+
+        if not oauth_token.startswith('oauth:'):
+            oauth_token = f'oauth:{oauth_token}'
+
+        # Без отдельного ника бот входит под именем первого канала
+        nick = nick or self.config.get('nick') or channels[0]
+
+        # Лимиты отправки: {"tier": "normal|moderator|verified", "channels": {...}}
+        rate_limits = self.config.get('rate_limits', {})
+        self.engine.configure_rate_limits(rate_limits.get('tier', 'normal'), rate_limits.get('channels'))
+
+        # Теги (display-name, id сообщения) и служебные команды Twitch
+        capabilities = ['twitch.tv/tags', 'twitch.tv/commands'] if self.config.get('irc_capabilities', True) else []
+        self.engine.auto_reconnect = self.config.get('auto_reconnect', True)
+
+        tls = self.config.get('irc_tls', True)
+        ssl_context = None
+        if tls:
+            ssl_context = create_ssl_context(self.config.get('irc_ca_file'), self.config.get('tls_verify', True))
+        host = host or self.config.get('irc_host', TWITCH_IRC_HOST)
+        port = int(port or self.config.get('irc_port') or (TWITCH_IRC_TLS_PORT if tls else TWITCH_IRC_PORT))
+        standby = self.config.get('standby_connection', False)
+        connections = self.config.get('connections', 1)
+        per_connection = self.config.get('channels_per_connection')
+        if per_connection:
+            connections = -(-len(channels) // per_connection)
+        self.engine.connect(oauth_token, nick, channels, host, port, capabilities, ssl_context, standby,
+                            connections, self.config.get('shard_policy', 'hash')).result(timeout=timeout)
+        self.channels = channels
+        self.nick = nick
+        self.set_connected_at(time.time())
+        self.start_helix(oauth_token)
+        pool = len(self.engine.connections)
+        self.add_log(f"🚀 Подключен к каналам: {', '.join('#' + c for c in channels)}"
+                     f"{' (TLS)' if tls else ''}{f', соединений: {pool}' if pool > 1 else ''}")
+
+    def disconnect(self):
+        """Отключение от Twitch"""
+        try:
+            self.engine.disconnect().result(timeout=5)
+        except Exception:
+            pass
+        self.set_connected_at(None)
+
+        if self.auto_messages_enabled:
+            self.stop_auto_messages()
+
+        self.add_log("🔌 Отключен от Twitch")
+
+    def set_connected_at(self, value):
+        """Время подключения для {uptime} (и в процессах-обработчиках)"""
+        self.connected_at = value
+        self.chat.connected_at = value
+        if self.workers:
+            self.workers.broadcast((SETTING, 'connected_at', value))
+
+    def on_connection_state(self, state, detail):
+        """Вызывается движком при переподключении"""
+        if state == 'reconnecting':
+            self.add_log(f"🔄 Переподключение: {detail}", WARNING)
+        else:
+            self.add_log(f"🟢 Соединение восстановлено ({detail})")
+        if self.on_status_changed:
+            self.on_status_changed(state)
+
+    def on_connection_lost(self, error):
+        """Вызывается движком, когда соединение потеряно окончательно"""
+        self.add_log(f"❌ Ошибка в цикле бота: {error}", ERROR)
+        if self.auto_messages_enabled:
+            self.stop_auto_messages()
+        self._notify(self.on_disconnected)
+
+    def outbound_stats(self):
+        """Метрики очереди отправки"""
+        return self.engine.outbox.stats()
+
+    def send_message(self, channel, message, priority=PRIORITY_REPLY, received_at=None):
+        """Отправка сообщения в чат канала через очередь с лимитами
+
+        Возвращает, попало ли сообщение в очередь (точно - только в потоке движка).
+        """
+        if not self.connected:
+            return False
+        try:
+            if not self.engine.send_privmsg(channel, message, priority, received_at):
+                return False
+        except Exception as e:
+            self.add_log(f"❌ Ошибка отправки сообщения: {e}", ERROR)
+            return False
+        self.archive_outgoing(channel, message)
+        if self.debug_enabled:
+            self.add_log(f"[DEBUG] Отправлено: PRIVMSG #{channel} :{message}", DEBUG)
+        return True
+
+    def send_messages(self, channel, messages, priority=PRIORITY_REPLY, received_at=None):
+        """Отправка нескольких сообщений подряд одной пачкой (результат - как у send_message)"""
+        if not self.connected:
+            return False
+        try:
+            if not self.engine.send_privmsgs(channel, messages, priority, received_at):
+                return False
+        except Exception as e:
+            self.add_log(f"❌ Ошибка отправки сообщения: {e}", ERROR)
+            return False
+        for message in messages:
+            self.archive_outgoing(channel, message)
+        if self.debug_enabled:
+            for message in messages:
+                self.add_log(f"[DEBUG] Отправлено: PRIVMSG #{channel} :{message}", DEBUG)
+        return True
+
+    def handle_line(self, line):
+        """Обработка одной строки IRC"""
+        # Отладочные строки не форматируются вовсе, если DEBUG выключен
+        debug = self.debug_enabled
+        if debug:
+            self.add_log(f"[DEBUG] IRC: {line}", DEBUG)
+
+        received_at = time.monotonic()
+        try:
+            msg = parse_message(line)
+            self.parse_time.observe(time.monotonic() - received_at)
+        except ValueError as parse_error:
+            self.add_log(f"[ERROR] Ошибка парсинга сообщения: {parse_error}", ERROR)
+            self.add_log(f"[ERROR] Проблемная строка: {line}", ERROR)
+            return
+
+        if self.archive and msg.command in self.archive_commands:
+            channel = msg.channel
+            if channel:
+                self.archive.append(channel, msg)
+
+        if self.plugins.events and self.plugins.has_event(msg.command):
+            self.plugins.dispatch_event(msg, received_at)
+
+        if msg.command == 'PRIVMSG':
+            self.handle_privmsg(msg, received_at, line)
+        elif msg.command == 'NOTICE' and self._moderation_pending:
+            self.handle_moderation_notice(msg)
+
+    def handle_privmsg(self, msg, received_at=None, line=None):
+        """Обработка сообщения из чата (received_at - time.monotonic() получения строки)
+
+        В режиме workers решение принимает процесс-обработчик канала по
+        исходной строке line, а ответ выполняется в execute() по его итогам.
+        """
+        channel = msg.channel
+        if not channel or len(msg.params) < 2:
+            if self.debug_enabled:
+                self.add_log(f"[DEBUG] Неожиданный формат PRIVMSG: {msg!r}", DEBUG)
+            return
+
+        # С тегами twitch.tv/tags у пользователя есть отображаемое имя
+        username = msg.tag('display-name') or msg.nick
+        message = msg.text.strip()
+
+        self.add_log(f"#{channel} {username}: {message}")
+
+        if self.workers and line is not None and self.workers.dispatch(channel, line, received_at):
+            return
+        self.execute(channel, msg.nick, self.chat.evaluate(msg, channel, message, self.debug_enabled), received_at)
+
+    def execute(self, channel, nick, actions, received_at=None):
+        """Выполнение действий ChatHandler: ответы, модерация, счетчики и лог"""
+        for action in actions:
+            kind = action[0]
+            if kind == REPLY:
+                _, command, pages = action
+                # Отправляем ответ; не попавший в очередь ответ не считается
+                if len(pages) == 1:
+                    queued = self.send_message(channel, pages[0], received_at=received_at)
+                else:
+                    queued = self.send_messages(channel, pages, received_at=received_at)
+                if not queued:
+                    if self.debug_enabled:
+                        self.add_log(f"[DEBUG] Ответ на !{command} в #{channel} не поставлен в очередь", DEBUG)
+                    continue
+                self.commands_handled.inc()
+
+                # Увеличение счетчика использований
+                data = self.commands.get(command)
+                if data is not None:
+                    data['usage_count'] = data.get('usage_count', 0) + 1
+                    self.commands_store.mark_dirty(command)
+                    self._notify(self.on_commands_changed, command)
+                    if self.workers:
+                        self.workers.count_changed(command, data['usage_count'])
+
+                response_text = pages[0] if len(pages) == 1 else f"{pages[0]} ... ({len(pages)} сообщ.)"
+                self.add_log(f"✅ Ответил на команду !{command}: {response_text}")
+            elif kind == MODERATE:
+                self.moderate(channel, action)
+            elif kind == PLUGIN:
+                _, command, args, username, text = action
+                self.plugins.run_command(command, PluginContext(self.plugins, channel, nick, username, command,
+                                                                args, text, received_at=received_at))
+            elif kind == COOLDOWN:
+                self.commands_throttled.inc()
+            elif kind == LOG:
+                self.add_log(action[2], action[1])
+
+    def _on_worker_results(self, results):
+        for channel, nick, received_at, actions in results:
+            self.execute(channel, nick, actions, received_at)
+
+    # --- Метрики ---
+
+    def setup_metrics(self):
+        """Счетчики и гистограммы ядра; значения движка и очереди читаются при выгрузке"""
+        metrics = self.metrics
+        engine = self.engine
+        outbox = engine.outbox
+
+        self.parse_time = metrics.histogram('parse_seconds', "Время разбора строки IRC", FAST_BUCKETS)
+        self.reply_latency = metrics.histogram(
+            'reply_latency_seconds', "От получения команды до отправки ответа в сокет")
+        self.queue_wait = metrics.histogram('outbound_wait_seconds', "Ожидание строки в очереди отправки")
+        self.flush_time = metrics.histogram('persistence_flush_seconds', "Время записи хранилища на диск")
+        self.auto_lateness = metrics.histogram('auto_message_lateness_seconds',
+                                               "Опоздание автосообщений относительно срока")
+        self.commands_handled = metrics.counter('commands_total', "Отвеченных команд")
+        self.commands_throttled = metrics.counter('commands_cooldown_total', "Команд, пропущенных из-за кулдауна")
+        self.moderation_actions = metrics.counter('moderation_actions_total', "Действий модерации")
+        self.moderation_failed = metrics.counter('moderation_failed_total', "Действий модерации, отклоненных Twitch")
+
+        metrics.gauge('lines_received_total', "Принято строк IRC", lambda: engine.lines_received, 'counter')
+        metrics.gauge('bytes_received_total', "Принято байт", lambda: engine.bytes_received, 'counter')
+        metrics.gauge('outbound_queue_depth', "Строк в очереди отправки", lambda: len(engine.outbox))
+        metrics.gauge('outbound_sent_total', "Отправлено строк", lambda: engine.outbox.sent, 'counter')
+        metrics.gauge('outbound_dropped_total', "Отброшено строк (переполнение, устаревание)",
+                      lambda: engine.outbox.dropped, 'counter')
+        metrics.gauge('outbound_rate_limited_total', "Ожиданий из-за лимита отправки",
+                      lambda: engine.outbox.rate_limited, 'counter')
+        metrics.gauge('reconnects_total', "Переподключений", lambda: engine.reconnects, 'counter')
+        metrics.gauge('standby_takeovers_total', "Переподключений на готовое резервное соединение",
+                      lambda: engine.takeovers, 'counter')
+        metrics.gauge('connect_seconds', "Время последнего подключения (TCP, TLS и авторизация)",
+                      lambda: engine.last_connect_time)
+        metrics.gauge('connected', "Подключен ли бот", lambda: int(self.connected))
+        metrics.gauge('connections_open', "Открытых соединений пула",
+                      lambda: sum(1 for connection in engine.connections if connection.connected))
+        metrics.gauge('connections_total', "Соединений в пуле", lambda: len(engine.connections))
+        metrics.gauge('workers_alive', "Работающих процессов-обработчиков",
+                      lambda: self.workers.alive if self.workers else 0)
+        metrics.gauge('worker_lines_total', "Строк передано процессам-обработчикам",
+                      lambda: self.workers.lines_dispatched if self.workers else 0, 'counter')
+        metrics.gauge('worker_batches_total', "Пачек строк передано процессам-обработчикам",
+                      lambda: self.workers.batches_sent if self.workers else 0, 'counter')
+        self.plugin_time = metrics.histogram('plugin_seconds', "Время вызова обработчика плагина")
+        metrics.gauge('plugins_loaded', "Загруженных обработчиков плагинов", lambda: self.plugins.stats()['loaded'])
+        for name, help_text in (('calls', "Вызовов обработчиков плагинов"),
+                                ('errors', "Ошибок в обработчиках плагинов"),
+                                ('timeouts', "Превышений бюджета времени плагинами"),
+                                ('skipped', "Пропущенных вызовов (плагин занят или отключен)")):
+            metrics.gauge(f'plugin_{name}_total', help_text,
+                          lambda name=name: self.plugins.stats()[name], 'counter')
+        metrics.gauge('persistence_flushes_total', "Записей хранилищ на диск",
+                      lambda: self.commands_store.flushes + self.auto_messages_store.flushes, 'counter')
+        metrics.gauge('archive_written_total', "Записано сообщений в архив",
+                      lambda: self.archive.written if self.archive else 0, 'counter')
+        metrics.gauge('archive_dropped_total', "Потеряно сообщений архива (переполнение очереди)",
+                      lambda: self.archive.dropped if self.archive else 0, 'counter')
+
+        outbox.on_sent = self._on_line_sent
+        self.plugins.on_call = self.plugin_time.observe
+        self.commands_store.on_flush = self.flush_time.observe
+        self.auto_messages_store.on_flush = self.flush_time.observe
+
+    def _on_line_sent(self, priority, wait):
+        self.queue_wait.observe(wait)
+        if priority == PRIORITY_REPLY:
+            self.reply_latency.observe(wait)
+
+    def start_metrics_server(self):
+        """Эндпоинт Prometheus, если включен в разделе "metrics" конфигурации"""
+        settings = self.config.get('metrics', {})
+        if not settings.get('enabled', False) or self.metrics_server:
+            return
+        server = MetricsServer(self.metrics, settings.get('host', '127.0.0.1'), settings.get('port', 9108))
+        try:
+            self.engine.submit(server.start()).result(timeout=5)
+            self.metrics_server = server
+            self.add_log(f"📈 Метрики: http://{server.host}:{server.port}/metrics")
+        except Exception as e:
+            self.add_log(f"Ошибка запуска сервера метрик: {e}", ERROR)
+
+    # --- Плагины ---
+
+    def load_plugins(self):
+        """Плагины из точек входа и раздела "plugins" конфигурации (импорт - при первом вызове)"""
+        settings = self.config.get('plugins', {})
+        plugins = PluginManager(self.engine, self._plugin_send, lambda: self.channels, on_log=self.add_log,
+                                budget=settings.get('budget', 0.5),
+                                load_timeout=settings.get('load_timeout', 10.0),
+                                queue_limit=settings.get('queue_limit', 8),
+                                max_failures=settings.get('max_failures', 3),
+                                disable_for=settings.get('disable_for', 60.0))
+        if settings.get('enabled', True):
+            try:
+                plugins.discover(settings)
+            except Exception as e:
+                self.add_log(f"Ошибка загрузки списка плагинов: {e}", ERROR)
+        return plugins
+
+    def _on_plugin_commands_changed(self):
+        """Команда плагина зарегистрирована после запуска"""
+        data = self.plugins.command_data()
+        self.chat.set_plugin_commands(data)
+        if self.workers:
+            self.workers.broadcast((SETTING, 'plugin_commands', data))
+
+    def _plugin_send(self, channel, messages, received_at=None):
+        """Ответ плагина (из любого потока)"""
+        messages = [str(message)[:MESSAGE_LIMIT] for message in messages if message]
+        if len(messages) == 1:
+            self.send_message(channel, messages[0], received_at=received_at)
+        elif messages:
+            self.send_messages(channel, messages, received_at=received_at)
+
+    # --- Процессы-обработчики ---
+
+    def start_workers(self):
+        """Обработка чата в workers процессах ("auto" - по числу ядер), 0 - в потоке движка"""
+        try:
+            count = worker_count(self.config.get('workers', 0))
+        except (TypeError, ValueError):
+            self.add_log(f"Неверное число процессов workers: {self.config.get('workers')}", ERROR)
+            return
+        if not count or self.workers:
+            return
+        pool = WorkerPool(count, copy.deepcopy(self.commands), self.config, self.engine.loop,
+                          self._on_worker_results,
+                          on_error=lambda error: self.add_log(f"❌ Обработчик чата: {error}", ERROR),
+                          batch_size=self.config.get('worker_batch_size', 512),
+                          plugin_commands=self.plugins.command_data())
+        try:
+            pool.start()
+        except Exception as e:
+            self.add_log(f"Ошибка запуска процессов-обработчиков: {e}", ERROR)
+            return
+        self.workers = pool
+        pool.broadcast((SETTING, 'debug', self.debug_enabled))
+        pool.broadcast((SETTING, 'connected_at', self.connected_at))
+        self.add_log(f"⚙️ Процессов-обработчиков чата: {count}")
+
+    def stop_workers(self):
+        if self.workers:
+            pool = self.workers
+            self.workers = None
+            pool.stop()
+
+    # --- Архив чата ---
+
+    def open_archive(self):
+        """Архив чата из раздела "archive" конфигурации (по умолчанию выключен)"""
+        settings = self.config.get('archive', {})
+        self.archive_commands = set(settings.get('commands', DEFAULT_COMMANDS))
+        default_dir = os.path.join(os.path.dirname(os.path.abspath(self.config_path)), 'archive')
+        self.archive_directory = settings.get('directory', default_dir)
+        if not settings.get('enabled', False):
+            return None
+        try:
+            archive = ChatArchive(
+                self.archive_directory,
+                fsync=settings.get('fsync', 'interval'),
+                fsync_interval=settings.get('fsync_interval', 1.0),
+                compress=settings.get('compress', True),
+                max_segment_bytes=int(settings.get('max_segment_mb', 64) * 1024 * 1024),
+                on_error=lambda e: self.add_log(f"Ошибка записи архива чата: {e}", ERROR))
+            archive.start()
+            return archive
+        except Exception as e:
+            self.add_log(f"Ошибка запуска архива чата: {e}", ERROR)
+            return None
+
+    def archive_outgoing(self, channel, message):
+        """Запись в архив собственного сообщения бота"""
+        if self.archive:
+            self.archive.append(channel, IrcMessage('PRIVMSG', [f'#{channel}', message], self.nick))
+
+    # --- Модерация ---
+
+    def load_moderator(self):
+        """Модерация из раздела "moderation" конфигурации (по умолчанию выключена)"""
+        try:
+            return Moderator(self.config.get('moderation'))
+        except Exception as e:
+            self.add_log(f"Ошибка загрузки настроек модерации: {e}", ERROR)
+            return Moderator()
+
+    def start_helix(self, oauth_token=None):
+        """Клиент Helix API для модерации ("api": "helix" в moderation, по умолчанию)
+
+        Токен проверяется в фоне; пока проверка не прошла, а также с
+        "api": "irc", модерация идет командами в чат.
+        """
+        if oauth_token:
+            self._oauth_token = oauth_token
+        moderation = self.config.get('moderation') or {}
+        if not (self._oauth_token and moderation.get('enabled') and moderation.get('api', 'helix') == 'helix'):
+            self.helix = None
+            return
+        if self.helix is not None:
+            return
+        self.helix = HelixClient(self._oauth_token, self.config.get('client_id'),
+                                 self.config.get('helix_url', HELIX_URL),
+                                 self.config.get('helix_validate_url', VALIDATE_URL))
+        self.engine.submit(self._validate_helix(self.helix))
+
+    async def _validate_helix(self, helix):
+        try:
+            await helix.validate()
+        except Exception as e:
+            self.add_log(f"⚠️ Helix API недоступен, модерация командами в чат: {e}", WARNING)
+            return
+        missing = helix.missing_scopes()
+        if missing:
+            self.add_log(f"⚠️ У токена нет прав {', '.join(missing)} - Twitch отклонит модерацию", WARNING)
+
+    def moderate(self, channel, action):
+        """Выполнение действия MODERATE (вызывается в потоке движка)"""
+        _, kind, nick, user_id, room_id, message_id, duration, reason = action
+        helix = self.helix
+        if helix is not None and helix.ready and user_id and room_id:
+            self.engine.loop.create_task(
+                self._moderate_helix(helix, channel, kind, nick, user_id, room_id, message_id, duration, reason))
+            return
+        # Без Helix - команда в чат; успех или отказ Twitch сообщит через NOTICE
+        if self.send_message(channel, chat_command(kind, nick, message_id, duration, reason), PRIORITY_MODERATION):
+            self._moderation_pending.setdefault(channel, collections.deque()).append(
+                (time.monotonic(), nick, kind, reason))
+
+    async def _moderate_helix(self, helix, channel, kind, nick, user_id, room_id, message_id, duration, reason):
+        try:
+            if kind == 'delete':
+                await helix.delete_message(room_id, message_id)
+            else:
+                await helix.ban(room_id, user_id, reason, duration)
+        except Exception as e:
+            self.moderation_failed.inc()
+            self.add_log(f"❌ Twitch отклонил модерацию #{channel} {nick} ({kind}): {e}", ERROR)
+            return
+        self.moderation_actions.inc()
+        self.add_log(f"🛡️ #{channel} {nick}: {reason} -> {kind}", WARNING)
+
+    def handle_moderation_notice(self, msg):
+        """Ответ Twitch на команду модерации в чат (успех или отказ)
+
+        NOTICE о другом (msg_duplicate, msg_ratelimit, msg_slowmode...)
+        ожидающие команды не трогает.
+        """
+        result = moderation_result(msg.tag('msg-id'))
+        if result is None:
+            return
+        pending = self._moderation_pending.get(msg.channel)
+        if not pending:
+            return
+        # Без ответа за 10 секунд команда считается потерянной
+        expired = time.monotonic() - 10
+        while pending and pending[0][0] < expired:
+            pending.popleft()
+        if not pending:
+            return
+        _, nick, kind, reason = pending.popleft()
+        if result:
+            self.moderation_actions.inc()
+            self.add_log(f"🛡️ #{msg.channel} {nick}: {reason} -> {kind}", WARNING)
+        else:
+            self.moderation_failed.inc()
+            self.add_log(f"❌ Twitch отклонил модерацию #{msg.channel} {nick} ({kind}): {msg.text}", ERROR)
+
+    # --- Автосообщения ---
+
+    def start_auto_messages(self):
+        """Запуск автосообщений"""
+        self.auto_messages_enabled = True
+
+        # Планировщик спит до ближайшего срока в потоке движка
+        self.auto_scheduler.start(self.engine)
+        self.engine.call_soon(self._schedule_all_auto_messages)
+
+        self.add_log("🚀 Автосообщения запущены")
+
+    def stop_auto_messages(self):
+        """Остановка автосообщений"""
+        self.auto_messages_enabled = False
+
+        self.auto_scheduler.stop()
+        self.engine.call_soon(self.auto_scheduler.clear)
+
+        self.add_log("⏸️ Автосообщения остановлены")
+
+    def reschedule_auto_message(self, msg_id):
+        """Пересчитать срок автосообщения после добавления, правки или удаления"""
+        if self.auto_messages_enabled:
+            self.engine.call_soon(self._schedule_auto_message, msg_id)
+
+    def _schedule_all_auto_messages(self):
+        for msg_id in list(self.auto_messages):
+            self._schedule_auto_message(msg_id)
+
+    def _schedule_auto_message(self, msg_id):
+        data = self.auto_messages.get(msg_id)
+        if not data or not data.get('enabled', True):
+            self.auto_scheduler.cancel(msg_id)
+            return
+
+        # last_sent хранится в секундах Unix, чтобы переживать перезапуск
+        interval_seconds = data.get('interval', 5) * 60  # Конвертируем минуты в секунды
+        delay = data.get('last_sent', 0) + interval_seconds - time.time()
+        self.auto_scheduler.schedule(msg_id, delay)
+
+    def send_auto_message(self, msg_id):
+        """Отправка автосообщения, у которого подошло время"""
+        data = self.auto_messages.get(msg_id)
+        if not self.auto_messages_enabled or not data or not data.get('enabled', True):
+            return
+
+        interval_seconds = data.get('interval', 5) * 60
+        if not self.connected:
+            # last_sent не меняется, поэтому _schedule_auto_message дал бы
+            # нулевую задержку - без соединения ждем полный интервал
+            self.auto_scheduler.schedule(msg_id, interval_seconds)
+            return
+
+        message = data.get('message', '')
+        queued = False
+        for channel in self.channels:
+            if self.is_available_in(data, channel):
+                queued = self.send_message(channel, message, PRIORITY_AUTO) or queued
+
+        if not queued:
+            # Очередь переполнена или прошлое сообщение еще ждет отправки:
+            # статистику не трогаем, следующая попытка через интервал
+            self.auto_scheduler.schedule(msg_id, interval_seconds)
+            return
+
+        # Обновляем статистику
+        data['last_sent'] = time.time()
+        data['sent_count'] = data.get('sent_count', 0) + 1
+
+        self.auto_messages_store.mark_dirty(msg_id)
+        self._notify(self.on_auto_messages_changed, msg_id)
+
+        self.add_log(f"📤 Автосообщение отправлено: {message[:50]}...")
+
+        self._schedule_auto_message(msg_id)
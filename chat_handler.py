@@ -0,0 +1,287 @@
+import copy
+import re
+import time
+
+from command_matcher import CommandMatcher
+from cooldown import CooldownIndex
+from templates import compile_template, format_duration
+from log_buffer import DEBUG
+
+
+# Максимальная длина сообщения в чате Twitch
+MESSAGE_LIMIT = 500
+
+# Начало сообщения, которое Twitch принял бы за команду чата ("/ban", ".timeout")
+CHAT_COMMAND_START = ('/', '.')
+_LEADING_COMMAND = re.compile(r'^[\s/.]+')
+
+# Действия, которые ChatHandler.evaluate() возвращает ядру (кортежи, чтобы
+# их можно было передавать между процессами)
+REPLY = 'reply'          # (REPLY, команда, [сообщения])
+MODERATE = 'moderate'    # (MODERATE, действие, ник, id зрителя, id канала, id сообщения, секунды, причина)
+COOLDOWN = 'cooldown'    # (COOLDOWN, команда)
+PLUGIN = 'plugin'        # (PLUGIN, команда, аргументы, отображаемое имя, текст) - вызов плагина
+LOG = 'log'              # (LOG, уровень, текст) - только с debug
+
+
+def is_available_in(data, channel):
+    """Доступна ли команда или автосообщение в канале (пустой список - во всех)"""
+    allowed = data.get('channels')
+    return not allowed or channel in allowed
+
+
+def strip_chat_command(text):
+    """Текст без ведущих "/" и ".", чтобы подставленный ввод не стал командой чата"""
+    if text.lstrip()[:1] in CHAT_COMMAND_START:
+        return _LEADING_COMMAND.sub('', text)
+    return text
+
+
+def moderation_action(msg, verdict):
+    """Действие MODERATE для решения модерации: "ban", "timeout" или "delete"
+
+    id зрителя, канала и сообщения берутся из тегов - они нужны Helix API.
+    """
+    message_id = msg.tag('id')
+    if verdict.action == 'ban':
+        action, duration = 'ban', None
+    elif verdict.action == 'delete' and message_id:
+        action, duration = 'delete', None
+    else:
+        # Без тегов id сообщения неизвестен: таймаут на 1 секунду очищает сообщения зрителя
+        action, duration = 'timeout', verdict.duration if verdict.action == 'timeout' else 1
+    return (MODERATE, action, msg.nick, msg.tag('user-id'), msg.tag('room-id'), message_id, duration,
+            verdict.reason)
+
+
+class ChatHandler:
+    """Решение по сообщению чата: модерация, кулдауны и ответ команды
+
+    Сам ничего не отправляет и не сохраняет: evaluate() возвращает список
+    действий, а выполняет их ядро. Поэтому одна и та же логика работает
+    и в потоке движка, и в процессах-обработчиках (workers.py).
+    """
+
+    def __init__(self, commands, config, moderator, plugin_commands=None):
+        self.commands = commands
+        self.config = config
+        self.moderator = moderator
+        # Команды плагинов: имя -> триггеры, кулдауны и каналы (сами функции в ядре)
+        self.plugin_commands = plugin_commands or {}
+        self.connected_at = None
+        self.cooldowns = CooldownIndex(config.get('cooldown_index_size', 50000))
+        # Копии, чтобы заметить изменения на месте в общем словаре конфигурации
+        self._prefixes = list(config.get('command_prefixes', ['!']))
+        self._moderation = copy.deepcopy(config.get('moderation'))
+        self.matcher = CommandMatcher(self._prefixes)
+        self.matcher.rebuild(self._all_commands())
+        self._templates = {}
+        self._commands_list_cache = {}
+        self.compile_responses()
+
+    def command_changed(self, command=None):
+        """Пересборка поиска, шаблона и списка команд после правки (None - всех)"""
+        self.invalidate_commands_list()
+        if command is None:
+            self.matcher.rebuild(self._all_commands())
+        else:
+            # Команда из commands.json важнее одноименной команды плагина
+            data = self.commands.get(command)
+            self.matcher.update(command, self.plugin_commands.get(command) if data is None else data)
+        self.compile_responses(command)
+
+    def apply_config(self, config):
+        """Новая конфигурация: кулдауны читаются из нее при каждой проверке,
+        префиксы команд и модерация пересобираются, только если изменились
+        """
+        self.config = config
+        prefixes = list(config.get('command_prefixes', ['!']))
+        if prefixes != self._prefixes:
+            self._prefixes = prefixes
+            self.matcher.set_prefixes(prefixes)
+            self.invalidate_commands_list()
+        moderation = config.get('moderation')
+        if moderation != self._moderation:
+            self._moderation = copy.deepcopy(moderation)
+            self.moderator.configure(moderation or {})
+
+    def set_plugin_commands(self, plugin_commands):
+        self.plugin_commands = plugin_commands
+        self.command_changed()
+
+    def _all_commands(self):
+        return {**self.plugin_commands, **self.commands}
+
+    # --- Ответы ---
+
+    def get_commands_list(self, channel=None):
+        """Список доступных команд, разбитый на сообщения не длиннее MESSAGE_LIMIT
+
+        Результат кэшируется по каналу и сбрасывается при изменении набора
+        команд (invalidate_commands_list), а не при каждом вызове !commands.
+        """
+        cache = self._commands_list_cache
+        pages = cache.get(channel)
+        if pages is None:
+            pages = cache[channel] = self._render_commands_list(channel)
+        return pages
+
+    def invalidate_commands_list(self):
+        """Сброс кэша ответа !commands (после добавления, правки или удаления)"""
+        self._commands_list_cache = {}
+
+    def _render_commands_list(self, channel):
+        commands = self._all_commands()
+        if not commands:
+            return ["Команды не настроены. Добавьте команды через интерфейс!"]
+
+        command_list = []
+        for command in sorted(commands.keys()):
+            if channel is None or is_available_in(commands[command], channel):
+                command_list.append(f"{self.matcher.display_prefix}{command}")
+
+        title = "Доступные команды"
+        # Место под заголовок с номером страницы вида " (12/34)"
+        room = MESSAGE_LIMIT - len(title) - len(" (999/999): ")
+        chunks = []
+        current = ''
+        for item in command_list:
+            item = item[:room]
+            if current and len(current) + 2 + len(item) > room:
+                chunks.append(current)
+                current = item
+            else:
+                current = f"{current}, {item}" if current else item
+        chunks.append(current)
+
+        if len(chunks) == 1:
+            return [f"{title}: {chunks[0]}"]
+        return [f"{title} ({i}/{len(chunks)}): {chunk}" for i, chunk in enumerate(chunks, 1)]
+
+    @staticmethod
+    def _compile_command(data):
+        """Шаблоны команды: None - общий ответ, имя канала - ответ из "responses" для канала"""
+        templates = {None: compile_template(data.get('response', ''))}
+        for channel, response in (data.get('responses') or {}).items():
+            templates[channel] = compile_template(response)
+        return templates
+
+    def compile_responses(self, command=None):
+        """Разбор шаблонов ответов одной команды или всех сразу"""
+        if command is None:
+            self._templates = {name: self._compile_command(data) for name, data in list(self.commands.items())}
+        elif command in self.commands:
+            self._templates[command] = self._compile_command(self.commands[command])
+        else:
+            self._templates.pop(command, None)
+
+    def render_response(self, command, data, user, args, channel=None):
+        """Ответ команды из заранее разобранного шаблона, не длиннее MESSAGE_LIMIT
+
+        Ответ для канала из "responses" ({канал: текст}) важнее общего "response".
+        """
+        responses = data.get('responses')
+        key = channel if responses and channel in responses else None
+        response = responses[key] if key is not None else data.get('response', '')
+        templates = self._templates.get(command)
+        if templates is None:
+            templates = self._templates[command] = {}
+        template = templates.get(key)
+        if template is None or template.source != response:
+            # Ответ изменили в обход save_commands
+            template = templates[key] = compile_template(response)
+        if template.static is not None:
+            return template.static[:MESSAGE_LIMIT]
+
+        uptime = time.time() - self.connected_at if self.connected_at else 0
+        text = template.render({
+            'user': user,
+            'count': data.get('usage_count', 0) + 1,
+            'args': ' '.join(args),
+            'uptime': format_duration(uptime),
+        })
+        # Команду чата в начале ответа может задать только сам шаблон ("/me {args}"),
+        # но не подставленные значения: "{args}" с "/ban кто-то" отправил бы бан
+        if response.lstrip()[:1] not in CHAT_COMMAND_START:
+            text = strip_chat_command(text)
+        return text[:MESSAGE_LIMIT]
+
+    def on_cooldown(self, command, data, channel, user):
+        """Оставшийся кулдаун (ключ, секунды) или None и запуск всех трех
+
+        Общий кулдаун действует на все команды канала, кулдаун команды -
+        на команду в канале, кулдаун зрителя - на команду для одного зрителя.
+        """
+        config = self.config
+        limits = (
+            ((channel,), config.get('global_cooldown', 0)),
+            ((channel, command), data.get('cooldown', config.get('default_cooldown', 0))),
+            ((channel, command, user), data.get('user_cooldown', config.get('default_user_cooldown', 0))),
+        )
+
+        now = time.monotonic()
+        for key, duration in limits:
+            if duration:
+                remaining = self.cooldowns.remaining(key, now)
+                if remaining:
+                    return key, remaining
+
+        for key, duration in limits:
+            if duration:
+                self.cooldowns.start(key, float(duration), now)
+        return None
+
+    # --- Решение ---
+
+    def evaluate(self, msg, channel, message, debug=False):
+        """Действия для сообщения чата (message - текст без пробелов по краям)"""
+        if self.moderator.enabled:
+            verdict = self.moderator.check(msg, channel, message)
+            if verdict:
+                return [moderation_action(msg, verdict)]
+
+        match = self.matcher.match(message)
+        if match is None:
+            return []
+
+        actions = []
+        command, args = match
+        if debug and command is not None:
+            actions.append((LOG, DEBUG, f"[DEBUG] Обнаружена команда: '{command}', аргументы: {args}"))
+
+        if command == 'commands' or command in self.commands:
+            data = self.commands.get(command, {})
+        else:
+            data = self.plugin_commands.get(command)
+
+        if data is not None and (command == 'commands' or is_available_in(data, channel)):
+            cooldown = self.on_cooldown(command, data, channel, msg.nick)
+            if cooldown:
+                if debug:
+                    key, remaining = cooldown
+                    actions.append((LOG, DEBUG, f"[DEBUG] !{command} от {msg.nick} в #{channel}: "
+                                                f"кулдаун {key} еще {remaining:.1f} с"))
+                actions.append((COOLDOWN, command))
+                return actions
+
+            # С тегами twitch.tv/tags у пользователя есть отображаемое имя
+            username = msg.tag('display-name') or msg.nick
+            if command == 'commands':
+                pages = self.get_commands_list(channel)
+                if debug:
+                    actions.append((LOG, DEBUG, f"[DEBUG] Список команд: {' | '.join(pages)}"))
+            elif command not in self.commands:
+                actions.append((PLUGIN, command, args, username, message))
+                return actions
+            else:
+                pages = [self.render_response(command, data, username, args, channel)]
+                if debug:
+                    actions.append((LOG, DEBUG, f"[DEBUG] Найден ответ для команды '{command}': {pages[0]}"))
+            actions.append((REPLY, command, pages))
+
+        elif debug:
+            actions.append((LOG, DEBUG, f"[DEBUG] Команда '{message}' не найдена в списке"))
+            available_commands = [name for name, data in self._all_commands().items()
+                                  if is_available_in(data, channel)]
+            actions.append((LOG, DEBUG, f"[DEBUG] Доступные команды: {available_commands}"))
+        return actions
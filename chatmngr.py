@@ -1,13 +1,47 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
-import json
 import os
+import queue
 import threading
-import socket
 import time
-from datetime import datetime
 from tkinter import PhotoImage
 
+from bot_core import BotCore, parse_channels
+from log_buffer import LogBuffer, LEVELS, INFO
+from tree_view import KeyedTreeView
+from command_matcher import parse_aliases, trigger_conflicts
+from archive_search import ArchiveIndex, format_record
+
+
+# Период поиска по архиву -> значение since для ArchiveIndex.search
+SEARCH_PERIODS = {'час': '1h', 'день': '1d', 'неделя': '7d', 'месяц': '30d', 'все': None}
+
+
+class TkBridge:
+    """Потокобезопасная передача вызовов в главный поток Tk"""
+
+    def __init__(self, root, interval=50):
+        self.root = root
+        self.interval = interval
+        self._queue = queue.SimpleQueue()
+        self.root.after(self.interval, self._poll)
+
+    def post(self, func, *args):
+        """Выполнить func(*args) в главном потоке (можно вызывать из любого потока)"""
+        self._queue.put((func, args))
+
+    def _poll(self):
+        while True:
+            try:
+                func, args = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                func(*args)
+            except Exception as e:
+                print("Ошибка в обработчике UI:", e)
+        self.root.after(self.interval, self._poll)
+
 
 class TwitchChatBot:
     def __init__(self):
@@ -26,22 +60,28 @@ class TwitchChatBot:
         # Настройка стилей
         self.setup_styles()
 
-        # Переменные для подключения
-        self.connected = False
-        self.socket = None
-        self.bot_thread = None
-        self.stop_bot = False
-
-        self.auto_messages_enabled = False
-        self.auto_messages_thread = None
-        self.stop_auto_messages = False
-
-        # Загрузка конфигурации
-        self.config = self.load_config()
-        self.commands = self.load_commands()
-        self.auto_messages = self.load_auto_messages()
-
-        self.ensure_default_commands()
+        # Лог копится в кольцевом буфере и выводится пачками по таймеру;
+        # ядро пишет в него с самого старта, размер из конфигурации - ниже
+        self.log_max_lines = 5000
+        self.log_buffer = LogBuffer(self.log_max_lines)
+
+        # Мост в главный поток и ядро бота (подключение, команды, автосообщения)
+        self.bridge = TkBridge(self.root)
+        self.core = BotCore()
+        self.core.on_log = self.add_log
+        self.core.on_commands_changed = lambda key=None: self.bridge.post(self.refresh_commands_list, key)
+        self.core.on_auto_messages_changed = lambda key=None: self.bridge.post(self.refresh_auto_messages_list, key)
+        self.core.on_disconnected = lambda: self.bridge.post(self.on_connection_lost)
+        self.core.on_status_changed = lambda state: self.bridge.post(self.on_connection_state, state)
+        self.core.start()
+
+        # Данные принадлежат ядру, интерфейс работает с теми же словарями
+        self.config = self.core.config
+        self.commands = self.core.commands
+        self.auto_messages = self.core.auto_messages
+
+        self.log_max_lines = self.config.get('log_max_lines', self.log_max_lines)
+        self.log_buffer.resize(self.log_max_lines)
 
         # Создание интерфейса
         self.create_interface()
@@ -51,27 +91,6 @@ class TwitchChatBot:
 
         self.center_window()
 
-    def ensure_default_commands(self):
-        """Обеспечивает наличие команды !commands по умолчанию"""
-        if 'commands' not in self.commands:
-            self.commands['commands'] = {
-                'response': 'Доступные команды: !commands',
-                'usage_count': 0,
-                'is_default': True
-            }
-            self.save_commands()
-
-    def get_commands_list(self):
-        """Возвращает список всех доступных команд"""
-        if not self.commands:
-            return "Команды не настроены. Добавьте команды через интерфейс!"
-
-        command_list = []
-        for command in sorted(self.commands.keys()):
-            command_list.append(f"!{command}")
-
-        return f"Доступные команды: {', '.join(command_list)}"
-
     def setup_styles(self):
         """Настройка стилей для современного вида"""
         style = ttk.Style()
@@ -156,6 +175,9 @@ class TwitchChatBot:
         # Вкладка логов
         self.create_logs_tab()
 
+        # Вкладка статистики
+        self.create_stats_tab()
+
     def create_connection_tab(self):
         """Создание вкладки подключения"""
         connection_frame = ttk.Frame(self.notebook)
@@ -198,10 +220,10 @@ class TwitchChatBot:
         oauth_entry.pack(fill='x', pady=(0, 15), ipady=8)
         self.setup_paste_support(oauth_entry)
 
-        # Канал
-        tk.Label(card_content, text="📺 Канал:", bg='#18181b', fg='#adadb8',
+        # Каналы
+        tk.Label(card_content, text="📺 Каналы (через запятую):", bg='#18181b', fg='#adadb8',
                  font=('Segoe UI', 10, 'bold')).pack(anchor='w', pady=(0, 5))
-        self.channel_var = tk.StringVar(value=self.config.get('channel', ''))
+        self.channel_var = tk.StringVar(value=', '.join(self.core.config_channels()))
         channel_entry = tk.Entry(card_content, textvariable=self.channel_var,
                                  font=('Segoe UI', 10), bg='#26262c', fg='white',
                                  insertbackground='#9146ff', relief='flat', bd=0,
@@ -235,6 +257,12 @@ class TwitchChatBot:
                                      bg='#18181b', fg='#f13c20', font=('Segoe UI', 10, 'bold'))
         self.status_label.pack(anchor='w')
 
+        self.queue_stats_label = tk.Label(status_content, text="📤 Очередь отправки: 0",
+                                          bg='#18181b', fg='#adadb8', font=('Segoe UI', 9),
+                                          wraplength=280, justify='left')
+        self.queue_stats_label.pack(anchor='w', pady=(8, 0))
+        self.update_queue_stats()
+
         # Инструкция в правой колонке
         instruction_card = tk.Frame(right_column, bg='#18181b', relief='flat', bd=0)
         instruction_card.pack(fill='both', expand=True)
@@ -306,7 +334,7 @@ class TwitchChatBot:
         list_content.pack(fill='both', expand=True, padx=20, pady=20)
 
         # Создание Treeview с современным стилем
-        columns = ('Команда', 'Ответ', 'Использований')
+        columns = ('Команда', 'Ответ', 'Каналы', 'Использований')
         self.commands_tree = ttk.Treeview(list_content, columns=columns, show='headings', height=18)
 
         # Настройка стиля Treeview
@@ -324,10 +352,12 @@ class TwitchChatBot:
         # Настройка заголовков
         self.commands_tree.heading('Команда', text='🎯 Команда')
         self.commands_tree.heading('Ответ', text='💬 Ответ')
+        self.commands_tree.heading('Каналы', text='📺 Каналы')
         self.commands_tree.heading('Использований', text='📊 Счетчик')
 
         self.commands_tree.column('Команда', width=150)
-        self.commands_tree.column('Ответ', width=350)
+        self.commands_tree.column('Ответ', width=250)
+        self.commands_tree.column('Каналы', width=100)
         self.commands_tree.column('Использований', width=100)
 
         # Скроллбар с современным стилем
@@ -339,7 +369,8 @@ class TwitchChatBot:
         scrollbar.pack(side='right', fill='y')
 
         # Загрузка команд в список
-        self.refresh_commands_list()
+        self.commands_view = KeyedTreeView(self.commands_tree, self.commands, self.command_row)
+        self.commands_view.repaint()
 
     def create_auto_messages_tab(self):
         """Создание вкладки автосообщений"""
@@ -394,16 +425,18 @@ class TwitchChatBot:
         list_content.pack(fill='both', expand=True, padx=20, pady=20)
 
         # Создание Treeview для автосообщений
-        columns = ('Сообщение', 'Интервал (мин)', 'Статус', 'Отправлено')
+        columns = ('Сообщение', 'Интервал (мин)', 'Каналы', 'Статус', 'Отправлено')
         self.auto_messages_tree = ttk.Treeview(list_content, columns=columns, show='headings', height=15)
 
         # Настройка заголовков
         self.auto_messages_tree.heading('Сообщение', text='💬 Сообщение')
         self.auto_messages_tree.heading('Интервал (мин)', text='⏱️ Интервал')
+        self.auto_messages_tree.heading('Каналы', text='📺 Каналы')
         self.auto_messages_tree.heading('Статус', text='📊 Статус')
         self.auto_messages_tree.heading('Отправлено', text='📈 Отправлено')
 
-        self.auto_messages_tree.column('Сообщение', width=300)
+        self.auto_messages_tree.column('Сообщение', width=220)
+        self.auto_messages_tree.column('Каналы', width=80)
         self.auto_messages_tree.column('Интервал (мин)', width=100)
         self.auto_messages_tree.column('Статус', width=80)
         self.auto_messages_tree.column('Отправлено', width=80)
@@ -417,7 +450,8 @@ class TwitchChatBot:
         auto_scrollbar.pack(side='right', fill='y')
 
         # Загрузка автосообщений в список
-        self.refresh_auto_messages_list()
+        self.auto_messages_view = KeyedTreeView(self.auto_messages_tree, self.auto_messages, self.auto_message_row)
+        self.auto_messages_view.repaint()
 
     def create_logs_tab(self):
         """Создание вкладки логов"""
@@ -443,6 +477,16 @@ class TwitchChatBot:
         ttk.Button(header_frame, text="🗑️ Очистить",
                    command=self.clear_logs, style='Danger.TButton').pack(side='right')
 
+        # Уровень логирования
+        self.log_level_var = tk.StringVar(value=str(self.config.get('log_level', 'info')).lower())
+        log_level_box = ttk.Combobox(header_frame, textvariable=self.log_level_var,
+                                     values=list(LEVELS), state='readonly', width=8)
+        log_level_box.pack(side='right', padx=(0, 10))
+        log_level_box.bind('<<ComboboxSelected>>', self.on_log_level_changed)
+
+        # Поиск по архиву чата
+        self.create_archive_search(main_container)
+
         # Область логов с современным дизайном
         logs_card = tk.Frame(main_container, bg='#18181b', relief='flat', bd=0)
         logs_card.pack(fill='both', expand=True)
@@ -450,7 +494,7 @@ class TwitchChatBot:
         logs_content = tk.Frame(logs_card, bg='#18181b')
         logs_content.pack(fill='both', expand=True, padx=20, pady=20)
 
-        self.logs_text = scrolledtext.ScrolledText(logs_content, height=22, width=80,
+        self.logs_text = scrolledtext.ScrolledText(logs_content, height=14, width=80,
                                                    bg='#26262c', fg='#ffffff',
                                                    font=('Consolas', 9),
                                                    insertbackground='#9146ff',
@@ -461,93 +505,220 @@ class TwitchChatBot:
 
         # Добавление начального сообщения
         self.add_log("🚀 Приложение запущено")
+        self.flush_logs()
 
-    def load_config(self):
-        """Загрузка конфигурации"""
-        try:
-            if os.path.exists('config.json'):
-                with open('config.json', 'r', encoding='utf-8') as f:
-                    return json.load(f)
-        except Exception as e:
-            self.add_log(f"Ошибка загрузки конфигурации: {e}")
-        return {}
+    def create_stats_tab(self):
+        """Создание вкладки статистики (метрики ядра, обновление раз в секунду)"""
+        stats_frame = ttk.Frame(self.notebook)
+        self.notebook.add(stats_frame, text="📊 Статистика")
+
+        main_container = tk.Frame(stats_frame, bg='#0e0e10')
+        main_container.pack(fill='both', expand=True)
+
+        stats_card = tk.Frame(main_container, bg='#18181b', relief='flat', bd=0)
+        stats_card.pack(fill='x')
+
+        stats_content = tk.Frame(stats_card, bg='#18181b')
+        stats_content.pack(fill='x', padx=20, pady=15)
+
+        tk.Label(stats_content, text="📊 Производительность", bg='#18181b', fg='#ffffff',
+                 font=('Segoe UI', 12, 'bold')).pack(anchor='w', pady=(0, 10))
+
+        self.stats_labels = {}
+        for key in ('lines', 'parse', 'reply', 'queue', 'commands', 'auto', 'connection', 'storage'):
+            label = tk.Label(stats_content, text="", bg='#18181b', fg='#adadb8',
+                             font=('Consolas', 10), anchor='w', justify='left')
+            label.pack(fill='x', pady=2)
+            self.stats_labels[key] = label
+
+        self._last_stats = None
+        self.update_stats()
+
+    def update_stats(self):
+        """Периодическое обновление вкладки статистики"""
+        snapshot = self.core.metrics.snapshot()
+        now = time.monotonic()
+        rate = 0.0
+        if self._last_stats:
+            last_time, last_lines = self._last_stats
+            if now > last_time:
+                rate = (snapshot['lines_received_total'] - last_lines) / (now - last_time)
+        self._last_stats = (now, snapshot['lines_received_total'])
+
+        def ms(value):
+            return '∞' if value == float('inf') else f"{value * 1000:.2f}"
+
+        parse = snapshot['parse_seconds']
+        reply = snapshot['reply_latency_seconds']
+        flush = snapshot['persistence_flush_seconds']
+        lateness = snapshot['auto_message_lateness_seconds']
+        texts = {
+            'lines': f"📥 Входящие: {rate:.1f} строк/с, всего {snapshot['lines_received_total']} "
+                     f"({snapshot['bytes_received_total'] / 1024:.0f} КБ)",
+            'parse': f"🧩 Разбор строки: p50 {parse['p50'] * 1e6:.1f} мкс, p99 {parse['p99'] * 1e6:.1f} мкс",
+            'reply': f"💬 Задержка ответа: p50 {ms(reply['p50'])} мс, p99 {ms(reply['p99'])} мс "
+                     f"({reply['count']} ответов)",
+            'queue': f"📤 Очередь: {snapshot['outbound_queue_depth']}, отправлено {snapshot['outbound_sent_total']}, "
+                     f"ограничено лимитом {snapshot['outbound_rate_limited_total']}, "
+                     f"отброшено {snapshot['outbound_dropped_total']}",
+            'commands': f"⚡ Команды: {snapshot['commands_total']}, на кулдауне {snapshot['commands_cooldown_total']}, "
+                        f"модерация {snapshot['moderation_actions_total']}",
+            'auto': f"⏰ Автосообщения: {lateness['count']}, опоздание p50 {ms(lateness['p50'])} мс, "
+                    f"p99 {ms(lateness['p99'])} мс",
+            'connection': f"🔗 Подключение: {'да' if snapshot['connected'] else 'нет'}, "
+                          f"переподключений {snapshot['reconnects_total']}",
+            'storage': f"💾 Запись данных: {flush['count']} раз, p99 {ms(flush['p99'])} мс; "
+                       f"архив {snapshot['archive_written_total']} (потеряно {snapshot['archive_dropped_total']})",
+        }
+        for key, text in texts.items():
+            self.stats_labels[key].config(text=text)
+        self.root.after(1000, self.update_stats)
+
+    def create_archive_search(self, parent):
+        """Панель поиска по архиву чата (пользователь, команда, текст, период)"""
+        search_card = tk.Frame(parent, bg='#18181b', relief='flat', bd=0)
+        search_card.pack(fill='x', pady=(0, 15))
+
+        search_content = tk.Frame(search_card, bg='#18181b')
+        search_content.pack(fill='x', padx=20, pady=15)
+
+        fields_frame = tk.Frame(search_content, bg='#18181b')
+        fields_frame.pack(fill='x')
+
+        tk.Label(fields_frame, text="🔎 Архив:", bg='#18181b', fg='#ffffff',
+                 font=('Segoe UI', 10, 'bold')).pack(side='left', padx=(0, 8))
+
+        self.search_vars = {}
+        for key, label in (('user', 'Ник'), ('command', 'Команда'), ('text', 'Текст')):
+            tk.Label(fields_frame, text=label, bg='#18181b', fg='#adadb8',
+                     font=('Segoe UI', 9)).pack(side='left')
+            var = tk.StringVar()
+            entry = tk.Entry(fields_frame, textvariable=var, width=10,
+                             font=('Segoe UI', 9), bg='#26262c', fg='white',
+                             insertbackground='#9146ff', relief='flat', bd=0,
+                             highlightthickness=1, highlightcolor='#9146ff',
+                             highlightbackground='#3a3a3d')
+            entry.pack(side='left', padx=(4, 8), ipady=4)
+            entry.bind('<Return>', lambda event: self.search_archive())
+            self.setup_paste_support(entry)
+            self.search_vars[key] = var
+
+        self.search_period_var = tk.StringVar(value='неделя')
+        ttk.Combobox(fields_frame, textvariable=self.search_period_var, state='readonly', width=7,
+                     values=list(SEARCH_PERIODS)).pack(side='left', padx=(0, 8))
+
+        self.search_btn = ttk.Button(fields_frame, text="Найти", command=self.search_archive,
+                                     style='Custom.TButton')
+        self.search_btn.pack(side='right')
+
+        self.search_results = scrolledtext.ScrolledText(search_content, height=6, width=80,
+                                                        bg='#26262c', fg='#ffffff',
+                                                        font=('Consolas', 9),
+                                                        selectbackground='#9146ff',
+                                                        relief='flat', bd=0)
+        self.search_results.pack(fill='x', pady=(10, 0))
+
+    def search_archive(self):
+        """Поиск в фоновом потоке, результаты выводятся по мере нахождения"""
+        directory = self.core.archive_directory
+        if not os.path.isdir(directory):
+            messagebox.showinfo("Архив", "Архив чата пуст. Включите \"archive\" в config.json.")
+            return
+
+        query = {key: var.get().strip() or None for key, var in self.search_vars.items()}
+        since = SEARCH_PERIODS.get(self.search_period_var.get())
+        prefixes = self.config.get('command_prefixes', ['!'])
+
+        self.search_results.delete('1.0', 'end')
+        self.search_btn.config(state='disabled')
+
+        def worker():
+            found = 0
+            try:
+                index = ArchiveIndex(directory, prefixes)
+                try:
+                    index.update()
+                    batch = []
+                    for channel, record in index.search(since=since, limit=500, newest_first=True, **query):
+                        batch.append(format_record(record, channel) + '\n')
+                        found += 1
+                        if len(batch) >= 50:
+                            self.bridge.post(self.show_search_results, ''.join(batch))
+                            batch = []
+                    if batch:
+                        self.bridge.post(self.show_search_results, ''.join(batch))
+                finally:
+                    index.close()
+                summary = f"Найдено: {found}" + (" (показаны последние 500)" if found >= 500 else "")
+            except Exception as e:
+                summary = f"Ошибка поиска: {e}"
+            self.bridge.post(self.finish_archive_search, summary)
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def show_search_results(self, text):
+        self.search_results.insert('end', text)
+
+    def finish_archive_search(self, summary):
+        self.search_results.insert('end', f"— {summary}\n")
+        self.search_btn.config(state='normal')
 
     def save_config(self):
         """Сохранение конфигурации"""
         try:
-            config = {
-                'oauth_token': self.oauth_var.get(),
-                'channel': self.channel_var.get()
-            }
-            with open('config.json', 'w', encoding='utf-8') as f:
-                json.dump(config, f, ensure_ascii=False, indent=2)
+            self.config['oauth_token'] = self.oauth_var.get()
+            channels = parse_channels(self.channel_var.get())
+            self.config['channels'] = channels
+            self.config['channel'] = channels[0] if channels else ''
+            self.core.save_config()
             messagebox.showinfo("Успех", "Настройки сохранены!")
             self.add_log("Настройки сохранены")
         except Exception as e:
             messagebox.showerror("Ошибка", f"Не удалось сохранить настройки: {e}")
             self.add_log(f"Ошибка сохранения настроек: {e}")
 
-    def load_commands(self):
-        """Загрузка команд"""
-        try:
-            if os.path.exists('commands.json'):
-                with open('commands.json', 'r', encoding='utf-8') as f:
-                    return json.load(f)
-        except Exception as e:
-            self.add_log(f"Ошибка загрузки команд: {e}")
-        return {}
-
-    def save_commands(self):
+    def save_commands(self, command=None):
         """Сохранение команд"""
-        try:
-            with open('commands.json', 'w', encoding='utf-8') as f:
-                json.dump(self.commands, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            self.add_log(f"Ошибка сохранения команд: {e}")
+        self.core.save_commands(command)
 
-    def load_auto_messages(self):
-        """Загрузка автосообщений"""
-        try:
-            if os.path.exists('auto_messages.json'):
-                with open('auto_messages.json', 'r', encoding='utf-8') as f:
-                    return json.load(f)
-        except Exception as e:
-            self.add_log(f"Ошибка загрузки автосообщений: {e}")
-        return {}
-
-    def save_auto_messages(self):
+    def save_auto_messages(self, msg_id=None):
         """Сохранение автосообщений"""
-        try:
-            with open('auto_messages.json', 'w', encoding='utf-8') as f:
-                json.dump(self.auto_messages, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            self.add_log(f"Ошибка сохранения автосообщений: {e}")
-
-    def refresh_commands_list(self):
-        """Обновление списка команд"""
-        # Очистка списка
-        for item in self.commands_tree.get_children():
-            self.commands_tree.delete(item)
-
-        # Добавление команд
-        for command, data in self.commands.items():
-            response = data.get('response', '')
-            usage_count = data.get('usage_count', 0)
-            self.commands_tree.insert('', 'end', values=(command, response, usage_count))
-
-    def refresh_auto_messages_list(self):
-        """Обновление списка автосообщений"""
-        # Очистка списка
-        for item in self.auto_messages_tree.get_children():
-            self.auto_messages_tree.delete(item)
-
-        # Добавление автосообщений
-        for msg_id, data in self.auto_messages.items():
-            message = data.get('message', '')[:50] + ('...' if len(data.get('message', '')) > 50 else '')
-            interval = data.get('interval', 0)
-            enabled = "✅ Вкл" if data.get('enabled', True) else "❌ Выкл"
-            sent_count = data.get('sent_count', 0)
-            self.auto_messages_tree.insert('', 'end', values=(message, interval, enabled, sent_count))
+        self.core.save_auto_messages(msg_id)
+
+    def refresh_commands_list(self, command=None):
+        """Обновление строки команды (или всего списка) при следующей перерисовке"""
+        self.commands_view.invalidate(command)
+
+    def refresh_auto_messages_list(self, msg_id=None):
+        """Обновление строки автосообщения (или всего списка) при следующей перерисовке"""
+        self.auto_messages_view.invalidate(msg_id)
+
+    def command_row(self, command, data):
+        """Значения колонок списка команд"""
+        return (command, data.get('response', ''), self.format_channels(data), data.get('usage_count', 0))
+
+    def auto_message_row(self, msg_id, data):
+        """Значения колонок списка автосообщений"""
+        message = data.get('message', '')[:50] + ('...' if len(data.get('message', '')) > 50 else '')
+        interval = data.get('interval', 0)
+        channels = self.format_channels(data)
+        enabled = "✅ Вкл" if data.get('enabled', True) else "❌ Выкл"
+        sent_count = data.get('sent_count', 0)
+        return (message, interval, channels, enabled, sent_count)
+
+    def format_channels(self, data):
+        """Каналы команды или автосообщения для отображения в списке"""
+        channels = data.get('channels')
+        return ', '.join(channels) if channels else 'все'
+
+    def update_queue_stats(self):
+        """Периодическое обновление метрик очереди отправки"""
+        stats = self.core.outbound_stats()
+        self.queue_stats_label.config(
+            text=(f"📤 Очередь отправки: {stats['depth']} (макс. {stats['max_depth']}), "
+                  f"ожидание: {stats['avg_wait'] * 1000:.0f} мс ср. / {stats['max_wait'] * 1000:.0f} мс макс., "
+                  f"пропущено: {stats['dropped']}"))
+        self.root.after(1000, self.update_queue_stats)
 
     def add_command(self):
         """Добавление новой команды"""
@@ -555,33 +726,28 @@ class TwitchChatBot:
 
     def edit_command(self):
         """Редактирование команды"""
-        selected = self.commands_tree.selection()
-        if not selected:
+        command = self.commands_view.selected_key()
+        if command is None:
             messagebox.showwarning("Предупреждение", "Выберите команду для редактирования")
             return
 
-        item = self.commands_tree.item(selected[0])
-        command = item['values'][0]
         self.command_dialog(command)
 
     def delete_command(self):
         """Удаление команды"""
-        selected = self.commands_tree.selection()
-        if not selected:
+        command = self.commands_view.selected_key()
+        if command is None:
             messagebox.showwarning("Предупреждение", "Выберите команду для удаления")
             return
 
-        item = self.commands_tree.item(selected[0])
-        command = item['values'][0]
-
         if command == 'commands':
             messagebox.showwarning("Предупреждение", "Команда !commands является системной и не может быть удалена")
             return
 
         if messagebox.askyesno("Подтверждение", f"Удалить команду '{command}'?"):
             del self.commands[command]
-            self.save_commands()
-            self.refresh_commands_list()
+            self.save_commands(command)
+            self.refresh_commands_list(command)
             self.add_log(f"Команда '{command}' удалена")
 
     def add_auto_message(self):
@@ -590,37 +756,32 @@ class TwitchChatBot:
 
     def edit_auto_message(self):
         """Редактирование автосообщения"""
-        selected = self.auto_messages_tree.selection()
-        if not selected:
+        msg_id = self.auto_messages_view.selected_key()
+        if msg_id is None:
             messagebox.showwarning("Предупреждение", "Выберите автосообщение для редактирования")
             return
 
-        # Получаем индекс выбранного элемента
-        item_index = self.auto_messages_tree.index(selected[0])
-        msg_id = list(self.auto_messages.keys())[item_index]
         self.auto_message_dialog(msg_id)
 
     def delete_auto_message(self):
         """Удаление автосообщения"""
-        selected = self.auto_messages_tree.selection()
-        if not selected:
+        msg_id = self.auto_messages_view.selected_key()
+        if msg_id is None:
             messagebox.showwarning("Предупреждение", "Выберите автосообщение для удаления")
             return
 
-        item_index = self.auto_messages_tree.index(selected[0])
-        msg_id = list(self.auto_messages.keys())[item_index]
-
         if messagebox.askyesno("Подтверждение", "Удалить выбранное автосообщение?"):
             del self.auto_messages[msg_id]
-            self.save_auto_messages()
-            self.refresh_auto_messages_list()
+            self.save_auto_messages(msg_id)
+            self.core.reschedule_auto_message(msg_id)
+            self.refresh_auto_messages_list(msg_id)
             self.add_log(f"Автосообщение удалено")
 
     def command_dialog(self, edit_command=None):
         """Диалог добавления/редактирования команды"""
         dialog = tk.Toplevel(self.root)
         dialog.title("Добавить команду" if not edit_command else "Редактировать команду")
-        dialog.geometry("450x400")
+        dialog.geometry("450x650")
         dialog.configure(bg='#0e0e10')
         dialog.resizable(False, False)
 
@@ -658,22 +819,74 @@ class TwitchChatBot:
         self.setup_paste_support(command_entry)
 
         tk.Label(card_content, text="💬 Ответ бота:", bg='#18181b', fg='#adadb8',
-                 font=('Segoe UI', 10, 'bold')).pack(anchor='w', pady=(0, 5))
+                 font=('Segoe UI', 10, 'bold')).pack(anchor='w', pady=(0, 2))
+        tk.Label(card_content, text="{user} {count} {args} {uptime} {random:а|б|в}", bg='#18181b', fg='#6b6b75',
+                 font=('Segoe UI', 8)).pack(anchor='w', pady=(0, 5))
         response_text = tk.Text(card_content, width=45, height=5,
                                 font=('Segoe UI', 10), bg='#26262c', fg='white',
                                 insertbackground='#9146ff', relief='flat', bd=0, wrap='word',
                                 highlightthickness=2, highlightcolor='#9146ff',
                                 highlightbackground='#3a3a3d')
-        response_text.pack(fill='x', pady=(0, 20))
+        response_text.pack(fill='x', pady=(0, 15))
         self.setup_text_paste_support(response_text)
 
+        tk.Label(card_content, text="📺 Каналы (через запятую, пусто - все):", bg='#18181b', fg='#adadb8',
+                 font=('Segoe UI', 10, 'bold')).pack(anchor='w', pady=(0, 5))
+        channels_var = tk.StringVar()
+        channels_entry = tk.Entry(card_content, textvariable=channels_var,
+                                  font=('Segoe UI', 10), bg='#26262c', fg='white',
+                                  insertbackground='#9146ff', relief='flat', bd=0,
+                                  highlightthickness=2, highlightcolor='#9146ff',
+                                  highlightbackground='#3a3a3d')
+        channels_entry.pack(fill='x', pady=(0, 15), ipady=8)
+        self.setup_paste_support(channels_entry)
+
+        tk.Label(card_content, text="🔁 Синонимы (через запятую, можно из нескольких слов):", bg='#18181b',
+                 fg='#adadb8', font=('Segoe UI', 10, 'bold')).pack(anchor='w', pady=(0, 5))
+        aliases_var = tk.StringVar()
+        aliases_entry = tk.Entry(card_content, textvariable=aliases_var,
+                                 font=('Segoe UI', 10), bg='#26262c', fg='white',
+                                 insertbackground='#9146ff', relief='flat', bd=0,
+                                 highlightthickness=2, highlightcolor='#9146ff',
+                                 highlightbackground='#3a3a3d')
+        aliases_entry.pack(fill='x', pady=(0, 15), ipady=8)
+        self.setup_paste_support(aliases_entry)
+
+        # Кулдауны в секундах: команды, одного зрителя и общий для всех команд
+        tk.Label(card_content, text="⏱️ Кулдаун, сек (команда / зритель / общий):", bg='#18181b', fg='#adadb8',
+                 font=('Segoe UI', 10, 'bold')).pack(anchor='w', pady=(0, 5))
+        cooldowns_frame = tk.Frame(card_content, bg='#18181b')
+        cooldowns_frame.pack(fill='x', pady=(0, 20))
+        cooldown_var = tk.StringVar(value=str(self.config.get('default_cooldown', 0)))
+        user_cooldown_var = tk.StringVar(value=str(self.config.get('default_user_cooldown', 0)))
+        global_cooldown_var = tk.StringVar(value=str(self.config.get('global_cooldown', 0)))
+        cooldown_entries = []
+        for var in (cooldown_var, user_cooldown_var, global_cooldown_var):
+            entry = tk.Entry(cooldowns_frame, textvariable=var, width=8,
+                             font=('Segoe UI', 10), bg='#26262c', fg='white',
+                             insertbackground='#9146ff', relief='flat', bd=0,
+                             highlightthickness=2, highlightcolor='#9146ff',
+                             highlightbackground='#3a3a3d')
+            entry.pack(side='left', fill='x', expand=True, padx=(0, 8), ipady=8)
+            self.setup_paste_support(entry)
+            cooldown_entries.append(entry)
+
+        # Если редактируем, заполняем поля
+        if edit_command and edit_command in self.commands:
+            data = self.commands[edit_command]
+            response_text.insert('1.0', data.get('response', ''))
+            channels_var.set(', '.join(data.get('channels', [])))
+            aliases_var.set(', '.join(data.get('aliases', [])))
+            cooldown_var.set(str(data.get('cooldown', 0)))
+            user_cooldown_var.set(str(data.get('user_cooldown', 0)))
+
         # Кнопки с современным дизайном
         buttons_frame = tk.Frame(card_content, bg='#18181b', height=50)
         buttons_frame.pack(fill='x', pady=(15, 0))
         buttons_frame.pack_propagate(False)
 
         def save_command():
-            command = command_var.get().strip()
+            command = ' '.join(command_var.get().split())
             response = response_text.get('1.0', 'end-1c').strip()
 
             if not command:
@@ -686,13 +899,45 @@ class TwitchChatBot:
                 response_text.focus()
                 return
 
+            cooldowns = []
+            for var, entry in zip((cooldown_var, user_cooldown_var, global_cooldown_var), cooldown_entries):
+                try:
+                    value = float(var.get().strip().replace(',', '.') or 0)
+                except ValueError:
+                    value = -1
+                if value < 0:
+                    messagebox.showwarning("Предупреждение", "Кулдаун должен быть неотрицательным числом")
+                    entry.focus()
+                    return
+                cooldowns.append(int(value) if value.is_integer() else value)
+            cooldown, user_cooldown, global_cooldown = cooldowns
+
+            aliases = parse_aliases(aliases_var.get())
+            conflicts = trigger_conflicts(command, aliases, self.commands)
+            if conflicts:
+                taken = ', '.join(f"'{alias}' (команда '{other}')" for alias, other in conflicts)
+                messagebox.showwarning("Предупреждение", f"Синонимы уже заняты: {taken}")
+                aliases_entry.focus()
+                return
+
             # Сохранение команды
             if command not in self.commands:
                 self.commands[command] = {'usage_count': 0}
 
             self.commands[command]['response'] = response
-            self.save_commands()
-            self.refresh_commands_list()
+            self.commands[command]['channels'] = parse_channels(channels_var.get())
+            self.commands[command]['aliases'] = aliases
+            self.commands[command]['cooldown'] = cooldown
+            self.commands[command]['user_cooldown'] = user_cooldown
+            self.save_commands(command)
+
+            if global_cooldown != self.config.get('global_cooldown', 0):
+                self.config['global_cooldown'] = global_cooldown
+                try:
+                    self.core.save_config()
+                except Exception as e:
+                    self.add_log(f"Ошибка сохранения настроек: {e}")
+            self.refresh_commands_list(command)
 
             action = "обновлена" if edit_command else "добавлена"
             self.add_log(f"✅ Команда '{command}' {action}")
@@ -750,7 +995,7 @@ class TwitchChatBot:
         """Диалог добавления/редактирования автосообщения"""
         dialog = tk.Toplevel(self.root)
         dialog.title("Добавить автосообщение" if not edit_msg_id else "Редактировать автосообщение")
-        dialog.geometry("500x450")
+        dialog.geometry("500x530")
         dialog.configure(bg='#0e0e10')
         dialog.resizable(False, False)
 
@@ -797,6 +1042,17 @@ class TwitchChatBot:
         interval_entry.pack(fill='x', pady=(0, 15), ipady=8)
         self.setup_paste_support(interval_entry)
 
+        tk.Label(card_content, text="📺 Каналы (через запятую, пусто - все):", bg='#18181b', fg='#adadb8',
+                 font=('Segoe UI', 10, 'bold')).pack(anchor='w', pady=(0, 5))
+        channels_var = tk.StringVar()
+        channels_entry = tk.Entry(card_content, textvariable=channels_var,
+                                  font=('Segoe UI', 10), bg='#26262c', fg='white',
+                                  insertbackground='#9146ff', relief='flat', bd=0,
+                                  highlightthickness=2, highlightcolor='#9146ff',
+                                  highlightbackground='#3a3a3d')
+        channels_entry.pack(fill='x', pady=(0, 15), ipady=8)
+        self.setup_paste_support(channels_entry)
+
         # Чекбокс активности
         enabled_var = tk.BooleanVar(value=True)
         enabled_check = tk.Checkbutton(card_content, text="Включить автосообщение",
@@ -811,6 +1067,7 @@ class TwitchChatBot:
             message_text.insert('1.0', data.get('message', ''))
             interval_var.set(str(data.get('interval', 5)))
             enabled_var.set(data.get('enabled', True))
+            channels_var.set(', '.join(data.get('channels', [])))
 
         # Кнопки
         buttons_frame = tk.Frame(card_content, bg='#18181b', height=50)
@@ -846,13 +1103,15 @@ class TwitchChatBot:
             self.auto_messages[msg_id] = {
                 'message': message,
                 'interval': interval,
+                'channels': parse_channels(channels_var.get()),
                 'enabled': enabled_var.get(),
                 'sent_count': self.auto_messages.get(msg_id, {}).get('sent_count', 0),
                 'last_sent': 0
             }
 
-            self.save_auto_messages()
-            self.refresh_auto_messages_list()
+            self.save_auto_messages(msg_id)
+            self.core.reschedule_auto_message(msg_id)
+            self.refresh_auto_messages_list(msg_id)
 
             action = "обновлено" if edit_msg_id else "добавлено"
             self.add_log(f"✅ Автосообщение {action}")
@@ -916,122 +1175,53 @@ class TwitchChatBot:
             messagebox.showwarning("Предупреждение", "Добавьте хотя бы одно автосообщение!")
             return
 
-        if self.auto_messages_enabled:
+        if self.core.auto_messages_enabled:
             self.stop_auto_messages_func()
         else:
             self.start_auto_messages_func()
 
     def start_auto_messages_func(self):
         """Запуск автосообщений"""
-        self.auto_messages_enabled = True
-        self.stop_auto_messages = False
-
-        # Запуск потока автосообщений
-        self.auto_messages_thread = threading.Thread(target=self.auto_messages_loop, daemon=True)
-        self.auto_messages_thread.start()
+        self.core.start_auto_messages()
 
         self.auto_messages_status_label.config(text="🟢 Запущено", fg='#00f593')
         self.toggle_auto_messages_btn.config(text="⏸️ Остановить", style='Danger.TButton')
 
-        self.add_log("🚀 Автосообщения запущены")
-
     def stop_auto_messages_func(self):
         """Остановка автосообщений"""
-        self.auto_messages_enabled = False
-        self.stop_auto_messages = True
+        if self.core.auto_messages_enabled:
+            self.core.stop_auto_messages()
 
         self.auto_messages_status_label.config(text="⭕ Остановлено", fg='#f13c20')
         self.toggle_auto_messages_btn.config(text="▶️ Запустить", style='Success.TButton')
 
-        self.add_log("⏸️ Автосообщения остановлены")
-
-    def auto_messages_loop(self):
-        """Основной цикл автосообщений"""
-        while not self.stop_auto_messages and self.auto_messages_enabled:
-            try:
-                current_time = time.time()
-
-                for msg_id, data in self.auto_messages.items():
-                    if not data.get('enabled', True):
-                        continue
-
-                    interval_seconds = data.get('interval', 5) * 60  # Конвертируем минуты в секунды
-                    last_sent = data.get('last_sent', 0)
-
-                    # Проверяем, пора ли отправлять сообщение
-                    if current_time - last_sent >= interval_seconds:
-                        if self.connected and self.socket:
-                            message = data.get('message', '')
-                            self.send_message(message)
-
-                            # Обновляем статистику
-                            self.auto_messages[msg_id]['last_sent'] = current_time
-                            self.auto_messages[msg_id]['sent_count'] = data.get('sent_count', 0) + 1
-
-                            self.save_auto_messages()
-
-                            # Обновляем UI
-                            self.root.after(0, self.refresh_auto_messages_list)
-
-                            self.add_log(f"📤 Автосообщение отправлено: {message[:50]}...")
-
-                time.sleep(10)  # Проверяем каждые 10 секунд
-
-            except Exception as e:
-                self.add_log(f"❌ Ошибка в цикле автосообщений: {e}")
-                break
-
     def connect_to_twitch(self):
         """Подключение к Twitch"""
         oauth_token = self.oauth_var.get().strip()
-        channel = self.channel_var.get().strip()
+        channels = parse_channels(self.channel_var.get())
 
-        if not all([oauth_token, channel]):
+        if not all([oauth_token, channels]):
             messagebox.showerror("Ошибка", "Заполните все поля подключения")
             return
 
-        if not oauth_token.startswith('oauth:'):
-            oauth_token = f'oauth:{oauth_token}'
-
         try:
-            self.socket = socket.socket()
-            self.socket.connect(('irc.chat.twitch.tv', 6667))
-            self.socket.send(f"PASS {oauth_token}\n".encode('utf-8'))
-            self.socket.send(f"NICK {channel}\n".encode('utf-8'))
-            self.socket.send(f"JOIN #{channel}\n".encode('utf-8'))
-
-            self.connected = True
-            self.stop_bot = False
-
-            # Запуск потока для чтения сообщений
-            self.bot_thread = threading.Thread(target=self.bot_loop, daemon=True)
-            self.bot_thread.start()
+            self.core.connect(oauth_token, channels)
 
             self.status_label.config(text="🟢 Подключен", fg='#00f593')
             self.connect_btn.config(text="🔌 Отключиться", style='Danger.TButton')
 
-            self.add_log(f"🚀 Подключен к каналу #{channel}")
-
         except Exception as e:
             messagebox.showerror("Ошибка", f"Не удалось подключиться: {e}")
             self.add_log(f"❌ Ошибка подключения: {e}")
 
     def disconnect_from_twitch(self):
         """Отключение от Twitch"""
-        self.stop_bot = True
-        self.connected = False
-
-        if self.socket:
-            try:
-                self.socket.close()
-            except:
-                pass
+        self.core.disconnect()
+        self.stop_auto_messages_func()
 
         self.status_label.config(text="⭕ Не подключен", fg='#f13c20')
         self.connect_btn.config(text="🚀 Подключиться", style='Success.TButton')
 
-        self.add_log("🔌 Отключен от Twitch")
-
     def toggle_connection(self):
         """Переключение состояния подключения"""
         if self.connected:
@@ -1039,112 +1229,48 @@ class TwitchChatBot:
         else:
             self.connect_to_twitch()
 
-    def bot_loop(self):
-        """Основной цикл бота"""
-        while not self.stop_bot and self.connected:
-            try:
-                response = self.socket.recv(1024).decode('utf-8')
-
-                if response.strip():
-                    self.add_log(f"[DEBUG] IRC: {response.strip()}")
-
-                if response.startswith('PING'):
-                    self.socket.send("PONG\n".encode('utf-8'))
-                    self.add_log("[DEBUG] Отправлен PONG")
-                    continue
-
-                if 'PRIVMSG' in response:
-                    try:
-                        # Более надежный парсинг IRC сообщения
-                        parts = response.strip().split(' ')
-                        if len(parts) >= 4:
-                            # Извлекаем имя пользователя
-                            username = parts[0].split('!')[0][1:] if '!' in parts[0] else parts[0][1:]
-
-                            # Извлекаем сообщение (все после второго двоеточия)
-                            message_start = response.find(':', 1)  # Находим второе двоеточие
-                            if message_start != -1:
-                                message = response[message_start + 1:].strip()
-
-                                self.add_log(f"{username}: {message}")
-
-                                if message.startswith('!'):
-                                    command = message[1:].split()[0].lower()
-                                    self.add_log(f"[DEBUG] Обнаружена команда: '{command}'")
-
-                                    if command == 'commands':
-                                        response_text = self.get_commands_list()
-                                        self.add_log(f"[DEBUG] Генерируем список команд: {response_text}")
-
-                                        # Отправляем ответ
-                                        self.send_message(response_text)
-
-                                        # Увеличение счетчика использований
-                                        if 'commands' in self.commands:
-                                            self.commands['commands']['usage_count'] += 1
-                                            self.save_commands()
-                                            # Обновление списка команд в UI (в основном потоке)
-                                            self.root.after(0, self.refresh_commands_list)
-
-                                        self.add_log(f"✅ Ответил на команду !commands: {response_text}")
-
-                                    elif command in self.commands:
-                                        response_text = self.commands[command]['response']
-                                        self.add_log(f"[DEBUG] Найден ответ для команды '{command}': {response_text}")
-
-                                        # Отправляем ответ
-                                        self.send_message(response_text)
-
-                                        # Увеличение счетчика использований
-                                        self.commands[command]['usage_count'] += 1
-                                        self.save_commands()
-
-                                        # Обновление списка команд в UI (в основном потоке)
-                                        self.root.after(0, self.refresh_commands_list)
-
-                                        self.add_log(f"✅ Ответил на команду !{command}: {response_text}")
-                                    else:
-                                        self.add_log(f"[DEBUG] Команда '{command}' не найдена в списке")
-                                        available_commands = list(self.commands.keys())
-                                        self.add_log(f"[DEBUG] Доступные команды: {available_commands}")
-                            else:
-                                self.add_log("[DEBUG] Не удалось найти сообщение в IRC строке")
-                        else:
-                            self.add_log(f"[DEBUG] Неожиданный формат PRIVMSG: {response.strip()}")
-                    except Exception as parse_error:
-                        self.add_log(f"[ERROR] Ошибка парсинга сообщения: {parse_error}")
-                        self.add_log(f"[ERROR] Проблемная строка: {response.strip()}")
+    @property
+    def connected(self):
+        return self.core.connected
 
-            except Exception as e:
-                if self.connected:
-                    self.add_log(f"❌ Ошибка в цикле бота: {e}")
-                break
+    def on_connection_state(self, state):
+        """Статус во время автоматического переподключения"""
+        if not self.connected:
+            return
+        if state == 'reconnecting':
+            self.status_label.config(text="🟡 Переподключение...", fg='#ffb800')
+        else:
+            self.status_label.config(text="🟢 Подключен", fg='#00f593')
 
-            time.sleep(0.1)
+    def on_connection_lost(self):
+        """Обновление интерфейса после обрыва соединения"""
+        self.stop_auto_messages_func()
+        self.status_label.config(text="⭕ Не подключен", fg='#f13c20')
+        self.connect_btn.config(text="🚀 Подключиться", style='Success.TButton')
 
-    def send_message(self, message):
-        """Отправка сообщения в чат"""
-        if self.connected and self.socket:
-            try:
-                channel = self.channel_var.get().strip()
-                full_message = f"PRIVMSG #{channel} :{message}\n"
-                self.socket.send(full_message.encode('utf-8'))
-                self.add_log(f"[DEBUG] Отправлено: {full_message.strip()}")
-            except Exception as e:
-                self.add_log(f"❌ Ошибка отправки сообщения: {e}")
+    def add_log(self, message, level=INFO):
+        """Добавление записи в лог (безопасно для потоков)"""
+        self.log_buffer.append(message)
+
+    def flush_logs(self):
+        """Вывод накопленных строк лога одной вставкой и обрезка старых"""
+        lines = self.log_buffer.drain()
+        if lines:
+            self.logs_text.insert('end', ''.join(lines))
 
-    def add_log(self, message):
-        """Добавление записи в лог"""
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        log_message = f"[{timestamp}] {message}\n"
+            # В виджете храним не больше log_max_lines строк
+            total = int(self.logs_text.index('end-1c').split('.')[0])
+            if total > self.log_max_lines:
+                self.logs_text.delete('1.0', f'{total - self.log_max_lines + 1}.0')
 
-        # Добавление в UI (безопасно для потоков)
-        self.root.after(0, lambda: self._add_log_to_ui(log_message))
+            self.logs_text.see('end')
+        self.root.after(100, self.flush_logs)
 
-    def _add_log_to_ui(self, message):
-        """Добавление сообщения в UI лога"""
-        self.logs_text.insert('end', message)
-        self.logs_text.see('end')
+    def on_log_level_changed(self, event=None):
+        """Смена уровня логирования из интерфейса"""
+        level = self.log_level_var.get()
+        self.config['log_level'] = level
+        self.core.set_log_level(level)
 
     def clear_logs(self):
         """Очистка логов"""
@@ -1155,8 +1281,7 @@ class TwitchChatBot:
         """Обработка закрытия приложения"""
         if self.connected:
             self.disconnect_from_twitch()
-        if self.auto_messages_enabled:
-            self.stop_auto_messages_func()
+        self.core.shutdown()
         self.root.destroy()
 
     def run(self):
@@ -0,0 +1,173 @@
+import threading
+
+
+def normalize_trigger(text):
+    """Слова триггера без учета регистра (casefold подходит и для кириллицы)"""
+    return text.casefold().split()
+
+
+def parse_aliases(value):
+    """Список синонимов из строки "a, b c" или из списка"""
+    if isinstance(value, str):
+        value = value.split(',')
+    aliases = []
+    for alias in value or []:
+        alias = ' '.join(str(alias).split())
+        if alias and alias not in aliases:
+            aliases.append(alias)
+    return aliases
+
+
+def trigger_conflicts(command, aliases, commands, ignore=()):
+    """Синонимы, которые совпадают с именем или синонимом другой команды
+
+    Возвращает список (синоним, другая команда); ignore - имена, которые
+    не считаются другими (например, прежнее имя переименованной команды).
+    """
+    taken = {}
+    for other, data in list(commands.items()):
+        if other == command or other in ignore:
+            continue
+        for trigger in [other] + parse_aliases(data.get('aliases', [])):
+            taken.setdefault(tuple(normalize_trigger(trigger)), other)
+    conflicts = []
+    for alias in parse_aliases(aliases):
+        other = taken.get(tuple(normalize_trigger(alias)))
+        if other is not None:
+            conflicts.append((alias, other))
+    return conflicts
+
+
+class CommandMatcher:
+    """Префиксное дерево по словам для поиска команды в начале сообщения
+
+    Узел - список [дочерние узлы по слову, команда или None, владельцы].
+    Триггером считается имя команды и каждый ее синоним; триггер может
+    состоять из нескольких слов, побеждает самое длинное совпадение. Время
+    поиска зависит от длины триггера, а не от числа команд.
+
+    Один триггер может принадлежать нескольким командам (синоним совпал с
+    именем другой команды): владельцы узла хранятся словарем {команда:
+    это имя команды}, имя важнее синонима, и после удаления одного из них
+    триггер снова ведет к оставшемуся.
+    """
+
+    def __init__(self, prefixes=('!',)):
+        self.set_prefixes(prefixes)
+        self._root = [{}, None, {}]
+        self._triggers = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._triggers)
+
+    def set_prefixes(self, prefixes):
+        """Префиксы команд (например "!" или "?"), длинные проверяются первыми"""
+        if isinstance(prefixes, str):
+            prefixes = [prefixes]
+        prefixes = [prefix for prefix in prefixes if prefix] or ['!']
+        self.prefixes = sorted(prefixes, key=len, reverse=True)
+        self.display_prefix = prefixes[0]
+
+    def triggers_for(self, command, data):
+        triggers = [normalize_trigger(command)]
+        triggers.extend(normalize_trigger(alias) for alias in parse_aliases(data.get('aliases', [])))
+        return [tuple(words) for words in triggers if words]
+
+    def rebuild(self, commands):
+        """Полная пересборка дерева по словарю команд"""
+        root = [{}, None, {}]
+        triggers = {}
+        for command, data in list(commands.items()):
+            triggers[command] = self.triggers_for(command, data)
+            self._insert_all(root, command, triggers[command])
+        with self._lock:
+            self._root = root
+            self._triggers = triggers
+
+    def update(self, command, data):
+        """Добавление, изменение (data) или удаление (data=None) одной команды"""
+        with self._lock:
+            for words in self._triggers.pop(command, ()):
+                self._remove(self._root, words, command)
+            if data is not None:
+                self._triggers[command] = self.triggers_for(command, data)
+                self._insert_all(self._root, command, self._triggers[command])
+
+    def _insert_all(self, root, command, triggers):
+        name = tuple(normalize_trigger(command))
+        for words in triggers:
+            self._insert(root, words, command, words == name)
+
+    @staticmethod
+    def _owner(owners):
+        """Команда узла: имя команды важнее синонима, иначе - первая добавленная"""
+        fallback = None
+        for command, is_name in owners.items():
+            if is_name:
+                return command
+            if fallback is None:
+                fallback = command
+        return fallback
+
+    def _insert(self, root, words, command, is_name):
+        node = root
+        for word in words:
+            node = node[0].setdefault(word, [{}, None, {}])
+        node[2][command] = is_name or node[2].get(command, False)
+        node[1] = self._owner(node[2])
+
+    def _remove(self, root, words, command):
+        path = [root]
+        for word in words:
+            child = path[-1][0].get(word)
+            if child is None:
+                return
+            path.append(child)
+        owners = path[-1][2]
+        if owners.pop(command, None) is None:
+            return
+        path[-1][1] = self._owner(owners)
+        # Убираем опустевшие узлы снизу вверх
+        for i in range(len(words), 0, -1):
+            node = path[i]
+            if node[0] or node[2]:
+                break
+            del path[i - 1][0][words[i - 1]]
+
+    def strip_prefix(self, text):
+        """Текст после префикса команды или None, если префикса нет"""
+        for prefix in self.prefixes:
+            if text.startswith(prefix):
+                rest = text[len(prefix):]
+                if rest and not rest[0].isspace():
+                    return rest
+                return None
+        return None
+
+    def match(self, text):
+        """Разбор сообщения чата
+
+        Возвращает None, если это не команда; (None, слова) для
+        неизвестной команды; (имя команды, аргументы) при совпадении.
+        """
+        rest = self.strip_prefix(text)
+        if rest is None:
+            return None
+
+        words = rest.split()
+        with self._lock:
+            node = self._root
+            found = None
+            found_length = 0
+            for i, word in enumerate(words):
+                node = node[0].get(word.casefold())
+                if node is None:
+                    break
+                if node[1] is not None:
+                    found = node[1]
+                    found_length = i + 1
+
+        if found is None:
+            return None, words
+        return found, words[found_length:]
@@ -0,0 +1,57 @@
+import collections
+import time
+
+
+class CooldownIndex:
+    """Сроки окончания кулдаунов по ключу с ограниченным размером
+
+    Проверка и запуск - O(1). Истекшие записи удаляются лениво: при
+    обращении к ключу и по паре штук с начала очереди при каждом запуске.
+    Если уникальных ключей больше max_size, вытесняются самые старые.
+    """
+
+    def __init__(self, max_size=50000):
+        self.max_size = max_size
+        self._expires = collections.OrderedDict()
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self._expires)
+
+    def remaining(self, key, now=None):
+        """Секунд до конца кулдауна (0 - кулдауна нет)"""
+        expires = self._expires.get(key)
+        if expires is None:
+            return 0.0
+        if now is None:
+            now = time.monotonic()
+        if expires <= now:
+            del self._expires[key]
+            return 0.0
+        return expires - now
+
+    def start(self, key, duration, now=None):
+        """Запуск кулдауна на duration секунд"""
+        if duration <= 0:
+            return
+        if now is None:
+            now = time.monotonic()
+        self._expires[key] = now + duration
+        self._expires.move_to_end(key)
+        self._evict(now)
+
+    def clear(self):
+        self._expires.clear()
+
+    def _evict(self, now):
+        expires = self._expires
+        for _ in range(2):
+            if not expires:
+                return
+            key, deadline = next(iter(expires.items()))
+            if deadline > now:
+                break
+            del expires[key]
+        while len(expires) > self.max_size:
+            expires.popitem(last=False)
+            self.evicted += 1
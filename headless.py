@@ -0,0 +1,59 @@
+import argparse
+import signal
+import sys
+import threading
+
+from bot_core import BotCore
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Twitch Chat Manager без графического интерфейса")
+    parser.add_argument('--config', default='config.json', help="Файл конфигурации")
+    parser.add_argument('--commands', default='commands.json', help="Файл команд")
+    parser.add_argument('--auto-messages', default='auto_messages.json', help="Файл автосообщений")
+    parser.add_argument('--no-auto-messages', action='store_true', help="Не запускать автосообщения")
+    parser.add_argument('--host', help="Сервер IRC (по умолчанию irc_host из конфигурации или Twitch)")
+    parser.add_argument('--port', type=int, help="Порт сервера IRC")
+    args = parser.parse_args()
+
+    core = BotCore(config_path=args.config, commands_path=args.commands,
+                   auto_messages_path=args.auto_messages)
+
+    oauth_token = core.config.get('oauth_token', '').strip()
+    channels = core.config_channels()
+    if not all([oauth_token, channels]):
+        print(f"Ошибка: укажите oauth_token и channels в {args.config}", file=sys.stderr)
+        return 1
+
+    stop = threading.Event()
+    core.on_disconnected = stop.set
+
+    def on_signal(signum, frame):
+        stop.set()
+
+    signal.signal(signal.SIGINT, on_signal)
+    signal.signal(signal.SIGTERM, on_signal)
+
+    core.start()
+    try:
+        core.connect(oauth_token, channels, host=args.host, port=args.port)
+    except Exception as e:
+        core.add_log(f"❌ Ошибка подключения: {e}")
+        core.shutdown()
+        return 1
+
+    if core.auto_messages and not args.no_auto_messages:
+        core.start_auto_messages()
+
+    # Ждем сигнала остановки или обрыва соединения
+    while not stop.wait(1):
+        pass
+
+    if core.connected:
+        core.disconnect()
+    core.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
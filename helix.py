@@ -0,0 +1,93 @@
+import asyncio
+import json
+import urllib.error
+import urllib.parse
+import urllib.request
+
+
+HELIX_URL = 'https://api.twitch.tv/helix'
+VALIDATE_URL = 'https://id.twitch.tv/oauth2/validate'
+
+# Права токена для банов, таймаутов и удаления сообщений
+MODERATION_SCOPES = ('moderator:manage:banned_users', 'moderator:manage:chat_messages')
+
+
+class HelixError(Exception):
+    """Ответ Helix с ошибкой (status - код HTTP)"""
+
+    def __init__(self, status, message):
+        super().__init__(f"HTTP {status}: {message}")
+        self.status = status
+
+
+class HelixClient:
+    """Модерация через Twitch Helix API: баны, таймауты и удаление сообщений
+
+    Команды /ban, /timeout и /delete в чате Twitch не выполняет с февраля
+    2023 года. Client-Id и id бота (moderator_id) берутся из проверки
+    токена (validate), отдельно их настраивать не нужно. Запросы идут через
+    urllib в пуле потоков цикла asyncio и не блокируют чтение чата.
+    """
+
+    def __init__(self, token, client_id=None, base_url=HELIX_URL, validate_url=VALIDATE_URL, timeout=10):
+        self.token = token[len('oauth:'):] if token.startswith('oauth:') else token
+        self.client_id = client_id
+        self.base_url = base_url.rstrip('/')
+        self.validate_url = validate_url
+        self.timeout = timeout
+        self.user_id = None
+        self.scopes = ()
+
+    @property
+    def ready(self):
+        return bool(self.client_id and self.user_id)
+
+    def missing_scopes(self):
+        return [scope for scope in MODERATION_SCOPES if scope not in self.scopes]
+
+    def _request(self, method, url, body=None, auth='Bearer'):
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        request = urllib.request.Request(url, data, method=method)
+        request.add_header('Authorization', f'{auth} {self.token}')
+        if self.client_id:
+            request.add_header('Client-Id', self.client_id)
+        if data is not None:
+            request.add_header('Content-Type', 'application/json')
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                payload = response.read()
+        except urllib.error.HTTPError as e:
+            payload = e.read()
+            try:
+                message = json.loads(payload).get('message') or e.reason
+            except ValueError:
+                message = e.reason
+            raise HelixError(e.code, message) from None
+        return json.loads(payload) if payload else {}
+
+    async def _call(self, method, url, body=None, auth='Bearer'):
+        return await asyncio.get_running_loop().run_in_executor(None, self._request, method, url, body, auth)
+
+    def _url(self, path, **params):
+        return f"{self.base_url}{path}?{urllib.parse.urlencode(params)}"
+
+    async def validate(self):
+        """Проверка токена: client_id, id бота и права"""
+        info = await self._call('GET', self.validate_url, auth='OAuth')
+        self.client_id = self.client_id or info.get('client_id')
+        self.user_id = info.get('user_id')
+        self.scopes = tuple(info.get('scopes') or ())
+        return info
+
+    async def ban(self, broadcaster_id, user_id, reason='', duration=None):
+        """Бан зрителя, с duration (секунды) - таймаут"""
+        data = {'user_id': user_id, 'reason': reason[:500]}
+        if duration:
+            data['duration'] = int(duration)
+        url = self._url('/moderation/bans', broadcaster_id=broadcaster_id, moderator_id=self.user_id)
+        return await self._call('POST', url, {'data': data})
+
+    async def delete_message(self, broadcaster_id, message_id):
+        url = self._url('/moderation/chat', broadcaster_id=broadcaster_id, moderator_id=self.user_id,
+                        message_id=message_id)
+        return await self._call('DELETE', url)
@@ -0,0 +1,741 @@
+import asyncio
+import random
+import socket
+import ssl
+import threading
+import time
+import zlib
+
+from irc_reader import LineDecoder
+from irc_parser import parse_message
+from rate_limit import OutboundQueue, PRIORITY_SYSTEM, PRIORITY_REPLY
+from log_buffer import DEBUG, INFO, WARNING, ERROR
+
+
+TWITCH_IRC_HOST = 'irc.chat.twitch.tv'
+TWITCH_IRC_PORT = 6667
+TWITCH_IRC_TLS_PORT = 6697
+
+# hash - канал всегда на одном и том же соединении, balanced - поровну по очереди
+SHARD_POLICIES = ('hash', 'balanced')
+
+
+class ReconnectRequested(ConnectionError):
+    """Сервер прислал RECONNECT"""
+
+
+def create_ssl_context(cafile=None, verify=True):
+    """Контекст TLS; создается один раз на сессию и переиспользуется при переподключениях"""
+    context = ssl.create_default_context(cafile=cafile)
+    if not verify:
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+def tune_socket(sock, keepalive_idle=60, keepalive_interval=10, keepalive_count=3):
+    """TCP_NODELAY и keepalive: короткие строки уходят сразу, мертвое соединение
+    обнаруживается системой, даже если сервер молчит"""
+    if sock is None:
+        return
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    for option, value in (('TCP_KEEPIDLE', keepalive_idle), ('TCP_KEEPINTVL', keepalive_interval),
+                          ('TCP_KEEPCNT', keepalive_count)):
+        if hasattr(socket, option):
+            try:
+                sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, option), value)
+            except OSError:
+                pass
+
+
+def assign_shards(channels, count, policy='hash'):
+    """Распределение каналов по count соединениям: список списков каналов"""
+    shards = [[] for _ in range(max(1, count))]
+    for i, channel in enumerate(channels):
+        if policy == 'hash':
+            index = zlib.crc32(channel.encode('utf-8')) % len(shards)
+        else:
+            index = i % len(shards)
+        shards[index].append(channel)
+    return shards
+
+
+class Timer:
+    """Повторяющийся таймер в цикле движка"""
+
+    def __init__(self, engine, interval, callback, delay=None):
+        self.engine = engine
+        self.interval = interval
+        self.callback = callback
+        self.delay = interval if delay is None else delay
+        self.cancelled = False
+        self._handle = None
+
+    def _start(self):
+        if not self.cancelled:
+            self._handle = self.engine.loop.call_later(self.delay, self._fire)
+
+    def _fire(self):
+        if self.cancelled:
+            return
+        try:
+            self.callback()
+        except Exception as e:
+            self.engine.log(f"❌ Ошибка таймера: {e}", ERROR)
+        if not self.cancelled:
+            self._handle = self.engine.loop.call_later(self.interval, self._fire)
+
+    def _cancel_handle(self):
+        if self._handle:
+            self._handle.cancel()
+            self._handle = None
+
+    def cancel(self):
+        """Остановка таймера (можно вызывать из любого потока)"""
+        self.cancelled = True
+        self.engine.call_soon(self._cancel_handle)
+
+
+class IrcConnection:
+    """Одно соединение пула: свои каналы, чтение и переподключение
+
+    home - каналы, назначенные политикой распределения; channels - каналы,
+    в которых соединение сейчас (с учетом перенесенных с упавших соединений).
+    """
+
+    def __init__(self, engine, index, channels):
+        self.engine = engine
+        self.index = index
+        self.home = list(channels)
+        self.channels = list(channels)
+        self.connected = False
+        self.failed = False
+        self.reader = None
+        self.writer = None
+        self.supervisor = None
+        self._tasks = []
+        self._lost = None
+        self._opened_at = 0.0
+
+    @property
+    def name(self):
+        return f"соединение {self.index + 1}"
+
+    def _label(self):
+        """Префикс для сообщений о состоянии, если соединений несколько"""
+        return f"{self.name}: " if len(self.engine.connections) > 1 else ''
+
+    async def open(self, connection=None):
+        """Вход в каналы по новому или готовому резервному соединению"""
+        engine = self.engine
+        if connection is None:
+            connection = await engine._dial()
+        reader, writer, decoder = connection
+        self.reader = reader
+        self.writer = writer
+
+        # JOIN от прошлого соединения устарели, сообщения в чат остаются в очереди
+        engine.outbox.drop_system(self.channels)
+
+        # JOIN идут через очередь с учетом лимита на вход в каналы
+        for channel in self.channels:
+            engine._enqueue(f"JOIN #{channel}", PRIORITY_SYSTEM, channel)
+
+        self._lost = engine.loop.create_future()
+        self._opened_at = time.monotonic()
+        self.connected = True
+        self._tasks = [asyncio.create_task(self._read_loop(decoder))]
+        # Строки, ждавшие это соединение, можно отправлять
+        engine._outbox_event.set()
+        engine._start_standby()
+
+    def lost(self, error):
+        if self._lost is not None and not self._lost.done():
+            self._lost.set_result(error)
+
+    def drop(self):
+        self.connected = False
+
+        current = asyncio.current_task()
+        for task in self._tasks:
+            if task is not current:
+                task.cancel()
+        self._tasks = []
+
+        if self.writer:
+            try:
+                self.writer.close()
+            except Exception:
+                pass
+        self.reader = None
+        self.writer = None
+        self._lost = None
+
+    async def supervise(self):
+        """Следит за соединением и переподключается после обрыва"""
+        engine = self.engine
+        attempt = 0
+        while True:
+            error = await self._lost
+            lived = time.monotonic() - self._opened_at
+            self.drop()
+
+            if not engine.auto_reconnect:
+                await engine._close(error)
+                return
+
+            # Соединение, прожившее достаточно долго, сбрасывает счетчик попыток,
+            # а быстро оборвавшееся считается неудачной попыткой
+            if lived > engine.stable_after:
+                attempt = 0
+            elif not isinstance(error, ReconnectRequested):
+                attempt += 1
+                if attempt >= engine.rebalance_after:
+                    engine._rebalance(self)
+
+            # Готовое резервное соединение подхватывает сессию без задержки и рукопожатия
+            if await engine._take_over_standby(self):
+                engine.reconnects += 1
+                engine.takeovers += 1
+                engine._set_state('connected', f"{self._label()}резервное соединение, "
+                                               f"переподключение №{engine.reconnects}")
+                await self._restore_when_stable()
+                continue
+
+            requested = isinstance(error, ReconnectRequested)
+            while True:
+                delay = 0 if requested else engine._backoff(attempt)
+                requested = False
+                engine._set_state('reconnecting', f"{self._label()}{error}; повтор через {delay:.1f} с")
+                await asyncio.sleep(delay)
+                try:
+                    await self.open()
+                    break
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    error = e
+                    attempt += 1
+                    # Каналы не ждут восстановления: переезжают на работающие соединения
+                    if attempt >= engine.rebalance_after:
+                        engine._rebalance(self)
+
+            engine.reconnects += 1
+            engine._set_state('connected', f"{self._label()}переподключение №{engine.reconnects}")
+            await self._restore_when_stable()
+
+    async def _restore_when_stable(self):
+        """Перенесенные каналы возвращаются, когда соединение проработало stable_after"""
+        if not self.failed:
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(self._lost), self.engine.stable_after)
+        except asyncio.TimeoutError:
+            self.engine._restore(self)
+
+    async def _read_loop(self, decoder):
+        engine = self.engine
+        probe_sent = False
+        try:
+            while True:
+                # Тишина дольше idle_timeout - проверяем соединение своим PING
+                timeout = engine.ping_timeout if probe_sent else engine.idle_timeout
+                try:
+                    data = await asyncio.wait_for(self.reader.read(65536), timeout)
+                except asyncio.TimeoutError:
+                    if probe_sent:
+                        raise ConnectionError("Сервер не ответил на PING")
+                    self.writer.write(b"PING :tmi.twitch.tv\r\n")
+                    probe_sent = True
+                    continue
+
+                probe_sent = False
+                if not data:
+                    raise ConnectionError("Соединение закрыто сервером")
+
+                engine.bytes_received += len(data)
+                lines = decoder.feed(data)
+                engine.lines_received += len(lines)
+                for line in lines:
+                    if line.startswith('PING'):
+                        # PONG не расходует лимиты и уходит сразу в это же соединение
+                        self.writer.write(f"PONG{line[4:]}\r\n".encode('utf-8'))
+                        if engine.debug:
+                            engine.log("[DEBUG] Отправлен PONG", DEBUG)
+                        continue
+                    if line.endswith('RECONNECT') and parse_message(line).command == 'RECONNECT':
+                        raise ReconnectRequested("Сервер запросил переподключение")
+                    if engine.on_line:
+                        try:
+                            engine.on_line(line)
+                        except Exception as e:
+                            engine.log(f"❌ Ошибка обработки строки: {e}", ERROR)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.lost(e)
+
+
+class IrcEngine:
+    """Цикл asyncio в отдельном потоке: соединение, чтение, очередь отправки и таймеры"""
+
+    def __init__(self, on_line=None, on_disconnect=None, on_log=None, on_state=None):
+        self.on_line = on_line
+        self.on_disconnect = on_disconnect
+        self.on_log = on_log
+        self.on_state = on_state
+
+        self.loop = asyncio.new_event_loop()
+        self.debug = False
+        self.channels = []
+
+        # Переподключение: задержки в секундах
+        self.auto_reconnect = True
+        self.reconnect_base_delay = 1.0
+        self.reconnect_max_delay = 60.0
+        self.stable_after = 30.0
+        self.idle_timeout = 60.0
+        self.ping_timeout = 15.0
+        self.reconnects = 0
+        self.takeovers = 0
+        # После стольких неудачных попыток каналы соединения переезжают на другие
+        self.rebalance_after = 3
+        self.last_connect_time = 0.0
+
+        # Счетчики входящего трафика
+        self.lines_received = 0
+        self.bytes_received = 0
+
+        self._thread = None
+        self._session = None
+        # Пул соединений и владелец каждого канала
+        self.connections = []
+        self._owners = {}
+        self._writer_task = None
+        # Резервное соединение: (reader, writer, decoder), авторизовано, но без JOIN
+        self._standby = None
+        self._standby_task = None
+
+        # Единственная очередь отправки; все операции с ней - в потоке движка.
+        # Очередь переживает переподключения и очищается только при отключении.
+        self.outbox = OutboundQueue()
+        self._outbox_event = None
+
+    # --- Жизненный цикл потока ---
+
+    def start(self):
+        """Запуск цикла событий в фоновом потоке"""
+        if self._thread:
+            return
+        self._thread = threading.Thread(target=self._run, name='irc-engine', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self._outbox_event = asyncio.Event()
+        self.loop.run_forever()
+
+    def stop(self):
+        """Отключение и остановка цикла событий"""
+        if not self._thread:
+            return
+        try:
+            self.submit(self._shutdown()).result(timeout=5)
+        except Exception:
+            pass
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=5)
+        self._thread = None
+
+    async def _shutdown(self):
+        await self._close()
+
+        # Дожидаемся отмены всех задач, чтобы цикл остановился чисто
+        current = asyncio.current_task()
+        tasks = [task for task in asyncio.all_tasks() if task is not current]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def in_engine_thread(self):
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def call_soon(self, func, *args):
+        """Выполнить функцию в потоке движка"""
+        self.loop.call_soon_threadsafe(func, *args)
+
+    def submit(self, coro):
+        """Запустить корутину в цикле движка, возвращает concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def every(self, interval, callback, delay=None):
+        """Повторяющийся вызов callback в потоке движка"""
+        timer = Timer(self, interval, callback, delay)
+        self.call_soon(timer._start)
+        return timer
+
+    def log(self, message, level=INFO):
+        if self.on_log:
+            self.on_log(message, level)
+
+    # --- Соединение ---
+
+    @property
+    def active(self):
+        """Сессия открыта: соединение есть или идет переподключение"""
+        return self._session is not None
+
+    @property
+    def connected(self):
+        """Хотя бы одно соединение пула открыто"""
+        return any(connection.connected for connection in self.connections)
+
+    def configure_rate_limits(self, tier='normal', channel_limits=None):
+        """Настройка лимитов отправки (можно вызывать из любого потока)"""
+        self.call_soon(self.outbox.configure, tier, channel_limits)
+
+    def connect(self, oauth_token, nick, channels, host=TWITCH_IRC_HOST, port=TWITCH_IRC_PORT,
+                capabilities=(), ssl_context=None, standby=False, connections=1, shard_policy='hash'):
+        """Подключение к IRC, возвращает Future
+
+        ssl_context - TLS (обычно порт 6697), standby - держать еще одно
+        авторизованное соединение, которое подхватывает упавшее без
+        рукопожатия при RECONNECT или обрыве. Каналы делятся между
+        connections соединениями по политике shard_policy.
+        """
+        if shard_policy not in SHARD_POLICIES:
+            raise ValueError(f"Неизвестная политика распределения каналов: {shard_policy}")
+        session = {
+            'oauth_token': oauth_token,
+            'nick': nick,
+            'channels': list(channels),
+            'host': host,
+            'port': port,
+            'capabilities': list(capabilities),
+            'ssl': ssl_context,
+            'standby': standby,
+            'connections': max(1, int(connections)),
+            'shard_policy': shard_policy,
+        }
+        return self.submit(self._connect(session))
+
+    def disconnect(self):
+        """Отключение от IRC, возвращает Future"""
+        return self.submit(self._close())
+
+    def pool_stats(self):
+        """Состояние соединений пула: номер, открыто ли, число каналов, каналы перенесены"""
+        return [{'index': connection.index, 'connected': connection.connected,
+                 'channels': len(connection.channels), 'failed': connection.failed}
+                for connection in self.connections]
+
+    async def _connect(self, session):
+        await self._close()
+
+        self._session = session
+        self.channels = session['channels']
+        shards = [shard for shard in assign_shards(self.channels, session['connections'], session['shard_policy'])
+                  if shard] or [[]]
+        self.connections = [IrcConnection(self, index, shard) for index, shard in enumerate(shards)]
+        self._owners = {channel: connection for connection in self.connections for channel in connection.channels}
+
+        # Соединения открываются параллельно; ошибка любого - ошибка подключения
+        results = await asyncio.gather(*(connection.open() for connection in self.connections),
+                                       return_exceptions=True)
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            self._session = None
+            for connection in self.connections:
+                connection.drop()
+            self.connections = []
+            self._owners = {}
+            self._drop_standby()
+            raise errors[0]
+
+        self._writer_task = asyncio.create_task(self._write_loop())
+        for connection in self.connections:
+            connection.supervisor = asyncio.create_task(connection.supervise())
+
+    async def _dial(self):
+        """Новое соединение (TCP или TLS) с отправленной авторизацией"""
+        session = self._session
+        started = time.monotonic()
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(session['host'], session['port'], ssl=session['ssl']), timeout=10)
+        try:
+            tune_socket(writer.get_extra_info('socket'))
+
+            # Авторизация уходит раньше всего, что могло попасть в очередь
+            if session['capabilities']:
+                writer.write(f"CAP REQ :{' '.join(session['capabilities'])}\r\n".encode('utf-8'))
+            writer.write(f"PASS {session['oauth_token']}\r\n".encode('utf-8'))
+            writer.write(f"NICK {session['nick']}\r\n".encode('utf-8'))
+            await writer.drain()
+        except BaseException:
+            writer.close()
+            raise
+        self.last_connect_time = time.monotonic() - started
+        return reader, writer, LineDecoder()
+
+    def _backoff(self, attempt):
+        """Экспоненциальная задержка со случайным разбросом"""
+        delay = min(self.reconnect_max_delay, self.reconnect_base_delay * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _set_state(self, state, detail=''):
+        if self.on_state:
+            self.on_state(state, detail)
+
+    async def _close(self, error=None):
+        was_active = self._session is not None
+        self._session = None
+
+        current = asyncio.current_task()
+        for connection in self.connections:
+            if connection.supervisor is not None and connection.supervisor is not current:
+                connection.supervisor.cancel()
+            connection.supervisor = None
+            connection.drop()
+        self.connections = []
+        self._owners = {}
+
+        if self._writer_task is not None and self._writer_task is not current:
+            self._writer_task.cancel()
+        self._writer_task = None
+
+        self._drop_standby()
+        self.outbox.clear()
+
+        if error is not None and was_active and self.on_disconnect:
+            self.on_disconnect(error)
+
+    # --- Распределение каналов ---
+
+    def _route(self, channel):
+        """Открытое соединение, которому принадлежит канал (для строк без канала - любое)"""
+        if channel is None:
+            for connection in self.connections:
+                if connection.connected:
+                    return connection
+            return None
+        connection = self._owners.get(channel)
+        if connection is not None and connection.connected:
+            return connection
+        return None
+
+    def _writable(self, channel):
+        return self._route(channel) is not None
+
+    def _pick(self, channel, candidates):
+        if self._session['shard_policy'] == 'hash':
+            return candidates[zlib.crc32(channel.encode('utf-8')) % len(candidates)]
+        return min(candidates, key=lambda connection: len(connection.channels))
+
+    def _move(self, channel, target):
+        owner = self._owners.get(channel)
+        if owner is not None:
+            owner.channels.remove(channel)
+            if owner.connected:
+                owner.writer.write(f"PART #{channel}\r\n".encode('utf-8'))
+        target.channels.append(channel)
+        self._owners[channel] = target
+        if target.connected:
+            self._enqueue(f"JOIN #{channel}", PRIORITY_SYSTEM, channel)
+
+    def _rebalance(self, failed):
+        """Перенос каналов соединения, которое не удается восстановить, на работающие"""
+        if failed.failed or not failed.channels:
+            return
+        healthy = [connection for connection in self.connections if connection is not failed and connection.connected]
+        if not healthy:
+            return
+        failed.failed = True
+        moved = list(failed.channels)
+        self.outbox.drop_system(moved)
+        for channel in moved:
+            self._move(channel, self._pick(channel, healthy))
+        self.log(f"🔀 {failed.name}: {len(moved)} каналов перенесено на другие соединения", WARNING)
+
+    def _restore(self, connection):
+        """Возврат каналов соединению, которое снова открыто"""
+        if not connection.failed:
+            return
+        connection.failed = False
+        returned = [channel for channel in connection.home if self._owners.get(channel) is not connection]
+        self.outbox.drop_system(returned)
+        for channel in returned:
+            self._move(channel, connection)
+        if returned:
+            self.log(f"↩️ {connection.name}: {len(returned)} каналов возвращено")
+
+    # --- Резервное соединение ---
+
+    def _start_standby(self):
+        if self._session is not None and self._session['standby'] and self._standby_task is None:
+            self._standby_task = asyncio.create_task(self._keep_standby())
+
+    async def _keep_standby(self, delay=0.0):
+        """Держит открытым резервное соединение и переоткрывает его после обрыва"""
+        attempt = 0
+        while True:
+            await asyncio.sleep(delay)
+            try:
+                connection = await self._dial()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                attempt += 1
+                delay = self._backoff(attempt)
+                if self.debug:
+                    self.log(f"[DEBUG] Резервное соединение не открылось: {e}", DEBUG)
+                continue
+
+            attempt = 0
+            self._standby = connection
+            try:
+                await self._idle_standby(*connection)
+            except asyncio.CancelledError:
+                # Отмена при подхвате: соединение теперь основное, не закрываем
+                raise
+            except Exception as e:
+                if self.debug:
+                    self.log(f"[DEBUG] Резервное соединение потеряно: {e}", DEBUG)
+            self._standby = None
+            connection[1].close()
+            delay = self._backoff(0)
+
+    async def _idle_standby(self, reader, writer, decoder):
+        """Чтение резервного соединения до подхвата: PING/PONG и проверка живости"""
+        probe_sent = False
+        while True:
+            timeout = self.ping_timeout if probe_sent else self.idle_timeout
+            try:
+                data = await asyncio.wait_for(reader.read(65536), timeout)
+            except asyncio.TimeoutError:
+                if probe_sent:
+                    raise ConnectionError("Сервер не ответил на PING")
+                writer.write(b"PING :tmi.twitch.tv\r\n")
+                probe_sent = True
+                continue
+
+            probe_sent = False
+            if not data:
+                raise ConnectionError("Соединение закрыто сервером")
+            for line in decoder.feed(data):
+                if line.startswith('PING'):
+                    writer.write(f"PONG{line[4:]}\r\n".encode('utf-8'))
+                elif line.endswith('RECONNECT') and parse_message(line).command == 'RECONNECT':
+                    raise ReconnectRequested("Сервер запросил переподключение")
+
+    async def _take_over_standby(self, target):
+        """Перевод соединения пула на резервное; False, если его нет"""
+        connection = self._standby
+        if connection is None:
+            return False
+        self._standby = None
+        task = self._standby_task
+        self._standby_task = None
+        # Чтение резервного соединения должно завершиться до запуска основного
+        task.cancel()
+        await asyncio.wait([task])
+        try:
+            await target.open(connection)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            target.drop()
+            return False
+        return True
+
+    def _drop_standby(self):
+        if self._standby_task is not None:
+            self._standby_task.cancel()
+            self._standby_task = None
+        if self._standby is not None:
+            try:
+                self._standby[1].close()
+            except Exception:
+                pass
+            self._standby = None
+
+    # --- Отправка в сеть ---
+
+    async def _write_loop(self):
+        """Единая очередь отправки: строка уходит в соединение, которому принадлежит ее канал"""
+        while True:
+            line, channel, delay = self.outbox.pop_ready(self._writable)
+            if line is None:
+                # Очередь пуста или упирается в лимит: ждем новую строку или токен
+                self._outbox_event.clear()
+                try:
+                    await asyncio.wait_for(self._outbox_event.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            connection = self._route(channel)
+            try:
+                connection.writer.write(f"{line}\r\n".encode('utf-8'))
+                await connection.writer.drain()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Строка могла не дойти: она снова ждет в очереди с прежними приоритетом
+                # и временем, пока соединение не откроется заново или каналы не переедут
+                self.outbox.requeue_last()
+                connection.connected = False
+                connection.lost(e)
+
+    # --- Отправка ---
+
+    def send_raw(self, line, priority=PRIORITY_SYSTEM, channel=None, received_at=None):
+        """Поставить строку IRC в очередь отправки (из любого потока)
+
+        received_at (time.monotonic) - когда пришло сообщение, на которое
+        это ответ; от него считается задержка ответа.
+
+        В потоке движка возвращает, попала ли строка в очередь (False -
+        нет сессии, переполнение или такая строка уже ждет отправки). Из
+        других потоков строка только передается движку и результат - True.
+        """
+        if self.in_engine_thread():
+            return self._enqueue(line, priority, channel, received_at)
+        self.loop.call_soon_threadsafe(self._enqueue, line, priority, channel, received_at)
+        return True
+
+    def send_batch(self, lines, priority=PRIORITY_REPLY, channel=None, received_at=None):
+        """Поставить несколько строк в очередь подряд (целиком или ни одной), результат - как у send_raw"""
+        if self.in_engine_thread():
+            return self._enqueue_batch(lines, priority, channel, received_at)
+        self.loop.call_soon_threadsafe(self._enqueue_batch, lines, priority, channel, received_at)
+        return True
+
+    def _enqueue_batch(self, lines, priority, channel, received_at=None):
+        if self._session is None:
+            return False
+        if self.outbox.put_many(lines, priority, channel, received_at):
+            self._outbox_event.set()
+            return True
+        if self.debug:
+            self.log(f"[DEBUG] Очередь отправки переполнена, {len(lines)} сообщений в #{channel} пропущено", DEBUG)
+        return False
+
+    def _enqueue(self, line, priority, channel, received_at=None):
+        if self._session is None:
+            return False
+        if self.outbox.put(line, priority, channel, received_at):
+            self._outbox_event.set()
+            return True
+        if priority > PRIORITY_SYSTEM and self.debug:
+            self.log(f"[DEBUG] Очередь отправки переполнена, сообщение в #{channel} пропущено", DEBUG)
+        return False
+
+    def send_privmsg(self, channel, message, priority=PRIORITY_REPLY, received_at=None):
+        """Отправка сообщения в канал с учетом лимитов"""
+        return self.send_raw(f"PRIVMSG #{channel} :{message}", priority, channel, received_at)
+
+    def send_privmsgs(self, channel, messages, priority=PRIORITY_REPLY, received_at=None):
+        """Отправка нескольких сообщений в канал одной пачкой"""
+        lines = [f"PRIVMSG #{channel} :{message}" for message in messages]
+        return self.send_batch(lines, priority, channel, received_at)
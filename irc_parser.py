@@ -0,0 +1,159 @@
+_UNESCAPE = {':': ';', 's': ' ', '\\': '\\', 'r': '\r', 'n': '\n'}
+_ESCAPE = {';': '\\:', ' ': '\\s', '\\': '\\\\', '\r': '\\r', '\n': '\\n'}
+
+
+def unescape_tag_value(value):
+    """Раскодирование значения тега IRCv3 (\\: \\s \\\\ \\r \\n)"""
+    if '\\' not in value:
+        return value
+
+    result = []
+    i = 0
+    length = len(value)
+    while i < length:
+        char = value[i]
+        if char == '\\':
+            i += 1
+            if i == length:
+                # Одиночная обратная косая черта в конце отбрасывается
+                break
+            char = value[i]
+            result.append(_UNESCAPE.get(char, char))
+        else:
+            result.append(char)
+        i += 1
+    return ''.join(result)
+
+
+def escape_tag_value(value):
+    """Кодирование значения тега IRCv3"""
+    if not any(char in value for char in _ESCAPE):
+        return value
+    return ''.join(_ESCAPE.get(char, char) for char in value)
+
+
+def parse_tags(raw):
+    """Разбор строки тегов "a=1;b=2" в словарь"""
+    tags = {}
+    for item in raw.split(';'):
+        if not item:
+            continue
+        key, _, value = item.partition('=')
+        tags[key] = unescape_tag_value(value)
+    return tags
+
+
+class IrcMessage:
+    """Разобранная строка IRC: теги, источник, команда и параметры
+
+    Теги хранятся строкой и разбираются только при первом обращении,
+    поэтому строки, где теги не нужны, не создают лишних объектов.
+    """
+
+    __slots__ = ('raw_tags', 'source', 'command', 'params', '_tags')
+
+    def __init__(self, command, params=(), source=None, raw_tags=None, tags=None):
+        self.command = command
+        self.params = params if isinstance(params, list) else list(params)
+        self.source = source
+        self.raw_tags = raw_tags
+        self._tags = tags
+
+    @property
+    def tags(self):
+        if self._tags is None:
+            self._tags = parse_tags(self.raw_tags) if self.raw_tags else {}
+        return self._tags
+
+    def tag(self, name, default=None):
+        if not self.raw_tags and self._tags is None:
+            return default
+        return self.tags.get(name, default)
+
+    @property
+    def nick(self):
+        """Ник из источника nick!user@host"""
+        if not self.source:
+            return ''
+        return self.source.split('!', 1)[0]
+
+    @property
+    def channel(self):
+        """Канал без # (для PRIVMSG, JOIN и т.п.)"""
+        if self.params and self.params[0].startswith('#'):
+            return self.params[0][1:]
+        return ''
+
+    @property
+    def text(self):
+        """Последний параметр (текст сообщения)"""
+        return self.params[-1] if self.params else ''
+
+    def format(self):
+        """Обратная сборка строки IRC (без \\r\\n)"""
+        parts = []
+        if self._tags:
+            parts.append('@' + ';'.join(
+                f"{key}={escape_tag_value(value)}" if value else key for key, value in self._tags.items()))
+        elif self.raw_tags:
+            parts.append('@' + self.raw_tags)
+        if self.source:
+            parts.append(':' + self.source)
+        parts.append(self.command)
+        if self.params:
+            parts.extend(self.params[:-1])
+            last = self.params[-1]
+            if not last or ' ' in last or last.startswith(':'):
+                last = ':' + last
+            parts.append(last)
+        return ' '.join(parts)
+
+    def __repr__(self):
+        return (f"IrcMessage(command={self.command!r}, params={self.params!r}, "
+                f"source={self.source!r}, tags={self.raw_tags!r})")
+
+
+def parse_message(line):
+    """Разбор строки IRC (RFC 1459 + теги IRCv3), ValueError при ошибке формата"""
+    line = line.rstrip('\r\n')
+    pos = 0
+    length = len(line)
+
+    raw_tags = None
+    if line.startswith('@'):
+        end = line.find(' ')
+        if end == -1:
+            raise ValueError("Нет команды после тегов")
+        raw_tags = line[1:end]
+        pos = end + 1
+        while pos < length and line[pos] == ' ':
+            pos += 1
+
+    source = None
+    if line.startswith(':', pos):
+        end = line.find(' ', pos)
+        if end == -1:
+            raise ValueError("Нет команды после источника")
+        source = line[pos + 1:end]
+        pos = end + 1
+
+    # Последний параметр начинается с " :" и может содержать пробелы
+    trailing = None
+    if line.startswith(':', pos):
+        raise ValueError("Нет команды")
+    end = line.find(' :', pos)
+    if end != -1:
+        trailing = line[end + 2:]
+        middle = line[pos:end]
+    else:
+        middle = line[pos:]
+
+    params = middle.split()
+    if not params:
+        raise ValueError("Нет команды")
+
+    command = params.pop(0).upper()
+    if trailing is not None:
+        params.append(trailing)
+
+    return IrcMessage(command, params, source, raw_tags)
@@ -0,0 +1,38 @@
+import codecs
+
+
+class LineDecoder:
+    """Инкрементальный разбор потока байт на строки IRC"""
+
+    # Защита от бесконечной строки без перевода строки
+    MAX_LINE_LENGTH = 64 * 1024
+
+    def __init__(self, encoding='utf-8'):
+        self._buffer = bytearray()
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+
+    def feed(self, data):
+        """Добавляет байты в буфер и возвращает список завершенных строк"""
+        self._buffer += data
+
+        end = self._buffer.rfind(b'\n')
+        if end == -1:
+            if len(self._buffer) > self.MAX_LINE_LENGTH:
+                self._buffer.clear()
+                self._decoder.reset()
+            return []
+
+        # Декодируем только завершенные строки, хвост остается в буфере
+        text = self._decoder.decode(bytes(self._buffer[:end + 1]))
+        del self._buffer[:end + 1]
+
+        lines = []
+        for line in text.split('\n'):
+            line = line.rstrip('\r')
+            if line:
+                lines.append(line)
+        return lines
+
+    def pending(self):
+        """Количество байт незавершенной строки в буфере"""
+        return len(self._buffer)
@@ -0,0 +1,54 @@
+import collections
+import threading
+from datetime import datetime
+
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+LEVELS = {
+    'debug': DEBUG,
+    'info': INFO,
+    'warning': WARNING,
+    'error': ERROR,
+}
+
+
+def parse_level(name, default=INFO):
+    """Уровень логирования по имени из конфигурации"""
+    if isinstance(name, int):
+        return name
+    return LEVELS.get(str(name).lower(), default)
+
+
+class LogBuffer:
+    """Кольцевой буфер строк лога, который интерфейс забирает пачками"""
+
+    def __init__(self, capacity=5000):
+        self._lines = collections.deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def append(self, message):
+        """Добавление строки (из любого потока)"""
+        line = f"[{datetime.now().strftime('%H:%M:%S')}] {message}\n"
+        with self._lock:
+            if len(self._lines) == self._lines.maxlen:
+                self.dropped += 1
+            self._lines.append(line)
+
+    def resize(self, capacity):
+        """Новый размер буфера (лишние старые строки отбрасываются)"""
+        with self._lock:
+            if capacity != self._lines.maxlen:
+                self.dropped += max(0, len(self._lines) - capacity)
+                self._lines = collections.deque(self._lines, maxlen=capacity)
+
+    def drain(self):
+        """Забрать все накопленные строки одним списком"""
+        with self._lock:
+            lines = list(self._lines)
+            self._lines.clear()
+        return lines
@@ -0,0 +1,183 @@
+import asyncio
+import bisect
+
+
+# Границы корзин гистограмм по умолчанию, секунды
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Для быстрых операций вроде разбора строки
+FAST_BUCKETS = (0.000001, 0.0000025, 0.000005, 0.00001, 0.000025, 0.00005, 0.0001,
+                0.00025, 0.0005, 0.001, 0.01)
+
+
+class Counter:
+    """Монотонный счетчик; inc() - одно сложение без блокировок"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def samples(self):
+        yield self.name, self.value
+
+
+class Gauge:
+    """Значение, которое считывается функцией в момент выгрузки метрик
+
+    kind='counter' - для счетчиков, которые уже ведет другой объект
+    (например, число принятых строк в движке).
+    """
+
+    def __init__(self, name, help_text, func, kind='gauge'):
+        self.name = name
+        self.help = help_text
+        self.func = func
+        self.kind = kind
+
+    @property
+    def value(self):
+        return self.func()
+
+    def samples(self):
+        yield self.name, self.value
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами (как в Prometheus)
+
+    observe() - двоичный поиск корзины и два сложения; накопительные
+    суммы по корзинам считаются только при выгрузке.
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Оценка квантиля по корзинам (верхняя граница корзины)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            if total >= rank:
+                return bound
+        return float('inf')
+
+    def samples(self):
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            yield f'{self.name}_bucket{{le="{bound}"}}', total
+        yield f'{self.name}_bucket{{le="+Inf"}}', self.count
+        yield f'{self.name}_sum', self.sum
+        yield f'{self.name}_count', self.count
+
+
+class Metrics:
+    """Набор метрик бота и выгрузка в текстовом формате Prometheus"""
+
+    def __init__(self, prefix='chatbot_'):
+        self.prefix = prefix
+        self._metrics = {}
+
+    def _add(self, metric):
+        self._metrics[metric.name[len(self.prefix):]] = metric
+        return metric
+
+    def counter(self, name, help_text):
+        return self._add(Counter(self.prefix + name, help_text))
+
+    def gauge(self, name, help_text, func, kind='gauge'):
+        return self._add(Gauge(self.prefix + name, help_text, func, kind))
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(self.prefix + name, help_text, buckets))
+
+    def __getitem__(self, name):
+        return self._metrics[name]
+
+    def render(self):
+        """Текст для /metrics"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, value in metric.samples():
+                lines.append(f"{name} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self):
+        """Текущие значения для интерфейса: число или словарь для гистограмм"""
+        result = {}
+        for name, metric in self._metrics.items():
+            if metric.kind == 'histogram':
+                result[name] = {'count': metric.count, 'sum': metric.sum,
+                                'p50': metric.quantile(0.5), 'p99': metric.quantile(0.99)}
+            else:
+                result[name] = metric.value
+        return result
+
+
+class MetricsServer:
+    """HTTP-эндпоинт /metrics на цикле asyncio движка"""
+
+    def __init__(self, metrics, host='127.0.0.1', port=9108):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader, writer):
+        try:
+            request = await asyncio.wait_for(reader.readline(), 5)
+            # Заголовки запроса не нужны, но их надо дочитать
+            while True:
+                line = await asyncio.wait_for(reader.readline(), 5)
+                if line in (b'\r\n', b'\n', b''):
+                    break
+
+            parts = request.decode('latin-1').split()
+            if len(parts) >= 2 and parts[0] == 'GET' and parts[1].split('?')[0] in ('/metrics', '/'):
+                status = '200 OK'
+                body = self.metrics.render().encode('utf-8')
+            else:
+                status = '404 Not Found'
+                body = b'not found\n'
+            writer.write(f"HTTP/1.1 {status}\r\n"
+                         f"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                         f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode('ascii') + body)
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
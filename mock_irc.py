@@ -0,0 +1,268 @@
+import asyncio
+import ssl
+import time
+
+
+PROBE_COMMAND = 'ping'
+PROBE_REPLY = 'pong'
+
+
+def percentile(values, q):
+    """Перцентиль по отсортированному списку (ближайший ранг)"""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, int(round(q * len(values))) - 1))
+    return values[index]
+
+
+class MockIrcServer:
+    """Локальный IRC-сервер для нагрузочных тестов без сети
+
+    Отвечает на CAP/PASS/NICK/JOIN/PART/PING как Twitch и проигрывает
+    строки чата с заданной скоростью (строк в минуту). Строки
+    распределяются по каналам channels по очереди и уходят в соединение,
+    которое сейчас находится в канале. Каждая probe_every-я строка
+    заменяется пробой "!ping <номер>"; по ответу "pong <номер>" считается
+    задержка от отправки строки ботом до получения ответа.
+
+    ssl_context - слушать TLS вместо открытого текста. reconnect_every -
+    раз в столько секунд слать RECONNECT и через секунду закрывать
+    соединение, как Twitch при перезапуске сервера; время до нового JOIN
+    попадает в switch_times. kill_every - раз в столько секунд обрывать
+    соединение и отклонять refuse следующих подключений (проверка переноса
+    каналов между соединениями пула). record - сохранять принятые строки
+    в received как (номер подключения, строка) для проверок в тестах.
+    """
+
+    def __init__(self, lines, rate, channels, host='127.0.0.1', port=0, probe_every=50, tick=0.01,
+                 ssl_context=None, reconnect_every=None, kill_every=None, refuse=3, record=False):
+        self.lines = lines
+        self.rate = rate
+        self.channels = [channels] if isinstance(channels, str) else list(channels)
+        self.channel = self.channels[0]
+        self.host = host
+        self.port = port
+        self.probe_every = probe_every
+        self.tick = tick
+        self.ssl_context = ssl_context
+        self.reconnect_every = reconnect_every
+        self.kill_every = kill_every
+        self.refuse = refuse
+        self.received = [] if record else None
+
+        self.joined = None
+        self.finished = None
+        self._server = None
+        self._clients = set()
+        self._members = {}
+        self._refusing = 0
+        self._reconnect_sent = None
+        self._probes = {}
+
+        self.sent = 0
+        self.probes_sent = 0
+        self.replies = 0
+        self.latencies = []
+        self.send_lag = 0.0
+        self.connections = 0
+        self.max_clients = 0
+        self.switch_times = []
+        self.missed = 0
+        self.kills = 0
+
+    async def start(self):
+        # Бот вошел во все каналы
+        self.joined = asyncio.Event()
+        # Все соединения бота закрыты (после того как он подключался)
+        self.finished = asyncio.Event()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port, ssl=self.ssl_context)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self, timeout=10):
+        """Ожидание отключения бота (он выходит сам после сигнала) и остановка"""
+        if self._clients:
+            try:
+                await asyncio.wait_for(self.finished.wait(), timeout)
+            except asyncio.TimeoutError:
+                for writer in list(self._clients):
+                    writer.close()
+                await self.finished.wait()
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    def _update_joined(self):
+        if len(self._members) == len(self.channels):
+            self.joined.set()
+        else:
+            self.joined.clear()
+
+    async def _handle(self, reader, writer):
+        if self._refusing:
+            self._refusing -= 1
+            writer.close()
+            return
+        self._clients.add(writer)
+        self.connections += 1
+        number = self.connections
+        self.max_clients = max(self.max_clients, len(self._clients))
+        self.finished.clear()
+        nick = 'bot'
+        try:
+            while True:
+                data = await reader.readline()
+                if not data:
+                    break
+                received = time.perf_counter()
+                line = data.decode('utf-8', 'replace').rstrip('\r\n')
+                if self.received is not None:
+                    self.received.append((number, line))
+                command, _, rest = line.partition(' ')
+                if command == 'CAP':
+                    writer.write(f":tmi.twitch.tv CAP * ACK :{rest.partition(':')[2]}\r\n".encode('utf-8'))
+                elif command == 'NICK':
+                    nick = rest.strip()
+                    writer.write(f":tmi.twitch.tv 001 {nick} :Welcome, GLHF!\r\n".encode('utf-8'))
+                elif command == 'JOIN':
+                    for channel in rest.split(','):
+                        writer.write(f":{nick}!{nick}@{nick}.tmi.twitch.tv JOIN {channel}\r\n".encode('utf-8'))
+                        channel = channel.lstrip('#')
+                        if channel in self.channels:
+                            self._members[channel] = writer
+                            if channel == self.channel and self._reconnect_sent is not None:
+                                self.switch_times.append(time.perf_counter() - self._reconnect_sent)
+                                self._reconnect_sent = None
+                    self._update_joined()
+                elif command == 'PART':
+                    for channel in rest.split(','):
+                        channel = channel.lstrip('#')
+                        if self._members.get(channel) is writer:
+                            del self._members[channel]
+                    self._update_joined()
+                elif command == 'PING':
+                    writer.write(f":tmi.twitch.tv PONG{line[4:]}\r\n".encode('utf-8'))
+                elif command == 'PRIVMSG':
+                    self._on_reply(rest.partition(' :')[2], received)
+        except (ConnectionError, ssl.SSLError):
+            pass
+        finally:
+            self._clients.discard(writer)
+            for channel in [channel for channel, member in self._members.items() if member is writer]:
+                del self._members[channel]
+            self._update_joined()
+            if not self._clients:
+                self.finished.set()
+            writer.close()
+
+    def _send_reconnect(self):
+        writer = self._members.get(self.channel)
+        if writer is None:
+            return
+        self._reconnect_sent = time.perf_counter()
+        writer.write(b":tmi.twitch.tv RECONNECT\r\n")
+        # Twitch закрывает соединение вскоре после RECONNECT
+        asyncio.get_running_loop().call_later(1.0, writer.close)
+
+    def _kill(self):
+        writer = self._members.get(self.channel)
+        if writer is None:
+            return
+        self.kills += 1
+        self._refusing = self.refuse
+        writer.transport.abort()
+
+    def _on_reply(self, text, received):
+        word, _, seq = text.partition(' ')
+        if word != PROBE_REPLY:
+            return
+        sent_at = self._probes.pop(seq.strip(), None)
+        if sent_at is not None:
+            self.replies += 1
+            self.latencies.append(received - sent_at)
+
+    def _probe_line(self, seq, channel):
+        return (f"@display-name=probe;id=probe-{seq};mod=0;user-id=1 "
+                f":probe!probe@probe.tmi.twitch.tv PRIVMSG #{channel} :!{PROBE_COMMAND} {seq}")
+
+    def _line_for(self, index, channel):
+        line = self.lines[index % len(self.lines)]
+        if channel != self.channel:
+            line = line.replace(f" #{self.channel} ", f" #{channel} ", 1)
+        return line
+
+    async def replay(self, duration):
+        """Проигрывание чата duration секунд (строки берутся по кругу)"""
+        await self.joined.wait()
+        interval = 60.0 / self.rate
+        total = int(duration * self.rate / 60)
+        started = time.perf_counter()
+        last_reconnect = last_kill = started
+        index = 0
+        while index < total and self._clients:
+            now = time.perf_counter()
+            if self.reconnect_every and now - last_reconnect >= self.reconnect_every:
+                last_reconnect = now
+                self._send_reconnect()
+            if self.kill_every and now - last_kill >= self.kill_every:
+                last_kill = now
+                self._kill()
+
+            # Все строки, которым уже пора, уходят одной записью в каждое соединение
+            due = min(total, int((now - started) / interval) + 1)
+            chunks = {}
+            probes = []
+            while index < due:
+                channel = self.channels[index % len(self.channels)]
+                writer = self._members.get(channel)
+                if writer is None:
+                    # Строки, пришедшие в чат без бота, он не увидит
+                    self.missed += 1
+                elif self.probe_every and index % self.probe_every == self.probe_every - 1:
+                    seq = str(self.probes_sent)
+                    self.probes_sent += 1
+                    probes.append(seq)
+                    chunks.setdefault(writer, []).append(self._probe_line(seq, channel))
+                else:
+                    chunks.setdefault(writer, []).append(self._line_for(index, channel))
+                index += 1
+
+            for writer, chunk in chunks.items():
+                writer.write(''.join(f"{line}\r\n" for line in chunk).encode('utf-8'))
+                self.sent += len(chunk)
+            now = time.perf_counter()
+            for seq in probes:
+                self._probes[seq] = now
+            for writer in chunks:
+                try:
+                    await writer.drain()
+                except ConnectionError:
+                    pass
+            await asyncio.sleep(self.tick)
+        # Насколько сервер отстал от заданной скорости
+        self.send_lag = max(0.0, time.perf_counter() - started - duration)
+
+    async def wait_replies(self, timeout):
+        """Ожидание ответов на оставшиеся пробы"""
+        deadline = time.perf_counter() + timeout
+        while self._probes and time.perf_counter() < deadline and self._clients:
+            await asyncio.sleep(0.05)
+        return len(self._probes)
+
+    def results(self):
+        latencies = sorted(self.latencies)
+        return {
+            'sent': self.sent,
+            'probes': self.probes_sent,
+            'replies': self.replies,
+            'lost': self.probes_sent - self.replies,
+            'p50': percentile(latencies, 0.5),
+            'p90': percentile(latencies, 0.9),
+            'p99': percentile(latencies, 0.99),
+            'max': latencies[-1] if latencies else 0.0,
+            'send_lag': self.send_lag,
+            'connections': self.connections,
+            'max_clients': self.max_clients,
+            'switches': sorted(self.switch_times),
+            'missed': self.missed,
+            'kills': self.kills,
+        }
@@ -0,0 +1,242 @@
+import collections
+import re
+import time
+
+
+class AhoCorasick:
+    """Поиск множества подстрок за один проход по тексту (Ахо-Корасик)
+
+    Время поиска зависит от длины текста и числа совпадений, но не от
+    количества шаблонов. Шаблоны и текст сравниваются после casefold().
+    """
+
+    def __init__(self, patterns=()):
+        self.patterns = []
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+        for pattern in patterns:
+            self._add(pattern)
+        self._build()
+
+    def __len__(self):
+        return len(self.patterns)
+
+    def _add(self, pattern):
+        pattern = pattern.casefold()
+        if not pattern:
+            return
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+                self._goto[state][char] = next_state
+            state = next_state
+        self._out[state] = self._out[state] + (len(self.patterns),)
+        self.patterns.append(pattern)
+
+    def _build(self):
+        # Ссылки неудач в порядке обхода в ширину
+        queue = collections.deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, 0)
+                self._fail[next_state] = fail
+                self._out[next_state] = self._out[next_state] + self._out[fail]
+
+    def search(self, text):
+        """Совпадения (начало, конец, номер шаблона) в уже casefold() тексте"""
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+        state = 0
+        for i, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                for index in out[state]:
+                    yield i + 1 - len(self.patterns[index]), i + 1, index
+
+
+LINK_RE = re.compile(
+    r'(?:https?://|www\.)[^\s]+|\b[\w-]+(?:\.[\w-]+)*\.(?:com|net|org|ru|tv|gg|io|me|ly|xyz|link|be|co|info|site)\b',
+    re.IGNORECASE)
+
+
+class Verdict:
+    """Решение модерации: правило, действие и причина"""
+
+    __slots__ = ('rule', 'action', 'duration', 'reason')
+
+    def __init__(self, rule, action, duration, reason):
+        self.rule = rule
+        self.action = action
+        self.duration = duration
+        self.reason = reason
+
+    def __repr__(self):
+        return f"Verdict({self.rule!r}, {self.action!r}, {self.duration!r}, {self.reason!r})"
+
+
+class Moderator:
+    """Проверка сообщений чата: запрещенные фразы, ссылки, капс и повторы
+
+    Настройки - словарь "moderation" из config.json. Для каждого правила
+    задается действие: "delete" (удалить сообщение) или "timeout"
+    (таймаут на "timeout" секунд).
+    """
+
+    def __init__(self, settings=None):
+        self.configure(settings or {})
+
+    def configure(self, settings):
+        self.settings = settings
+        self.enabled = bool(settings.get('enabled', False))
+        self.exempt = {name.lower() for name in settings.get('exempt', [])}
+
+        # {"list": [...], "file": "banned.txt", "whole_words": true, "action": ...}
+        self.phrases = settings.get('banned_phrases', {})
+        phrase_list = list(self.phrases.get('list', []))
+        path = self.phrases.get('file')
+        if path:
+            with open(path, 'r', encoding='utf-8') as f:
+                phrase_list.extend(line.strip() for line in f if line.strip() and not line.startswith('#'))
+        self.matcher = AhoCorasick(phrase_list)
+        self.whole_words = self.phrases.get('whole_words', True)
+
+        self.links = settings.get('links', {})
+        self.allowed_domains = tuple(domain.lower() for domain in self.links.get('allow', []))
+        self.caps = settings.get('caps', {})
+        self.repeat = settings.get('repeat', {})
+
+        # Последние сообщения зрителей для поиска повторов: ключ -> [текст, число, время первого]
+        self._recent = collections.OrderedDict()
+        self.recent_limit = settings.get('repeat_index_size', 10000)
+
+        self.checked = 0
+        self.actions = 0
+
+    def _verdict(self, rule, settings, reason):
+        action = settings.get('action', self.settings.get('action', 'delete'))
+        duration = settings.get('timeout', self.settings.get('timeout', 600))
+        return Verdict(rule, action, duration, reason)
+
+    def is_exempt(self, msg, channel=None):
+        """Модераторы, стример, VIP и пользователи из списка exempt не проверяются"""
+        nick = msg.nick.lower()
+        # Стример узнается и без тегов: его ник совпадает с каналом
+        if nick in self.exempt or nick == channel:
+            return True
+        if msg.tag('mod') == '1':
+            return True
+        badges = msg.tag('badges') or ''
+        return 'broadcaster/' in badges or 'vip/' in badges
+
+    def check(self, msg, channel, text):
+        """Verdict для нарушения или None"""
+        if not self.enabled or self.is_exempt(msg, channel):
+            return None
+        self.checked += 1
+
+        verdict = (self._check_phrases(text) or self._check_links(text) or
+                   self._check_caps(text) or self._check_repeat(channel, msg.nick, text))
+        if verdict:
+            self.actions += 1
+        return verdict
+
+    def _check_phrases(self, text):
+        if not len(self.matcher):
+            return None
+        folded = text.casefold()
+        for start, end, index in self.matcher.search(folded):
+            if self.whole_words and ((start > 0 and folded[start - 1].isalnum()) or
+                                     (end < len(folded) and folded[end].isalnum())):
+                continue
+            return self._verdict('phrase', self.phrases, f"запрещенная фраза '{self.matcher.patterns[index]}'")
+        return None
+
+    def _check_links(self, text):
+        if not self.links.get('enabled', False):
+            return None
+        for match in LINK_RE.finditer(text):
+            link = match.group(0).lower()
+            host = link.split('://', 1)[-1].split('/', 1)[0]
+            if host.startswith('www.'):
+                host = host[4:]
+            if not any(host == domain or host.endswith('.' + domain) for domain in self.allowed_domains):
+                return self._verdict('link', self.links, f"ссылка {link}")
+        return None
+
+    def _check_caps(self, text):
+        if not self.caps.get('enabled', False):
+            return None
+        letters = 0
+        upper = 0
+        for char in text:
+            if char.isalpha():
+                letters += 1
+                if char.isupper():
+                    upper += 1
+        if letters >= self.caps.get('min_length', 15) and upper / letters >= self.caps.get('ratio', 0.7):
+            return self._verdict('caps', self.caps, f"капс {upper}/{letters}")
+        return None
+
+    def _check_repeat(self, channel, user, text):
+        if not self.repeat.get('enabled', False):
+            return None
+        now = time.monotonic()
+        key = (channel, user)
+        normalized = ' '.join(text.casefold().split())
+        entry = self._recent.get(key)
+        if entry and entry[0] == normalized and now - entry[2] <= self.repeat.get('window', 30):
+            entry[1] += 1
+        else:
+            entry = self._recent[key] = [normalized, 1, now]
+        self._recent.move_to_end(key)
+        while len(self._recent) > self.recent_limit:
+            self._recent.popitem(last=False)
+
+        if entry[1] >= self.repeat.get('count', 3):
+            del self._recent[key]
+            return self._verdict('repeat', self.repeat, f"повтор {entry[1]} раз")
+        return None
+
+
+def chat_command(action, nick, message_id, duration, reason):
+    """Команда чата /ban, /timeout или /delete - для IRC-серверов, которые их принимают
+
+    Twitch с 2023 года отвечает на них NOTICE с отказом; там нужен Helix API.
+    """
+    if action == 'ban':
+        return f"/ban {nick} {reason}"
+    if action == 'delete':
+        return f"/delete {message_id}"
+    return f"/timeout {nick} {duration} {reason}"
+
+
+# msg-id в NOTICE Twitch - ответы на /ban, /timeout и /delete
+MODERATION_SUCCESS = frozenset({'ban_success', 'timeout_success', 'delete_message_success'})
+MODERATION_FAILURE_PREFIXES = ('bad_ban_', 'bad_timeout_', 'bad_delete_message_', 'usage_ban', 'usage_timeout',
+                               'usage_delete')
+MODERATION_FAILURES = frozenset({'already_banned', 'no_permission', 'unrecognized_cmd'})
+
+
+def moderation_result(msg_id):
+    """Итог команды модерации по msg-id NOTICE: True, False или None, если NOTICE не о модерации"""
+    if not msg_id:
+        return None
+    if msg_id in MODERATION_SUCCESS:
+        return True
+    if msg_id in MODERATION_FAILURES or msg_id.startswith(MODERATION_FAILURE_PREFIXES):
+        return False
+    return None
@@ -0,0 +1,430 @@
+import asyncio
+import concurrent.futures
+import importlib
+import queue
+import threading
+import time
+
+from log_buffer import DEBUG, INFO, WARNING, ERROR
+
+
+# Группы точек входа (entry points) пакетов с плагинами. Имя точки входа -
+# ключ обработчика: команда ("roll"), команда IRC ("USERNOTICE", "*" - все)
+# или имя таймера (интервал задается в конфигурации), значение -
+# "модуль:функция". Модуль импортируется только при первом вызове.
+ENTRY_POINT_GROUPS = {
+    'command': 'twitch_chat_manager.commands',
+    'event': 'twitch_chat_manager.events',
+    'timer': 'twitch_chat_manager.timers',
+}
+
+
+def entry_points(group):
+    """Точки входа группы без импорта самих плагинов"""
+    try:
+        from importlib import metadata
+    except ImportError:
+        return []
+    found = metadata.entry_points()
+    if hasattr(found, 'select'):
+        return list(found.select(group=group))
+    return list(found.get(group, []))
+
+
+def plugin_name(target):
+    """Имя плагина для изоляции: пакет точки входа или модуль обработчика"""
+    if isinstance(target, str):
+        return target.partition(':')[0]
+    dist = getattr(target, 'dist', None)
+    if dist is not None and getattr(dist, 'name', None):
+        return dist.name
+    value = getattr(target, 'value', None)
+    if value is not None:
+        return value.partition(':')[0]
+    return getattr(target, '__module__', None) or 'plugins'
+
+
+class Handler:
+    """Обработчик плагина: функция, строка "модуль:функция" или точка входа
+
+    Все, кроме функции, загружается при первом вызове (load()).
+    """
+
+    def __init__(self, kind, key, target, plugin=None, budget=None, data=None):
+        self.kind = kind
+        self.key = key
+        self.target = target
+        self.plugin = plugin or plugin_name(target)
+        self.budget = budget
+        self.data = data or {}
+        self.func = target if callable(target) else None
+
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.skipped = 0
+        self.failures = 0
+        self.disabled_until = 0.0
+
+    def __repr__(self):
+        return f"Handler({self.kind!r}, {self.key!r}, {self.plugin!r})"
+
+    @property
+    def loaded(self):
+        return self.func is not None
+
+    def load(self):
+        if self.func is None:
+            target = self.target
+            if isinstance(target, str):
+                module_name, _, attr = target.partition(':')
+                obj = importlib.import_module(module_name)
+                for part in attr.split('.') if attr else ():
+                    obj = getattr(obj, part)
+            else:
+                obj = target.load()
+            if not callable(obj):
+                raise TypeError(f"{target!r} - не функция")
+            self.func = obj
+        return self.func
+
+
+class PluginThread:
+    """Поток одного плагина со своей очередью вызовов
+
+    Зависший обработчик занимает только поток своего плагина. Поток - daemon,
+    поэтому он не задерживает выход из программы (в отличие от
+    ThreadPoolExecutor, который дожидается своих потоков).
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.pending = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=f'plugin-{name}', daemon=True)
+        self._thread.start()
+
+    def submit(self, func, *args):
+        future = concurrent.futures.Future()
+        self._queue.put((future, func, args))
+        return future
+
+    def stop(self):
+        self._queue.put(None)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            future, func, args = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(func(*args))
+            except BaseException as e:
+                future.set_exception(e)
+
+
+class PluginContext:
+    """Что получает обработчик: канал, автор, аргументы и способ ответить
+
+    Обработчик может вернуть строку или список строк - это ответ в канал
+    (для таймера - во все каналы бота), или отправить сообщения сам через
+    reply()/send() из любого потока.
+    """
+
+    def __init__(self, manager, channel=None, nick=None, user=None, command=None, args=(),
+                 text='', msg=None, received_at=None):
+        self.manager = manager
+        self.channel = channel
+        self.nick = nick
+        self.user = user or nick
+        self.command = command
+        self.args = list(args)
+        self.text = text
+        self.msg = msg
+        self.received_at = received_at
+
+    @property
+    def channels(self):
+        """Каналы, в которых сейчас бот"""
+        return list(self.manager.channels())
+
+    def reply(self, text):
+        if self.channel:
+            self.manager.send(self.channel, text, self.received_at)
+
+    def send(self, channel, text):
+        self.manager.send(channel.lstrip('#').lower(), text)
+
+
+class PluginManager:
+    """Обработчики команд, событий IRC и таймеров из плагинов
+
+    Обработчики приходят из точек входа установленных пакетов, из раздела
+    "plugins" конфигурации или регистрируются в коде (command/on/every).
+    Плагин импортируется при первом вызове его обработчика, поэтому
+    неиспользуемые плагины не тратят время запуска и память.
+
+    Каждый вызов ограничен бюджетом времени budget: обычная функция
+    выполняется в потоке своего плагина, async-функция - в цикле движка с
+    отменой по таймауту. Поток чтения не ждет плагины. Плагин, у которого
+    уже queue_limit вызовов в очереди, пропускает новые; обработчик после
+    max_failures ошибок или превышений бюджета подряд отключается на
+    disable_for секунд.
+    """
+
+    def __init__(self, engine, send, channels=None, on_log=None, budget=0.5, load_timeout=10.0,
+                 queue_limit=8, max_failures=3, disable_for=60.0):
+        self.engine = engine
+        self.send_func = send
+        self.channels = channels or (lambda: [])
+        self.on_log = on_log
+        self.budget = budget
+        self.load_timeout = load_timeout
+        self.queue_limit = queue_limit
+        self.max_failures = max_failures
+        self.disable_for = disable_for
+
+        # Замер длительности вызова (метрики ядра)
+        self.on_call = None
+        # Изменился набор команд плагинов (их триггеры нужны ChatHandler)
+        self.on_commands_changed = None
+
+        self.commands = {}
+        self.events = {}
+        self.timers = {}
+        self._threads = {}
+        self._tasks = set()
+        self._running_timers = []
+
+    def log(self, message, level=INFO):
+        if self.on_log:
+            self.on_log(message, level)
+
+    # --- Регистрация ---
+
+    def add(self, kind, key, target, plugin=None, budget=None, data=None):
+        handler = Handler(kind, key, target, plugin, budget, data)
+        if kind == 'command':
+            self.commands[key.casefold()] = handler
+            if self.on_commands_changed:
+                self.on_commands_changed()
+        elif kind == 'event':
+            self.events.setdefault(key.upper(), []).append(handler)
+        elif kind == 'timer':
+            self.timers[key] = handler
+        else:
+            raise ValueError(f"Неизвестный тип обработчика: {kind}")
+        return handler
+
+    def command(self, name, func=None, budget=None, **data):
+        """Обработчик команды (можно как декоратор); data - cooldown, aliases, channels"""
+        if func is None:
+            def decorator(func):
+                self.command(name, func, budget, **data)
+                return func
+            return decorator
+        return self.add('command', name, func, budget=budget, data=data)
+
+    def on(self, event, func=None, budget=None):
+        """Обработчик строк IRC с командой event ("PRIVMSG", "USERNOTICE", "*" - все)"""
+        if func is None:
+            def decorator(func):
+                self.on(event, func, budget)
+                return func
+            return decorator
+        return self.add('event', event, func, budget=budget)
+
+    def every(self, interval, func=None, name=None, budget=None):
+        """Таймер: вызов раз в interval секунд"""
+        if func is None:
+            def decorator(func):
+                self.every(interval, func, name, budget)
+                return func
+            return decorator
+        return self.add('timer', name or getattr(func, '__name__', str(func)), func, budget=budget,
+                        data={'interval': interval})
+
+    def discover(self, settings):
+        """Обработчики из точек входа и раздела "plugins" конфигурации
+
+        {"commands": {"roll": "dice:roll" или {"handler": ..., "cooldown": 5}},
+         "events": {"USERNOTICE": "raids:on_raid"},
+         "timers": {"report": {"handler": "stats:report", "interval": 300},
+                    "имя таймера из точки входа": 300},
+         "disabled": ["roll"]}
+        """
+        disabled = {name.casefold() for name in settings.get('disabled', [])}
+        timers = settings.get('timers', {})
+
+        if settings.get('entry_points', True):
+            for kind, group in ENTRY_POINT_GROUPS.items():
+                for entry_point in entry_points(group):
+                    if entry_point.name.casefold() in disabled:
+                        continue
+                    if kind == 'timer':
+                        # Таймер из пакета работает, только если ему задан интервал
+                        interval = timers.get(entry_point.name)
+                        if isinstance(interval, (int, float)) and interval > 0:
+                            self.add(kind, entry_point.name, entry_point, data={'interval': interval})
+                    else:
+                        self.add(kind, entry_point.name, entry_point)
+
+        for name, value in settings.get('commands', {}).items():
+            if name.casefold() in disabled:
+                continue
+            if isinstance(value, str):
+                value = {'handler': value}
+            data = {key: item for key, item in value.items() if key not in ('handler', 'budget')}
+            self.add('command', name, value['handler'], budget=value.get('budget'), data=data)
+        for event, targets in settings.get('events', {}).items():
+            for target in [targets] if isinstance(targets, str) else targets:
+                self.add('event', event, target)
+        for name, value in timers.items():
+            if isinstance(value, dict) and name.casefold() not in disabled:
+                self.add('timer', name, value['handler'], budget=value.get('budget'),
+                         data={'interval': value['interval']})
+
+    def command_data(self):
+        """Триггеры и кулдауны команд плагинов для ChatHandler (без функций)"""
+        return {name: dict(handler.data) for name, handler in self.commands.items()}
+
+    # --- Запуск ---
+
+    def start(self):
+        """Запуск таймеров (функции загружаются при первом срабатывании)"""
+        for handler in self.timers.values():
+            interval = float(handler.data['interval'])
+            self._running_timers.append(
+                self.engine.every(interval, lambda handler=handler: self._spawn(handler, PluginContext(self))))
+
+    def stop(self):
+        for timer in self._running_timers:
+            timer.cancel()
+        self._running_timers = []
+        for thread in self._threads.values():
+            thread.stop()
+        self._threads = {}
+
+    def has_event(self, command):
+        return command in self.events or '*' in self.events
+
+    def run_command(self, command, context):
+        """Вызов обработчика команды (из потока движка)"""
+        handler = self.commands.get(command)
+        if handler is not None:
+            self._spawn(handler, context)
+
+    def dispatch_event(self, msg, received_at=None):
+        """Вызов обработчиков события IRC (из потока движка)"""
+        handlers = self.events.get(msg.command, []) + self.events.get('*', [])
+        for handler in handlers:
+            self._spawn(handler, PluginContext(self, msg.channel, msg.nick, msg.tag('display-name'),
+                                               text=msg.params[-1] if msg.params else '', msg=msg,
+                                               received_at=received_at))
+
+    def send(self, channel, text, received_at=None):
+        if isinstance(text, str):
+            self.send_func(channel, [text], received_at)
+        elif text:
+            self.send_func(channel, list(text), received_at)
+
+    def _thread_for(self, plugin):
+        thread = self._threads.get(plugin)
+        if thread is None:
+            thread = self._threads[plugin] = PluginThread(plugin)
+        return thread
+
+    def _spawn(self, handler, context):
+        if handler.disabled_until > time.monotonic():
+            handler.skipped += 1
+            return
+        thread = self._thread_for(handler.plugin)
+        if thread.pending >= self.queue_limit:
+            handler.skipped += 1
+            self.log(f"[DEBUG] Плагин {handler.plugin} занят, вызов {handler.key} пропущен", DEBUG)
+            return
+        # Место в очереди плагина занимается сразу, чтобы пачка вызовов за
+        # один оборот цикла тоже упиралась в queue_limit
+        thread.pending += 1
+        task = self.engine.loop.create_task(self._invoke(handler, context, thread))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _run_in_thread(self, thread, func, *args):
+        """Вызов в потоке плагина; место в очереди освобождается, когда поток действительно закончил"""
+        loop = asyncio.get_running_loop()
+        future = thread.submit(func, *args)
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(self._release, thread))
+        return asyncio.wrap_future(future)
+
+    def _release(self, thread):
+        thread.pending -= 1
+
+    async def _invoke(self, handler, context, thread):
+        in_thread = False
+        try:
+            func = handler.func
+            if func is None:
+                try:
+                    func = await asyncio.wait_for(asyncio.wrap_future(thread.submit(handler.load)),
+                                                  self.load_timeout)
+                except Exception as e:
+                    self._failed(handler, f"не загружен: {e!r}")
+                    return
+                self.log(f"🧩 Плагин {handler.plugin} загружен ({handler.kind} {handler.key})")
+
+            budget = handler.budget or self.budget
+            started = time.monotonic()
+            handler.calls += 1
+            try:
+                if asyncio.iscoroutinefunction(func):
+                    result = await asyncio.wait_for(func(context), budget)
+                else:
+                    in_thread = True
+                    result = await asyncio.wait_for(self._run_in_thread(thread, func, context), budget)
+            except asyncio.TimeoutError:
+                handler.timeouts += 1
+                self._failed(handler, f"превышен бюджет {budget} с")
+                return
+            except Exception as e:
+                handler.errors += 1
+                self._failed(handler, f"ошибка {e!r}")
+                return
+            finally:
+                if self.on_call:
+                    self.on_call(time.monotonic() - started)
+            handler.failures = 0
+        finally:
+            if not in_thread:
+                self._release(thread)
+
+        if result:
+            if handler.kind == 'timer':
+                for channel in self.channels():
+                    self.send(channel, result)
+            elif context.channel:
+                self.send(context.channel, result, context.received_at)
+
+    def _failed(self, handler, reason):
+        handler.failures += 1
+        self.log(f"⚠️ Плагин {handler.plugin} ({handler.kind} {handler.key}): {reason}", WARNING)
+        if handler.failures >= self.max_failures:
+            handler.failures = 0
+            handler.disabled_until = time.monotonic() + self.disable_for
+            self.log(f"❌ Плагин {handler.plugin} ({handler.kind} {handler.key}) отключен на "
+                     f"{self.disable_for:.0f} с", ERROR)
+
+    def stats(self):
+        handlers = list(self.commands.values()) + list(self.timers.values())
+        handlers += [handler for handlers_list in self.events.values() for handler in handlers_list]
+        return {
+            'handlers': len(handlers),
+            'loaded': sum(1 for handler in handlers if handler.loaded),
+            'calls': sum(handler.calls for handler in handlers),
+            'errors': sum(handler.errors for handler in handlers),
+            'timeouts': sum(handler.timeouts for handler in handlers),
+            'skipped': sum(handler.skipped for handler in handlers),
+        }
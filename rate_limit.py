@@ -0,0 +1,249 @@
+import collections
+import heapq
+import itertools
+import time
+
+
+# Приоритеты исходящих строк: меньше - раньше
+PRIORITY_SYSTEM = 0       # PONG, JOIN, CAP
+PRIORITY_MODERATION = 1   # /timeout и /delete
+PRIORITY_REPLY = 2        # Ответы на команды
+PRIORITY_AUTO = 3         # Автосообщения
+
+# Лимиты Twitch на PRIVMSG и JOIN: (сообщений, за секунд)
+ACCOUNT_TIERS = {
+    'normal': {'messages': (20, 30), 'joins': (20, 10)},
+    'moderator': {'messages': (100, 30), 'joins': (20, 10)},
+    'verified': {'messages': (7500, 30), 'joins': (2000, 10)},
+}
+
+
+class SlidingWindow:
+    """Скользящее окно: не больше capacity событий за любые period секунд
+
+    Хранит время последних capacity событий. В отличие от ведра токенов
+    с полным запасом, не пропускает почти 2 x capacity на стыке окон -
+    Twitch за такое блокирует аккаунт.
+    """
+
+    def __init__(self, capacity, period):
+        self.capacity = capacity
+        self.period = period
+        self.events = collections.deque()
+
+    def _expire(self, now):
+        events = self.events
+        while events and events[0] <= now - self.period:
+            events.popleft()
+
+    def delay(self, now):
+        """Через сколько секунд можно следующее событие (0 - можно сейчас)"""
+        self._expire(now)
+        if len(self.events) < self.capacity:
+            return 0.0
+        return self.events[0] + self.period - now
+
+    def take(self, now):
+        self._expire(now)
+        self.events.append(now)
+
+
+class OutboundQueue:
+    """Очередь исходящих строк с приоритетами и ограничением скорости"""
+
+    def __init__(self, tier='normal', channel_limits=None, max_size=200, max_wait=60):
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self._heap = []
+        self._seq = itertools.count()
+        # Одинаковые ответы в один канал, еще не ушедшие в сеть, не дублируются
+        self._pending = set()
+        # Последняя извлеченная строка - на случай, если запись в сокет не удалась
+        self._last_popped = None
+
+        self.configure(tier, channel_limits)
+
+        # Метрики
+        self.sent = 0
+        self.dropped = 0
+        self.max_depth = 0
+        self.total_wait = 0.0
+        self.max_wait_seen = 0.0
+        self.last_wait = 0.0
+        self.rate_limited = 0
+
+        # on_sent(приоритет, ожидание) - для гистограмм задержек
+        self.on_sent = None
+
+    def configure(self, tier='normal', channel_limits=None):
+        """Настройка лимитов по уровню аккаунта и отдельным каналам
+
+        channel_limits: {"канал": {"tier": "moderator"}} или {"канал": {"messages": 100, "period": 30}}.
+        Сообщения в канал с собственным лимитом расходуют только его лимит.
+        """
+        limits = ACCOUNT_TIERS.get(tier, ACCOUNT_TIERS['normal'])
+        self.tier = tier if tier in ACCOUNT_TIERS else 'normal'
+        self.message_bucket = SlidingWindow(*limits['messages'])
+        self.join_bucket = SlidingWindow(*limits['joins'])
+
+        self.channel_buckets = {}
+        for channel, limit in (channel_limits or {}).items():
+            if 'tier' in limit:
+                capacity, period = ACCOUNT_TIERS.get(limit['tier'], ACCOUNT_TIERS['normal'])['messages']
+            else:
+                capacity, period = limit.get('messages', 20), limit.get('period', 30)
+            self.channel_buckets[channel] = SlidingWindow(capacity, period)
+
+    def __len__(self):
+        return len(self._heap)
+
+    def put(self, line, priority=PRIORITY_SYSTEM, channel=None, queued_at=None):
+        """Добавляет строку, возвращает False если очередь переполнена
+
+        queued_at - момент (time.monotonic), от которого считается ожидание,
+        например время получения сообщения, на которое это ответ.
+        """
+        if priority > PRIORITY_SYSTEM:
+            if len(self._heap) >= self.max_size or (channel, line) in self._pending:
+                self.dropped += 1
+                return False
+            self._pending.add((channel, line))
+
+        heapq.heappush(self._heap, (priority, next(self._seq), queued_at or time.monotonic(), channel, line))
+        self.max_depth = max(self.max_depth, len(self._heap))
+        return True
+
+    def put_many(self, lines, priority=PRIORITY_REPLY, channel=None, queued_at=None):
+        """Добавляет строки подряд; если все не помещаются, не добавляет ни одной
+
+        Строки, которые уже ждут отправки, повторно не добавляются; если
+        новых строк нет, возвращает False, как put() для повтора.
+        """
+        lines = [line for line in lines if (channel, line) not in self._pending]
+        if not lines:
+            return False
+        if len(self._heap) + len(lines) > self.max_size:
+            self.dropped += len(lines)
+            return False
+        for line in lines:
+            self.put(line, priority, channel, queued_at)
+        return True
+
+    def requeue_last(self):
+        """Вернуть последнюю строку из pop_ready() в очередь (запись в соединение не удалась)
+
+        Строка сохраняет приоритет, место среди строк того же приоритета и
+        время постановки, поэтому устаревает так же, как если бы не уходила.
+        """
+        entry = self._last_popped
+        self._last_popped = None
+        if entry is None:
+            return False
+        if entry[0] > PRIORITY_SYSTEM:
+            if (entry[3], entry[4]) in self._pending:
+                return False
+            self._pending.add((entry[3], entry[4]))
+        heapq.heappush(self._heap, entry)
+        self.sent -= 1
+        return True
+
+    def clear(self):
+        self._heap.clear()
+        self._pending.clear()
+        self._last_popped = None
+
+    def drop_system(self, channels=None):
+        """Убрать служебные строки (JOIN), оставив сообщения в чат
+
+        channels - только строки этих каналов (например, одного соединения пула).
+        """
+        if channels is not None:
+            channels = set(channels)
+        self._heap = [entry for entry in self._heap
+                      if entry[0] > PRIORITY_SYSTEM or (channels is not None and entry[3] not in channels)]
+        heapq.heapify(self._heap)
+
+    def _buckets_for(self, line, channel):
+        if line.startswith('JOIN'):
+            return (self.join_bucket,)
+        if channel is None:
+            return ()
+        bucket = self.channel_buckets.get(channel)
+        if bucket:
+            return (bucket,)
+        return (self.message_bucket,)
+
+    def pop_ready(self, ready=None):
+        """Возвращает (строка, канал, None) или (None, None, сколько ждать)
+
+        (None, None, None) - отправлять нечего. ready(канал) - можно ли сейчас
+        отправить строку этого канала (есть ли открытое соединение); строки,
+        для которых нельзя, остаются в очереди.
+        """
+        now = time.monotonic()
+
+        # Ответы, которые ждали слишком долго, уже никому не нужны
+        while self._heap and self._heap[0][0] > PRIORITY_SYSTEM and now - self._heap[0][2] > self.max_wait:
+            entry = heapq.heappop(self._heap)
+            self._pending.discard((entry[3], entry[4]))
+            self.dropped += 1
+
+        if not self._heap:
+            return None, None, None
+
+        # Берем первую строку по приоритету, которую пропускают лимиты.
+        # Полный просмотр нужен только когда первая строка упирается в лимит.
+        best_delay = None
+        for entry in self._in_priority_order():
+            priority, seq, queued_at, channel, line = entry
+            if ready is not None and not ready(channel):
+                continue
+            buckets = self._buckets_for(line, channel)
+            delay = max((b.delay(now) for b in buckets), default=0.0)
+            if delay == 0:
+                for bucket in buckets:
+                    bucket.take(now)
+                self._remove(entry)
+                self._last_popped = entry
+                self._record(now - queued_at)
+                if self.on_sent:
+                    self.on_sent(priority, now - queued_at)
+                return line, channel, None
+            if best_delay is None or delay < best_delay:
+                best_delay = delay
+
+        if best_delay is None:
+            return None, None, None
+        self.rate_limited += 1
+        return None, None, best_delay
+
+    def _in_priority_order(self):
+        yield self._heap[0]
+        yield from sorted(self._heap)[1:]
+
+    def _remove(self, entry):
+        self._pending.discard((entry[3], entry[4]))
+        if self._heap[0] is entry:
+            heapq.heappop(self._heap)
+        else:
+            self._heap.remove(entry)
+            heapq.heapify(self._heap)
+
+    def _record(self, wait):
+        self.sent += 1
+        self.total_wait += wait
+        self.last_wait = wait
+        self.max_wait_seen = max(self.max_wait_seen, wait)
+
+    def stats(self):
+        """Метрики очереди: глубина, ожидание, отправлено и отброшено"""
+        return {
+            'depth': len(self._heap),
+            'max_depth': self.max_depth,
+            'sent': self.sent,
+            'dropped': self.dropped,
+            'rate_limited': self.rate_limited,
+            'avg_wait': self.total_wait / self.sent if self.sent else 0.0,
+            'last_wait': self.last_wait,
+            'max_wait': self.max_wait_seen,
+        }
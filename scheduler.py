@@ -0,0 +1,101 @@
+import asyncio
+import heapq
+import itertools
+import time
+
+
+class Scheduler:
+    """Отложенные вызовы по ключу на куче с пробуждением точно к сроку
+
+    Все методы, кроме start/stop, вызываются только из потока цикла asyncio.
+    Перепланирование ключа не ищет старую запись в куче: она просто
+    становится неактуальной и отбрасывается при извлечении. Опоздание
+    каждого срабатывания относительно срока (секунды) уходит в
+    lateness.observe() - гистограмму метрик.
+    """
+
+    def __init__(self, callback, on_error=None, lateness=None):
+        self.callback = callback
+        self.on_error = on_error
+        self.lateness = lateness
+        self._heap = []
+        self._entries = {}
+        self._seq = itertools.count()
+        self._wake = None
+        self._task = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def schedule(self, key, delay):
+        """Вызвать callback(key) через delay секунд (заменяет прежний срок)"""
+        due = time.monotonic() + max(0.0, delay)
+        seq = next(self._seq)
+        self._entries[key] = seq
+        heapq.heappush(self._heap, (due, seq, key))
+        if self._wake and self._heap[0][1] == seq:
+            self._wake.set()
+
+    def cancel(self, key):
+        """Отмена запланированного вызова"""
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+        self._heap.clear()
+
+    def _discard_stale(self):
+        while self._heap and self._entries.get(self._heap[0][2]) != self._heap[0][1]:
+            heapq.heappop(self._heap)
+
+    def next_delay(self):
+        """Секунд до ближайшего срока или None, если ничего не запланировано"""
+        self._discard_stale()
+        if not self._heap:
+            return None
+        return max(0.0, self._heap[0][0] - time.monotonic())
+
+    def pop_due(self):
+        """Извлечь все ключи, срок которых наступил"""
+        now = time.monotonic()
+        due_keys = []
+        self._discard_stale()
+        while self._heap and self._heap[0][0] <= now:
+            due, seq, key = heapq.heappop(self._heap)
+            del self._entries[key]
+            if self.lateness is not None:
+                self.lateness.observe(now - due)
+            due_keys.append(key)
+            self._discard_stale()
+        return due_keys
+
+    async def run(self):
+        """Цикл: спим до ближайшего срока или до изменения расписания"""
+        wake = self._wake = asyncio.Event()
+        try:
+            while True:
+                for key in self.pop_due():
+                    try:
+                        self.callback(key)
+                    except Exception as e:
+                        if self.on_error:
+                            self.on_error(e)
+
+                wake.clear()
+                try:
+                    await asyncio.wait_for(wake.wait(), self.next_delay())
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            if self._wake is wake:
+                self._wake = None
+
+    def start(self, engine):
+        """Запуск цикла планировщика в потоке движка"""
+        if self._task is None:
+            self._task = engine.submit(self.run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
@@ -0,0 +1,273 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+
+def atomic_write_json(path, data):
+    """Запись JSON через временный файл и переименование"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            if isinstance(data, str):
+                f.write(data)
+            else:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class WriteBehindStore:
+    """Словарь в памяти с отложенной записью в JSON-файл
+
+    mark_dirty() только помечает данные измененными; запись выполняется
+    в отдельном потоке не чаще раза в delay секунд, а также при flush().
+    Подклассы переопределяют _mark/_take_changes/_write для другого
+    способа хранения.
+    """
+
+    def __init__(self, path, data, delay=5.0, on_error=None):
+        self.path = path
+        self.data = data
+        self.delay = delay
+        self.on_error = on_error
+        # on_flush(секунды) после каждой успешной записи
+        self.on_flush = None
+
+        self.flushes = 0
+        self.last_flush_time = 0.0
+
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._dirty = False
+        self._timer = None
+
+    def mark_dirty(self, key=None):
+        """Пометить данные измененными и запланировать запись
+
+        key - измененная запись словаря; JSON-файл все равно
+        перезаписывается целиком, ключ нужен хранилищам с построчной записью.
+        """
+        with self._lock:
+            self._mark(key)
+            if self._timer is None:
+                self._timer = threading.Timer(self.delay, self._on_timer)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _on_timer(self):
+        with self._lock:
+            self._timer = None
+        self.flush()
+
+    def _mark(self, key):
+        self._dirty = True
+
+    def _take_changes(self):
+        """Забрать накопленные изменения (под self._lock)"""
+        if not self._dirty:
+            return None
+        self._dirty = False
+        return True
+
+    def _restore_changes(self, changes):
+        """Вернуть изменения после неудачной записи (под self._lock)"""
+        self._dirty = True
+
+    def _snapshot(self):
+        # Словарь могут менять другие потоки прямо во время сериализации
+        for _ in range(5):
+            try:
+                return json.dumps(self.data, ensure_ascii=False, indent=2)
+            except RuntimeError:
+                continue
+        return json.dumps(dict(self.data), ensure_ascii=False, indent=2)
+
+    def _write(self, changes):
+        atomic_write_json(self.path, self._snapshot())
+
+    def flush(self):
+        """Немедленная запись, если есть несохраненные изменения"""
+        with self._write_lock:
+            with self._lock:
+                changes = self._take_changes()
+            if not changes:
+                return
+
+            try:
+                started = time.perf_counter()
+                self._write(changes)
+                self.flushes += 1
+                self.last_flush_time = time.perf_counter() - started
+                if self.on_flush:
+                    self.on_flush(self.last_flush_time)
+            except Exception as e:
+                with self._lock:
+                    self._restore_changes(changes)
+                if self.on_error:
+                    self.on_error(e)
+
+    def save(self, key=None):
+        """Пометить измененным и сразу записать (для редких правок из интерфейса)"""
+        with self._lock:
+            self._mark(key)
+        self.flush()
+
+    def close(self):
+        """Отмена таймера и запись оставшихся изменений"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        self.flush()
+
+
+def _dump_row(value):
+    # Запись может меняться другим потоком во время сериализации
+    for _ in range(5):
+        try:
+            return json.dumps(value, ensure_ascii=False)
+        except RuntimeError:
+            continue
+    return json.dumps(dict(value), ensure_ascii=False)
+
+
+class SqliteDatabase:
+    """База SQLite в режиме WAL: каждая таблица - словарь ключ -> JSON-запись
+
+    Порядок записей сохраняется по rowid, поэтому обновление существующей
+    записи не меняет ее место в списке.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.commit()
+        self._tables = set()
+
+    def _ensure_table(self, table):
+        if table not in self._tables:
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, data TEXT NOT NULL)")
+            self._tables.add(table)
+
+    def load(self, table):
+        """Все записи таблицы в исходном порядке"""
+        with self._lock:
+            self._ensure_table(table)
+            rows = self._conn.execute(f"SELECT key, data FROM {table} ORDER BY rowid").fetchall()
+            self._conn.commit()
+        return {key: json.loads(data) for key, data in rows}
+
+    def write(self, table, data, keys=None):
+        """Запись измененных ключей (keys=None - синхронизация всей таблицы)
+
+        Удаленные из словаря ключи удаляются и из таблицы.
+        """
+        if keys is None:
+            for _ in range(5):
+                try:
+                    keys = list(data)
+                    break
+                except RuntimeError:
+                    continue
+            full = True
+        else:
+            full = False
+
+        upserts = []
+        deletes = []
+        for key in keys:
+            value = data.get(key)
+            if value is None:
+                deletes.append((key,))
+            else:
+                upserts.append((key, _dump_row(value)))
+
+        with self._lock, self._conn:
+            self._ensure_table(table)
+            if full:
+                present = set(keys)
+                deletes = [(key,) for (key,) in self._conn.execute(f"SELECT key FROM {table}")
+                           if key not in present]
+            self._conn.executemany(
+                f"INSERT INTO {table} (key, data) VALUES (?, ?) "
+                f"ON CONFLICT(key) DO UPDATE SET data = excluded.data", upserts)
+            self._conn.executemany(f"DELETE FROM {table} WHERE key = ?", deletes)
+
+    def migrate_json(self, table, json_path):
+        """Однократный перенос записей из JSON-файла, возвращает их число
+
+        Перенос выполняется, только если таблица еще не заполнялась;
+        сам JSON-файл не удаляется и остается резервной копией.
+        """
+        marker = f'migrated:{table}'
+        with self._lock:
+            self._ensure_table(table)
+            done = self._conn.execute("SELECT 1 FROM meta WHERE key = ?", (marker,)).fetchone()
+            empty = self._conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone() is None
+            self._conn.commit()
+        if done or not empty:
+            return 0
+
+        data = {}
+        if os.path.exists(json_path):
+            with open(json_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        self.write(table, data)
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                               (marker, os.path.abspath(json_path)))
+        return len(data)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class SqliteStore(WriteBehindStore):
+    """Отложенная запись в таблицу SQLite: сохраняются только измененные записи"""
+
+    def __init__(self, database, table, data, delay=5.0, on_error=None):
+        super().__init__(database.path, data, delay, on_error)
+        self.database = database
+        self.table = table
+        self._keys = set()
+        self._full = False
+
+    def _mark(self, key):
+        if key is None:
+            self._full = True
+        else:
+            self._keys.add(key)
+
+    def _take_changes(self):
+        if not self._full and not self._keys:
+            return None
+        changes = (self._full, self._keys)
+        self._full = False
+        self._keys = set()
+        return changes
+
+    def _restore_changes(self, changes):
+        full, keys = changes
+        self._full = self._full or full
+        self._keys |= keys
+
+    def _write(self, changes):
+        full, keys = changes
+        self.database.write(self.table, self.data, None if full else keys)
@@ -0,0 +1,99 @@
+import random
+
+
+LITERAL = 0
+VARIABLE = 1
+RANDOM = 2
+
+VARIABLES = ('user', 'count', 'args', 'uptime')
+
+
+class Template:
+    """Разобранный шаблон ответа: список частей (вид, значение)
+
+    Поддерживаются {user}, {count}, {args}, {uptime} и {random:a|b|c};
+    {{ и }} дают фигурные скобки, неизвестные {...} остаются как есть.
+    """
+
+    __slots__ = ('source', 'parts', 'static')
+
+    def __init__(self, source, parts):
+        self.source = source
+        self.parts = parts
+        # Шаблон без переменных отдается без сборки
+        self.static = None
+        if not parts:
+            self.static = ''
+        elif len(parts) == 1 and parts[0][0] == LITERAL:
+            self.static = parts[0][1]
+
+    def render(self, values):
+        """Сборка ответа; values - словарь значений переменных"""
+        if self.static is not None:
+            return self.static
+        result = []
+        for kind, value in self.parts:
+            if kind == LITERAL:
+                result.append(value)
+            elif kind == VARIABLE:
+                result.append(str(values.get(value, '')))
+            else:
+                result.append(random.choice(value))
+        return ''.join(result)
+
+    def __repr__(self):
+        return f"Template({self.source!r})"
+
+
+def compile_template(source):
+    """Разбор строки шаблона в Template (выполняется один раз при загрузке/сохранении)"""
+    parts = []
+    literal = []
+    i = 0
+    length = len(source)
+    while i < length:
+        char = source[i]
+        if char in '{}' and source.startswith(char * 2, i):
+            literal.append(char)
+            i += 2
+            continue
+        if char == '{':
+            end = source.find('}', i + 1)
+            if end != -1:
+                part = _compile_placeholder(source[i + 1:end])
+                if part is not None:
+                    if literal:
+                        parts.append((LITERAL, ''.join(literal)))
+                        literal = []
+                    parts.append(part)
+                    i = end + 1
+                    continue
+        literal.append(char)
+        i += 1
+
+    if literal:
+        parts.append((LITERAL, ''.join(literal)))
+    return Template(source, parts)
+
+
+def _compile_placeholder(body):
+    name, sep, argument = body.partition(':')
+    name = name.strip().lower()
+    if name == 'random' and sep:
+        choices = tuple(choice.strip() for choice in argument.split('|'))
+        return (RANDOM, choices)
+    if name in VARIABLES and not sep:
+        return (VARIABLE, name)
+    return None
+
+
+def format_duration(seconds):
+    """Длительность вида "2 ч 5 мин" для {uptime}"""
+    seconds = int(max(0, seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours} ч {minutes} мин"
+    if minutes:
+        return f"{minutes} мин {seconds} с"
+    return f"{seconds} с"
@@ -0,0 +1,73 @@
+import gzip
+import json
+import time
+
+import pytest
+
+from archive import ChatArchive, segment_day
+from irc_parser import parse_message
+
+# 2024-05-01 00:00 UTC
+DAY = 1714521600.0
+
+
+def privmsg(text, nick='viewer'):
+    return parse_message(f"@id=m{len(text)};user-id=7 :{nick}!{nick}@{nick}.tmi.twitch.tv PRIVMSG #chan :{text}")
+
+
+def read_segment(path):
+    opener = gzip.open if path.name.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def write(archive, *entries):
+    archive.start()
+    for text, timestamp in entries:
+        archive.append('chan', privmsg(text), timestamp)
+    archive.close()
+
+
+def test_segments_rotate_by_size_and_closed_ones_are_gzipped(tmp_path):
+    archive = ChatArchive(str(tmp_path), fsync='always', max_segment_bytes=200)
+    write(archive, *((f'сообщение {i}', DAY + i) for i in range(10)))
+
+    names = sorted(path.name for path in (tmp_path / 'chan').iterdir())
+    assert len(names) > 2
+    # Все сегменты, кроме последнего, закрыты и сжаты
+    assert all(name.endswith('.jsonl.gz') for name in names[:-1])
+    assert names[-1] == f'2024-05-01.{len(names) - 1:04d}.jsonl'
+    assert archive.segments_closed == len(names)
+
+    records = [record for name in names for record in read_segment(tmp_path / 'chan' / name)]
+    assert [record['text'] for record in records] == [f'сообщение {i}' for i in range(10)]
+    assert records[0] == {'ts': DAY, 'cmd': 'PRIVMSG', 'user': 'viewer', 'text': 'сообщение 0',
+                          'id': 'm11', 'uid': '7'}
+    assert archive.stats()['written'] == 10
+
+
+def test_new_day_closes_segment(tmp_path):
+    archive = ChatArchive(str(tmp_path), fsync='never')
+    write(archive, ('вчера', DAY + 3600), ('сегодня', DAY + 86400 + 60))
+    assert sorted(path.name for path in (tmp_path / 'chan').iterdir()) == [
+        '2024-05-01.0000.jsonl.gz', '2024-05-02.0000.jsonl']
+
+
+def test_restart_appends_to_open_segment_and_compresses_old_days(tmp_path):
+    now = time.time()
+    write(ChatArchive(str(tmp_path)), ('старое', DAY), ('первое', now))
+    (tmp_path / 'chan' / '2024-05-01.0000.jsonl.gz').rename(tmp_path / 'chan' / 'old.gz')
+    # Несжатый сегмент прошлого дня, например после сбоя
+    (tmp_path / 'chan' / '2024-05-01.0001.jsonl').write_text('{"ts":1}\n')
+
+    write(ChatArchive(str(tmp_path)), ('второе', now + 1))
+    today = segment_day(now)
+    names = sorted(path.name for path in (tmp_path / 'chan').iterdir())
+    assert names == ['2024-05-01.0001.jsonl.gz', f'{today}.0000.jsonl', 'old.gz']
+    assert [record['text'] for record in read_segment(tmp_path / 'chan' / f'{today}.0000.jsonl')] == \
+        ['первое', 'второе']
+
+
+def test_unknown_fsync_policy():
+    with pytest.raises(ValueError):
+        ChatArchive('unused', fsync='sometimes')
@@ -0,0 +1,78 @@
+import gzip
+import json
+import os
+import shutil
+
+import pytest
+
+from archive_search import ArchiveIndex, command_of, parse_time
+
+
+RECORDS = [
+    {'ts': 100.0, 'cmd': 'PRIVMSG', 'user': 'alice', 'text': '!sens please'},
+    {'ts': 200.0, 'cmd': 'PRIVMSG', 'user': 'Bob', 'text': 'hello chat'},
+    {'ts': 300.0, 'cmd': 'PRIVMSG', 'user': 'alice', 'text': '!Dpi'},
+    {'ts': 400.0, 'cmd': 'PRIVMSG', 'user': 'bob', 'text': '!sens again'},
+]
+
+
+@pytest.fixture
+def archive(tmp_path):
+    channel_dir = tmp_path / 'chan'
+    channel_dir.mkdir()
+    path = channel_dir / '2024-05-01.0000.jsonl'
+    path.write_text(''.join(json.dumps(record) + '\n' for record in RECORDS), encoding='utf-8')
+    index = ArchiveIndex(str(tmp_path))
+    yield index, path
+    index.close()
+
+
+def texts(results):
+    return [record['text'] for _, record in results]
+
+
+def test_search_by_user_command_text_and_time(archive):
+    index, _ = archive
+    assert index.update() == 4
+    assert index.update() == 0
+    assert texts(index.search(user='@Alice')) == ['!sens please', '!Dpi']
+    assert texts(index.search(command='!dpi')) == ['!Dpi']
+    assert texts(index.search(text='SENS', newest_first=True)) == ['!sens again', '!sens please']
+    assert texts(index.search(since=150, until=350)) == ['hello chat', '!Dpi']
+    assert texts(index.search(channel='#other')) == []
+    assert [channel for channel, _ in index.search(limit=1)] == ['chan']
+
+
+def test_growing_segment_is_indexed_incrementally(archive):
+    index, path = archive
+    index.update()
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps({'ts': 500.0, 'user': 'carol', 'text': '!sens'}) + '\n')
+        # Недописанная строка дочитывается при следующем update()
+        f.write('{"ts": 600.0')
+    os.utime(path, (1, 1))
+    assert index.update() == 1
+    assert texts(index.search(command='sens')) == ['!sens please', '!sens again', '!sens']
+
+
+def test_segment_compressed_after_indexing(archive):
+    index, path = archive
+    index.update()
+    with open(path, 'rb') as src, gzip.open(str(path) + '.gz', 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(path)
+    assert texts(index.search(user='bob')) == ['hello chat', '!sens again']
+
+    # После update() сегмент переиндексирован под новым именем
+    assert index.update() == 4
+    assert texts(index.search(user='bob')) == ['hello chat', '!sens again']
+
+
+def test_helpers():
+    assert command_of('!Sens now') == 'sens'
+    assert command_of('?x', ('!', '?')) == 'x'
+    assert command_of('!') is None and command_of('hi') is None
+    assert parse_time(5) == 5
+    assert parse_time('2024-05-01') < parse_time('2024-05-01 12:30')
+    with pytest.raises(ValueError):
+        parse_time('yesterday')
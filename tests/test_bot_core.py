@@ -0,0 +1,85 @@
+import asyncio
+import json
+
+import pytest
+
+from bot_core import BotCore
+from chat_handler import MODERATE, REPLY
+
+
+@pytest.fixture
+def core(tmp_path, monkeypatch):
+    (tmp_path / 'commands.json').write_text(json.dumps({'sens': {'response': '800 dpi', 'usage_count': 0}}))
+    core = BotCore(config_path=str(tmp_path / 'config.json'), commands_path=str(tmp_path / 'commands.json'),
+                   auto_messages_path=str(tmp_path / 'auto_messages.json'))
+    core.on_log = lambda message: None
+    # Как в потоке движка с открытой сессией, но без сети
+    monkeypatch.setattr(BotCore, 'connected', property(lambda self: True))
+    monkeypatch.setattr(core.engine, 'in_engine_thread', lambda: True)
+    core.engine._session = {}
+    core.engine._outbox_event = asyncio.Event()
+    return core
+
+
+def test_reply_counted_only_when_queued(core):
+    archived = []
+    core.archive_outgoing = lambda channel, message: archived.append(message)
+
+    core.execute('chan', 'viewer', [(REPLY, 'sens', ['800 dpi'])])
+    # Такой же ответ еще ждет отправки - повтор в очередь не попадает
+    core.execute('chan', 'viewer', [(REPLY, 'sens', ['800 dpi'])])
+    assert core.commands['sens']['usage_count'] == 1
+    assert core.commands_handled.value == 1
+    assert archived == ['800 dpi']
+
+    core.engine.outbox.max_size = len(core.engine.outbox)
+    core.execute('chan', 'viewer', [(REPLY, 'sens', ['a', 'b'])])
+    assert core.commands['sens']['usage_count'] == 1
+    assert archived == ['800 dpi']
+    core.engine.outbox.max_size = 100
+    core.execute('chan', 'viewer', [(REPLY, 'sens', ['a', 'b'])])
+    assert core.commands['sens']['usage_count'] == 2
+    assert archived == ['800 dpi', 'a', 'b']
+
+
+def test_send_from_other_threads_reports_handoff(core, monkeypatch):
+    monkeypatch.setattr(core.engine, 'in_engine_thread', lambda: False)
+    calls = []
+    monkeypatch.setattr(core.engine.loop, 'call_soon_threadsafe', lambda *args: calls.append(args))
+    assert core.send_message('chan', 'hi') is True
+    assert len(calls) == 1
+
+
+def test_moderation_notices_match_only_moderation_msg_ids(core):
+    logs = []
+    core.on_log = logs.append
+    core.execute('chan', 'viewer', [(MODERATE, 'timeout', 'viewer', None, None, None, 60, 'капс')])
+    core.execute('chan', 'bad', [(MODERATE, 'delete', 'bad', None, None, 'm2', None, 'фраза')])
+    assert [line for _, _, _, _, line in sorted(core.engine.outbox._heap)] == \
+        ['PRIVMSG #chan :/timeout viewer 60 капс', 'PRIVMSG #chan :/delete m2']
+
+    # NOTICE об обычном ответе между командами модерации
+    core.handle_line('@msg-id=msg_duplicate :tmi.twitch.tv NOTICE #chan :Your message was not sent.')
+    core.handle_line('@msg-id=msg_ratelimit :tmi.twitch.tv NOTICE #chan :You are sending messages too quickly.')
+    assert core.moderation_actions.value == 0 and core.moderation_failed.value == 0
+
+    core.handle_line('@msg-id=timeout_success :tmi.twitch.tv NOTICE #chan :viewer has been timed out.')
+    core.handle_line('@msg-id=msg_slowmode :tmi.twitch.tv NOTICE #chan :This room is in slow mode.')
+    core.handle_line('@msg-id=bad_delete_message_mod :tmi.twitch.tv NOTICE #chan :You cannot delete it.')
+    assert core.moderation_actions.value == 1 and core.moderation_failed.value == 1
+    assert any('viewer: капс -> timeout' in line for line in logs)
+    assert any('bad (delete): You cannot delete it.' in line for line in logs)
+    assert not core._moderation_pending['chan']
+
+
+def test_auto_message_waits_full_interval_while_disconnected(core, monkeypatch):
+    monkeypatch.setattr(BotCore, 'connected', property(lambda self: False))
+    core.auto_messages_enabled = True
+    core.auto_messages['1'] = {'message': 'подпишись', 'interval': 10, 'last_sent': 0}
+
+    core.send_auto_message('1')
+    # Без соединения следующая попытка через полный интервал, а не сразу
+    assert core.auto_scheduler.next_delay() > 10 * 60 - 5
+    assert core.auto_scheduler.pop_due() == []
+    assert core.auto_messages['1']['last_sent'] == 0
+    assert len(core.engine.outbox) == 0
@@ -0,0 +1,76 @@
+from chat_handler import MESSAGE_LIMIT, ChatHandler, REPLY
+from irc_parser import parse_message
+from moderation import Moderator
+
+
+def privmsg(text, channel='chan', nick='viewer'):
+    return parse_message(f":{nick}!{nick}@{nick}.tmi.twitch.tv PRIVMSG #{channel} :{text}")
+
+
+def reply(chat, text, channel='chan'):
+    actions = chat.evaluate(privmsg(text, channel), channel, text)
+    return [action[2] for action in actions if action[0] == REPLY]
+
+
+def test_per_channel_response_overrides():
+    commands = {'sens': {'response': '800 dpi', 'responses': {'other': '{user}: 1600 dpi'}}}
+    chat = ChatHandler(commands, {}, Moderator())
+    assert reply(chat, '!sens') == [['800 dpi']]
+    assert reply(chat, '!sens', 'other') == [['viewer: 1600 dpi']]
+
+    # Правка в обход command_changed() тоже подхватывается
+    commands['sens']['responses']['other'] = '400 dpi'
+    assert reply(chat, '!sens', 'other') == [['400 dpi']]
+    del commands['sens']['responses']
+    assert reply(chat, '!sens', 'other') == [['800 dpi']]
+
+
+def test_commands_list_pages_fit_message_limit():
+    commands = {'commands': {'response': ''}}
+    for i in range(120):
+        commands[f'command_{i:03}_{"x" * 20}'] = {'response': str(i)}
+    commands['y' * 600] = {'response': 'длинное имя'}
+    commands['hidden'] = {'response': '-', 'channels': ['other']}
+    chat = ChatHandler(commands, {}, Moderator())
+
+    pages = reply(chat, '!commands')[0]
+    assert len(pages) > 1
+    assert all(len(page) <= MESSAGE_LIMIT for page in pages)
+    assert pages[0].startswith(f"Доступные команды (1/{len(pages)}): ")
+    listed = ' '.join(pages)
+    assert all(f'!command_{i:03}_' in listed for i in range(120))
+    assert '!hidden' not in listed
+    assert '!hidden' in ' '.join(chat.get_commands_list('other'))
+
+
+def test_commands_list_cache_invalidated_on_changes():
+    commands = {'commands': {'response': ''}, 'sens': {'response': '800 dpi'}}
+    chat = ChatHandler(commands, {}, Moderator())
+    assert reply(chat, '!commands') == [['Доступные команды: !commands, !sens']]
+    # Повторный вызов берет готовые страницы из кэша
+    assert chat.get_commands_list('chan') is chat.get_commands_list('chan')
+
+    commands['dpi'] = {'response': '800'}
+    chat.command_changed('dpi')
+    assert reply(chat, '!commands') == [['Доступные команды: !commands, !dpi, !sens']]
+    del commands['sens']
+    chat.command_changed('sens')
+    assert reply(chat, '!commands') == [['Доступные команды: !commands, !dpi']]
+
+    chat.apply_config({'command_prefixes': ['?', '!']})
+    assert reply(chat, '?commands') == [['Доступные команды: ?commands, ?dpi']]
+
+    chat.set_plugin_commands({'roll': {}})
+    assert reply(chat, '?commands') == [['Доступные команды: ?commands, ?dpi, ?roll']]
+
+
+def test_response_cannot_be_turned_into_chat_command():
+    commands = {'say': {'response': '{args}'}, 'me': {'response': '/me {user} машет'},
+                'long': {'response': 'a' * 700}}
+    chat = ChatHandler(commands, {}, Moderator())
+    assert reply(chat, '!say /ban streamer') == [['ban streamer']]
+    assert reply(chat, '!say  . /timeout streamer 600') == [['timeout streamer 600']]
+    assert reply(chat, '!say привет /ban') == [['привет /ban']]
+    # Команду в начале задал сам шаблон - она остается
+    assert reply(chat, '!me') == [['/me viewer машет']]
+    assert reply(chat, '!long') == [['a' * MESSAGE_LIMIT]]
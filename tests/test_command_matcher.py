@@ -0,0 +1,82 @@
+from chat_handler import ChatHandler, LOG
+from command_matcher import CommandMatcher, parse_aliases, trigger_conflicts
+from irc_parser import parse_message
+from moderation import Moderator
+
+
+def matcher_for(commands, prefixes=('!',)):
+    matcher = CommandMatcher(prefixes)
+    matcher.rebuild(commands)
+    return matcher
+
+
+def test_match_command_and_args():
+    matcher = matcher_for({'sens': {}})
+    assert matcher.match('!sens') == ('sens', [])
+    assert matcher.match('!SENS  a b') == ('sens', ['a', 'b'])
+    assert matcher.match('!nope x') == (None, ['nope', 'x'])
+    assert matcher.match('sens') is None
+    assert matcher.match('! sens') is None
+    assert matcher.match('!') is None
+
+
+def test_aliases_and_longest_match():
+    matcher = matcher_for({'dpi': {'aliases': 'mouse, Мышь Какая'}, 'мышь': {}})
+    assert matcher.match('!mouse x') == ('dpi', ['x'])
+    assert matcher.match('!мышь какая у тебя') == ('dpi', ['у', 'тебя'])
+    assert matcher.match('!мышь другая') == ('мышь', ['другая'])
+    assert parse_aliases(' a ,  b  c, a,') == ['a', 'b c']
+
+
+def test_update_and_remove():
+    matcher = matcher_for({'dpi': {'aliases': ['mouse settings']}, 'mouse': {}})
+    matcher.update('dpi', {'aliases': ['sens']})
+    assert matcher.match('!mouse settings') == ('mouse', ['settings'])
+    assert matcher.match('!sens') == ('dpi', [])
+    matcher.update('dpi', None)
+    assert matcher.match('!dpi') == (None, ['dpi'])
+    assert matcher.match('!mouse') == ('mouse', [])
+    assert len(matcher) == 1
+
+
+def test_prefixes():
+    matcher = matcher_for({'sens': {}}, ['!', '!!', '?'])
+    assert matcher.display_prefix == '!'
+    assert matcher.match('?sens') == ('sens', [])
+    assert matcher.match('!!sens') == ('sens', [])
+    matcher.set_prefixes('')
+    assert matcher.prefixes == ['!']
+
+
+def test_debug_log_for_unknown_command():
+    chat = ChatHandler({'sens': {'response': '800 dpi'}}, {}, Moderator())
+    msg = parse_message(':viewer!viewer@host PRIVMSG #chan :!nope x')
+    logs = [action[2] for action in chat.evaluate(msg, 'chan', '!nope x', debug=True) if action[0] == LOG]
+    assert logs[0] == "[DEBUG] Команда '!nope x' не найдена в списке"
+    assert not any('None' in text for text in logs)
+
+
+def test_alias_colliding_with_command_name():
+    matcher = matcher_for({'mouse': {}, 'dpi': {'aliases': ['mouse', 'sens']}, 'sens2': {'aliases': ['sens']}})
+    # Имя команды важнее синонима другой команды
+    assert matcher.match('!mouse') == ('mouse', [])
+    matcher.update('dpi', None)
+    assert matcher.match('!mouse') == ('mouse', [])
+    assert matcher.match('!sens') == ('sens2', [])
+
+    matcher.update('mouse', None)
+    matcher.update('dpi', {'aliases': ['mouse']})
+    assert matcher.match('!mouse') == ('dpi', [])
+    matcher.update('mouse', {})
+    assert matcher.match('!mouse') == ('mouse', [])
+    # Переименование синонима возвращает триггер настоящей команде
+    matcher.update('dpi', {'aliases': ['мышь']})
+    assert matcher.match('!mouse') == ('mouse', [])
+    assert matcher.match('!мышь') == ('dpi', [])
+
+
+def test_trigger_conflicts():
+    commands = {'mouse': {}, 'dpi': {'aliases': ['Sens  Now']}}
+    assert trigger_conflicts('new', 'MOUSE, sens now, free', commands) == [('MOUSE', 'mouse'), ('sens now', 'dpi')]
+    # Собственные имя и синонимы команды конфликтом не считаются
+    assert trigger_conflicts('dpi', ['sens now', 'dpi'], commands) == []
@@ -0,0 +1,62 @@
+from chat_handler import ChatHandler
+from cooldown import CooldownIndex
+from moderation import Moderator
+
+
+def test_remaining_and_expiry():
+    index = CooldownIndex()
+    index.start('a', 10, now=100)
+    assert index.remaining('a', 105) == 5
+    assert index.remaining('a', 110) == 0
+    # Истекшая запись удаляется при обращении
+    assert len(index) == 0
+    index.start('b', 0, now=100)
+    assert index.remaining('b', 100) == 0 and len(index) == 0
+
+
+def test_expired_entries_are_dropped_on_start():
+    index = CooldownIndex()
+    index.start('a', 1, now=0)
+    index.start('b', 1, now=0)
+    index.start('c', 1, now=5)
+    assert len(index) == 1
+
+
+def test_oldest_keys_are_evicted():
+    index = CooldownIndex(max_size=2)
+    for key in 'abc':
+        index.start(key, 100, now=0)
+    assert index.evicted == 1
+    assert index.remaining('a', 1) == 0
+    assert index.remaining('c', 1) == 99
+
+
+def test_restart_moves_key_to_end():
+    index = CooldownIndex(max_size=2)
+    index.start('a', 100, now=0)
+    index.start('b', 100, now=0)
+    index.start('a', 100, now=1)
+    index.start('c', 100, now=2)
+    assert index.remaining('a', 3) and not index.remaining('b', 3)
+
+
+def test_global_command_and_user_cooldowns(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('chat_handler.time.monotonic', lambda: now[0])
+    commands = {'sens': {'response': '800 dpi', 'cooldown': 10, 'user_cooldown': 60},
+                'dpi': {'response': '800'}}
+    chat = ChatHandler(commands, {'global_cooldown': 2}, Moderator())
+
+    assert chat.on_cooldown('sens', commands['sens'], 'chan', 'a') is None
+    key, remaining = chat.on_cooldown('dpi', commands['dpi'], 'chan', 'a')
+    assert key == ('chan',) and remaining == 2
+    # Другой канал не затронут
+    assert chat.on_cooldown('sens', commands['sens'], 'other', 'a') is None
+
+    now[0] += 5
+    assert chat.on_cooldown('sens', commands['sens'], 'chan', 'b')[0] == ('chan', 'sens')
+    assert chat.on_cooldown('dpi', commands['dpi'], 'chan', 'b') is None
+
+    now[0] += 10
+    assert chat.on_cooldown('sens', commands['sens'], 'chan', 'a')[0] == ('chan', 'sens', 'a')
+    assert chat.on_cooldown('sens', commands['sens'], 'chan', 'b') is None
@@ -0,0 +1,58 @@
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+
+from mock_irc import MockIrcServer, PROBE_COMMAND, PROBE_REPLY
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# headless.main() и проверка, что Tk так и не был загружен
+RUN_HEADLESS = ("import sys, headless; code = headless.main(); "
+                "print('tk:', 'tkinter' in sys.modules); sys.exit(code)")
+
+
+def headless(tmp_path, **kwargs):
+    return subprocess.Popen(
+        [sys.executable, '-c', RUN_HEADLESS, '--no-auto-messages',
+         '--config', str(tmp_path / 'config.json'), '--commands', str(tmp_path / 'commands.json'),
+         '--auto-messages', str(tmp_path / 'auto_messages.json')],
+        cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, **kwargs)
+
+
+def test_headless_requires_token_and_channels(tmp_path):
+    (tmp_path / 'config.json').write_text(json.dumps({'channels': 'chan'}))
+    process = headless(tmp_path)
+    stdout, stderr = process.communicate(timeout=30)
+    assert process.returncode == 1
+    assert 'oauth_token' in stderr
+    assert 'tk: False' in stdout
+
+
+def test_headless_answers_commands_without_tk(tmp_path):
+    (tmp_path / 'commands.json').write_text(json.dumps({
+        PROBE_COMMAND: {'response': f'{PROBE_REPLY} {{args}}', 'usage_count': 0}}))
+    server = MockIrcServer([], 600, ['chan'], probe_every=1)
+
+    async def scenario():
+        await server.start()
+        (tmp_path / 'config.json').write_text(json.dumps({
+            'oauth_token': 'token', 'channels': 'chan', 'irc_tls': False,
+            'irc_host': server.host, 'irc_port': server.port}))
+        process = headless(tmp_path)
+        try:
+            await asyncio.wait_for(server.joined.wait(), 30)
+            await server.replay(1)
+            await server.wait_replies(10)
+        finally:
+            process.send_signal(signal.SIGTERM)
+            await server.stop()
+        return process
+
+    process = asyncio.run(scenario())
+    stdout, stderr = process.communicate(timeout=30)
+    assert process.returncode == 0, stderr
+    assert 'tk: False' in stdout
+    assert server.probes_sent == 10
+    assert server.replies == server.probes_sent
@@ -0,0 +1,89 @@
+import asyncio
+import json
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from helix import HelixClient, HelixError
+
+
+class HelixHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _reply(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        url = urllib.parse.urlsplit(self.path)
+        self.server.requests.append({
+            'method': self.command, 'path': url.path, 'query': dict(urllib.parse.parse_qsl(url.query)),
+            'auth': self.headers.get('Authorization'), 'client_id': self.headers.get('Client-Id'),
+            'body': json.loads(self.rfile.read(length)) if length else None,
+        })
+        if url.path == '/validate':
+            status, body = 200, {'client_id': 'cid', 'user_id': '99', 'scopes': ['moderator:manage:banned_users']}
+        elif self.server.requests[-1]['query'].get('broadcaster_id') == 'denied':
+            status, body = 403, {'error': 'Forbidden', 'status': 403, 'message': 'not a moderator'}
+        elif self.command == 'DELETE':
+            status, body = 204, None
+        else:
+            status, body = 200, {'data': []}
+        payload = json.dumps(body).encode() if body is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST = do_DELETE = _reply
+
+
+@pytest.fixture
+def server():
+    server = HTTPServer(('127.0.0.1', 0), HelixHandler)
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def client_for(server):
+    base = f"http://127.0.0.1:{server.server_port}"
+    return HelixClient('oauth:token', base_url=base, validate_url=base + '/validate')
+
+
+def test_validate_ban_and_delete(server):
+    helix = client_for(server)
+
+    async def run():
+        await helix.validate()
+        assert helix.ready and helix.missing_scopes() == ['moderator:manage:chat_messages']
+        await helix.ban('7', '42', 'капс', 60)
+        await helix.ban('7', '42', 'ссылка')
+        await helix.delete_message('7', 'm1')
+
+    asyncio.run(run())
+    validate, timeout, ban, delete = server.requests
+    assert validate['auth'] == 'OAuth token'
+    assert timeout['method'] == 'POST' and timeout['path'] == '/moderation/bans'
+    assert timeout['query'] == {'broadcaster_id': '7', 'moderator_id': '99'}
+    assert timeout['auth'] == 'Bearer token' and timeout['client_id'] == 'cid'
+    assert timeout['body'] == {'data': {'user_id': '42', 'reason': 'капс', 'duration': 60}}
+    assert ban['body'] == {'data': {'user_id': '42', 'reason': 'ссылка'}}
+    assert delete['method'] == 'DELETE' and delete['path'] == '/moderation/chat'
+    assert delete['query'] == {'broadcaster_id': '7', 'moderator_id': '99', 'message_id': 'm1'}
+
+
+def test_error_message_from_response(server):
+    helix = client_for(server)
+
+    async def run():
+        await helix.validate()
+        await helix.ban('denied', '42', 'спам')
+
+    with pytest.raises(HelixError) as error:
+        asyncio.run(run())
+    assert error.value.status == 403
+    assert 'not a moderator' in str(error.value)
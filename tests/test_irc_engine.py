@@ -0,0 +1,267 @@
+import asyncio
+import shutil
+import ssl
+import time
+
+import pytest
+
+from bench import _self_signed_cert
+from irc_engine import IrcConnection, IrcEngine, create_ssl_context
+from mock_irc import MockIrcServer
+from rate_limit import PRIORITY_AUTO, PRIORITY_REPLY
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.fixture
+def engine():
+    engine = IrcEngine(on_state=lambda state, detail: states.append(state))
+    states = engine.test_states = []
+    engine.reconnect_base_delay = 0.01
+    engine.stable_after = 0.5
+    engine.start()
+    yield engine
+    engine.stop()
+
+
+def start_server(engine, channels, **kwargs):
+    """MockIrcServer в цикле движка"""
+    server = MockIrcServer([], 60, channels, **kwargs)
+    engine.submit(server.start()).result(5)
+    return server
+
+
+def test_send_reports_whether_line_was_queued(monkeypatch):
+    engine = IrcEngine()
+    monkeypatch.setattr(engine, 'in_engine_thread', lambda: True)
+    # Без сессии строки не принимаются
+    assert engine.send_privmsg('chan', 'hi') is False
+
+    engine._session = {}
+    engine._outbox_event = asyncio.Event()
+    assert engine.send_privmsg('chan', 'hi') is True
+    assert engine.send_privmsg('chan', 'hi') is False
+    assert engine.send_privmsgs('chan', ['a', 'b']) is True
+    assert engine.send_privmsgs('chan', ['a', 'b']) is False
+    assert [line for _, _, _, _, line in sorted(engine.outbox._heap)] == \
+        ['PRIVMSG #chan :hi', 'PRIVMSG #chan :a', 'PRIVMSG #chan :b']
+
+    # Из другого потока строка только передается в цикл движка
+    monkeypatch.setattr(engine, 'in_engine_thread', lambda: False)
+    calls = []
+    monkeypatch.setattr(engine.loop, 'call_soon_threadsafe', lambda *args: calls.append(args))
+    assert engine.send_raw('PRIVMSG #chan :x', PRIORITY_REPLY, 'chan') is True
+    assert engine.send_batch(['PRIVMSG #chan :y'], PRIORITY_REPLY, 'chan') is True
+    assert [call[0] for call in calls] == [engine._enqueue, engine._enqueue_batch]
+    engine.loop.close()
+
+
+def test_failed_write_keeps_line_queued():
+    engine = IrcEngine()
+
+    class BrokenWriter:
+        def write(self, data):
+            pass
+
+        async def drain(self):
+            raise ConnectionResetError("сброс соединения")
+
+    async def run():
+        engine._outbox_event = asyncio.Event()
+        engine._session = {'shard_policy': 'hash'}
+        connection = IrcConnection(engine, 0, ['chan'])
+        connection.connected = True
+        connection.writer = BrokenWriter()
+        connection._lost = asyncio.get_running_loop().create_future()
+        engine.connections = [connection]
+        engine._owners = {'chan': connection}
+
+        now = time.monotonic()
+        engine.outbox.put('PRIVMSG #chan :auto', PRIORITY_AUTO, 'chan', now - 2)
+        engine.outbox.put('PRIVMSG #chan :reply', PRIORITY_REPLY, 'chan', now - 1)
+        task = asyncio.create_task(engine._write_loop())
+        error = await asyncio.wait_for(connection._lost, 5)
+        await asyncio.sleep(0.05)
+        task.cancel()
+        return now, error
+
+    now, error = asyncio.run(run())
+    assert isinstance(error, ConnectionResetError)
+    # Строка вернулась с прежними приоритетом и временем, порядок не изменился
+    assert [(priority, queued_at, line) for priority, _, queued_at, _, line in sorted(engine.outbox._heap)] == [
+        (PRIORITY_REPLY, now - 1, 'PRIVMSG #chan :reply'), (PRIORITY_AUTO, now - 2, 'PRIVMSG #chan :auto')]
+    assert engine.outbox.sent == 0
+    engine.loop.close()
+
+
+def test_backoff_grows_to_max(monkeypatch):
+    engine = IrcEngine()
+    engine.reconnect_base_delay = 1.0
+    engine.reconnect_max_delay = 10.0
+    monkeypatch.setattr('irc_engine.random.uniform', lambda low, high: high)
+    assert [engine._backoff(attempt) for attempt in range(6)] == [1.0, 2.0, 4.0, 8.0, 10.0, 10.0]
+    engine.loop.close()
+
+
+def test_reconnect_request_and_refused_connections(engine):
+    server = start_server(engine, ['chan'])
+    engine.connect('oauth:token', 'bot', ['chan'], '127.0.0.1', server.port).result(5)
+    assert wait_for(lambda: 'chan' in server._members)
+    first = server._members['chan']
+
+    # RECONNECT - новое соединение сразу и снова JOIN
+    engine.call_soon(server._send_reconnect)
+    assert wait_for(lambda: engine.reconnects == 1 and server._members.get('chan') not in (None, first))
+    assert server.connections == 2
+
+    # Обрыв и два отклоненных подключения: повторы, пока сервер не примет
+    server.refuse = 2
+    engine.call_soon(server._kill)
+    assert wait_for(lambda: server.connections == 3 and 'chan' in server._members)
+    # Отклоненное подключение - либо ошибка открытия, либо сразу закрытое соединение
+    assert 2 <= engine.reconnects <= 4
+    assert engine.test_states.count('reconnecting') == 4
+    assert engine.test_states[-1] == 'connected'
+    assert engine.active and engine.connected
+
+
+def lines_of(server, number):
+    return [line for n, line in list(server.received) if n == number]
+
+
+def connection_of(server, line):
+    """Номер подключения, которое прислало строку (последнее, если их несколько)"""
+    numbers = [n for n, received in list(server.received) if received == line]
+    return numbers[-1] if numbers else None
+
+
+def test_pool_moves_channels_and_returns_them(engine):
+    engine.reconnect_base_delay = 0.2
+    server = start_server(engine, ['a', 'b', 'c', 'd'], record=True)
+    engine.connect('oauth:token', 'bot', ['a', 'b', 'c', 'd'], '127.0.0.1', server.port,
+                   connections=2, shard_policy='balanced').result(5)
+    assert wait_for(lambda: len(server._members) == 4)
+    first, second = connection_of(server, 'JOIN #a'), connection_of(server, 'JOIN #b')
+    assert first != second
+    assert connection_of(server, 'JOIN #c') == first and connection_of(server, 'JOIN #d') == second
+
+    # Строка канала уходит в соединение, которому он принадлежит
+    engine.send_privmsg('a', 'to a')
+    engine.send_privmsg('b', 'to b')
+    assert wait_for(lambda: connection_of(server, 'PRIVMSG #b :to b') == second)
+    assert connection_of(server, 'PRIVMSG #a :to a') == first
+
+    # Второе соединение обрывается, и следующие три подключения сервер отклоняет
+    async def kill():
+        server._refusing = 3
+        server._members['b'].transport.abort()
+
+    engine.submit(kill()).result(5)
+    assert wait_for(lambda: not engine.pool_stats()[1]['connected'])
+    engine.send_privmsg('d', 'queued')
+
+    # После трех неудач каналы переезжают на первое соединение, очередь уходит туда же
+    assert wait_for(lambda: 'JOIN #d' in lines_of(server, first))
+    assert wait_for(lambda: connection_of(server, 'PRIVMSG #d :queued') == first)
+    assert engine.pool_stats()[1]['failed']
+
+    # Восстановленное соединение через stable_after получает свои каналы обратно
+    assert wait_for(lambda: 'PART #d' in lines_of(server, first) and server.connections == 3)
+    third = connection_of(server, 'JOIN #d')
+    assert third == connection_of(server, 'JOIN #b') == 3
+    moves = [line for line in lines_of(server, first) if line.split()[0] in ('JOIN', 'PART')]
+    assert moves == ['JOIN #a', 'JOIN #c', 'JOIN #b', 'JOIN #d', 'PART #b', 'PART #d']
+    assert wait_for(lambda: len(server._members) == 4 and server._members['b'] is server._members['d'])
+    stats = engine.pool_stats()
+    assert [s['channels'] for s in stats] == [2, 2] and not stats[1]['failed']
+
+    engine.send_privmsg('b', 'back home')
+    assert wait_for(lambda: connection_of(server, 'PRIVMSG #b :back home') == third)
+
+
+def test_timer_runs_in_engine_thread_until_cancelled(engine):
+    calls = []
+
+    def tick():
+        calls.append(engine.in_engine_thread())
+        if len(calls) == 2:
+            raise RuntimeError("ошибка в таймере")
+
+    timer = engine.every(0.01, tick)
+    # Ошибка в обработчике не останавливает таймер
+    assert wait_for(lambda: len(calls) >= 4)
+    timer.cancel()
+    time.sleep(0.05)
+    count = len(calls)
+    time.sleep(0.05)
+    assert len(calls) == count
+    assert all(calls)
+
+
+def test_lines_reach_on_line_and_ping_is_answered(engine):
+    received = []
+    engine.on_line = lambda line: received.append((line, engine.in_engine_thread()))
+    server = start_server(engine, ['chan'], record=True)
+    server.lines = [':viewer!viewer@viewer.tmi.twitch.tv PRIVMSG #chan :привет']
+    server.rate = 6000
+    server.probe_every = 0
+    engine.connect('oauth:token', 'bot', ['chan'], '127.0.0.1', server.port).result(5)
+
+    engine.submit(server.replay(0.1)).result(5)
+    assert wait_for(lambda: len([line for line, _ in received if 'PRIVMSG' in line]) == 10)
+    assert all(in_thread for _, in_thread in received)
+    assert lines_of(server, 1)[:3] == ['PASS oauth:token', 'NICK bot', 'JOIN #chan']
+
+    # PING сервера получает PONG сразу и не доходит до обработчика строк
+    async def ping():
+        server._members['chan'].write(b"PING :tmi.twitch.tv\r\n")
+
+    engine.submit(ping()).result(5)
+    assert wait_for(lambda: 'PONG :tmi.twitch.tv' in lines_of(server, 1))
+    assert not any(line.startswith('PING') for line, _ in received)
+
+
+def test_tls_connection_with_self_signed_cert(engine, tmp_path):
+    if not shutil.which('openssl'):
+        pytest.skip("нет утилиты openssl")
+    cert, key = _self_signed_cert(str(tmp_path))
+    server_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    server_context.load_cert_chain(cert, key)
+    server = start_server(engine, ['chan'], ssl_context=server_context, record=True)
+
+    # Без своего сертификата проверка не проходит
+    with pytest.raises(ssl.SSLError):
+        engine.connect('oauth:token', 'bot', ['chan'], '127.0.0.1', server.port,
+                       ssl_context=create_ssl_context()).result(5)
+    engine.disconnect().result(5)
+
+    engine.connect('oauth:token', 'bot', ['chan'], '127.0.0.1', server.port,
+                   ssl_context=create_ssl_context(cert)).result(5)
+    assert wait_for(lambda: 'chan' in server._members)
+    engine.send_privmsg('chan', 'по TLS')
+    assert wait_for(lambda: (server.connections, 'PRIVMSG #chan :по TLS') in server.received)
+    assert lines_of(server, 1)[:2] == ['PASS oauth:token', 'NICK bot']
+
+
+def test_standby_connection_takes_over_on_reconnect(engine):
+    server = start_server(engine, ['chan'], record=True)
+    engine.connect('oauth:token', 'bot', ['chan'], '127.0.0.1', server.port, standby=True).result(5)
+    # Резервное соединение авторизовано, но не входит в каналы
+    assert wait_for(lambda: lines_of(server, 2)[:2] == ['PASS oauth:token', 'NICK bot'])
+    assert connection_of(server, 'JOIN #chan') == 1
+
+    engine.call_soon(server._send_reconnect)
+    assert wait_for(lambda: engine.takeovers == 1 and connection_of(server, 'JOIN #chan') == 2)
+    assert lines_of(server, 2)[2:] == ['JOIN #chan']
+    assert 'reconnecting' not in engine.test_states
+    # Вместо подхваченного открывается новое резервное соединение
+    assert wait_for(lambda: lines_of(server, 3)[:2] == ['PASS oauth:token', 'NICK bot'])
+    engine.send_privmsg('chan', 'после подхвата')
+    assert wait_for(lambda: connection_of(server, 'PRIVMSG #chan :после подхвата') == 2)
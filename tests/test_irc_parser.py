@@ -0,0 +1,69 @@
+import pytest
+
+from irc_parser import IrcMessage, escape_tag_value, parse_message, unescape_tag_value
+
+
+def test_tag_unescaping():
+    msg = parse_message(r"@display-name=a\sb;reason=x\:y;path=c:\\d;end=tail\ :tmi PRIVMSG #chan :hi")
+    assert msg.tag('display-name') == 'a b'
+    assert msg.tag('reason') == 'x;y'
+    assert msg.tag('path') == 'c:\\d'
+    # Одиночная обратная косая черта в конце отбрасывается
+    assert msg.tag('end') == 'tail'
+    assert unescape_tag_value(r'\q\r\n') == 'q\r\n'
+
+
+def test_tag_escaping_round_trip():
+    value = 'a b;c\\d\r\n'
+    assert unescape_tag_value(escape_tag_value(value)) == value
+    message = IrcMessage('PRIVMSG', ['#chan', 'hi there'], 'nick!nick@host', tags={'reason': value, 'flag': ''})
+    parsed = parse_message(message.format())
+    assert parsed.tags == {'reason': value, 'flag': ''}
+    assert parsed.params == ['#chan', 'hi there']
+
+
+def test_tags_and_source():
+    msg = parse_message("@id=1;mod=1 :viewer!viewer@viewer.tmi.twitch.tv privmsg #Chan :!sens now")
+    assert msg.command == 'PRIVMSG'
+    assert msg.nick == 'viewer'
+    assert msg.channel == 'Chan'
+    assert msg.text == '!sens now'
+    assert msg.tags == {'id': '1', 'mod': '1'}
+
+
+def test_missing_prefix():
+    msg = parse_message("PING :tmi.twitch.tv")
+    assert msg.source is None and msg.nick == ''
+    assert msg.command == 'PING' and msg.params == ['tmi.twitch.tv']
+    assert msg.tag('id') is None and msg.tags == {}
+
+
+def test_empty_trailing_param():
+    msg = parse_message(":nick!nick@host PRIVMSG #chan :")
+    assert msg.params == ['#chan', '']
+    assert msg.text == ''
+    assert msg.format() == ':nick!nick@host PRIVMSG #chan :'
+
+
+def test_trailing_keeps_colons_and_spaces():
+    msg = parse_message(":nick!nick@host PRIVMSG #chan :a :b  c ")
+    assert msg.params == ['#chan', 'a :b  c ']
+
+
+def test_crlf_is_stripped():
+    assert parse_message("PING :tmi.twitch.tv\r\n").params == ['tmi.twitch.tv']
+    assert parse_message(":tmi.twitch.tv 001 bot :Welcome\n").params == ['bot', 'Welcome']
+
+
+@pytest.mark.parametrize('line', [
+    '',
+    '\r\n',
+    '@id=1',
+    ':source',
+    ':source ',
+    '@id=1 :source',
+    ':source :text',
+])
+def test_malformed_lines_raise(line):
+    with pytest.raises(ValueError):
+        parse_message(line)
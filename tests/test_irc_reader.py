@@ -0,0 +1,20 @@
+from irc_reader import LineDecoder
+
+
+def test_lines_split_across_chunks():
+    decoder = LineDecoder()
+    data = 'PING :a\r\nPRIVMSG #chan :привет\r\n\r\nPING :b'.encode('utf-8')
+    # Разрез посреди многобайтового символа
+    cut = data.index('и'.encode('utf-8')) + 1
+    assert decoder.feed(data[:cut]) == ['PING :a']
+    assert decoder.pending() > 0
+    assert decoder.feed(data[cut:]) == ['PRIVMSG #chan :привет']
+    assert decoder.feed(b'\n') == ['PING :b']
+    assert decoder.pending() == 0
+
+
+def test_overlong_line_is_dropped():
+    decoder = LineDecoder()
+    assert decoder.feed(b'x' * (LineDecoder.MAX_LINE_LENGTH + 1)) == []
+    assert decoder.pending() == 0
+    assert decoder.feed(b'PING :a\n') == ['PING :a']
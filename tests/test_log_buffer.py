@@ -0,0 +1,29 @@
+from log_buffer import LogBuffer, parse_level, DEBUG, INFO
+
+
+def test_ring_buffer_drops_oldest():
+    buffer = LogBuffer(2)
+    for message in 'abc':
+        buffer.append(message)
+    assert [line.split('] ', 1)[1] for line in buffer.drain()] == ['b\n', 'c\n']
+    assert buffer.dropped == 1
+    assert buffer.drain() == []
+
+
+def test_resize_keeps_newest_lines():
+    buffer = LogBuffer(5)
+    for message in 'abcd':
+        buffer.append(message)
+    buffer.resize(2)
+    assert buffer.dropped == 2
+    assert [line[-2] for line in buffer.drain()] == ['c', 'd']
+    buffer.resize(10)
+    for message in 'abcdef':
+        buffer.append(message)
+    assert len(buffer.drain()) == 6 and buffer.dropped == 2
+
+
+def test_parse_level():
+    assert parse_level('DEBUG') == DEBUG
+    assert parse_level(INFO) == INFO
+    assert parse_level('nonsense', INFO) == INFO
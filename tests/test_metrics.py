@@ -0,0 +1,71 @@
+import asyncio
+import urllib.error
+import urllib.request
+
+from metrics import Metrics, MetricsServer
+
+
+def sample_metrics():
+    metrics = Metrics()
+    metrics.counter('lines_total', "Принятые строки").inc(3)
+    metrics.gauge('queue_depth', "Строк в очереди", lambda: 7)
+    latency = metrics.histogram('latency_seconds', "Задержка", buckets=(0.01, 0.1, 1.0))
+    for value in (0.005, 0.05, 0.05, 0.5, 5.0):
+        latency.observe(value)
+    return metrics
+
+
+def test_render_prometheus_text():
+    text = sample_metrics().render()
+    assert text.endswith('\n')
+    lines = text.splitlines()
+    assert lines[:3] == ['# HELP chatbot_lines_total Принятые строки', '# TYPE chatbot_lines_total counter',
+                         'chatbot_lines_total 3']
+    assert 'chatbot_queue_depth 7' in lines
+    # Корзины накопительные, +Inf равна числу наблюдений
+    assert [line for line in lines if line.startswith('chatbot_latency_seconds')] == [
+        'chatbot_latency_seconds_bucket{le="0.01"} 1',
+        'chatbot_latency_seconds_bucket{le="0.1"} 3',
+        'chatbot_latency_seconds_bucket{le="1.0"} 4',
+        'chatbot_latency_seconds_bucket{le="+Inf"} 5',
+        'chatbot_latency_seconds_sum 5.605',
+        'chatbot_latency_seconds_count 5',
+    ]
+
+
+def test_snapshot_and_quantiles():
+    metrics = sample_metrics()
+    snapshot = metrics.snapshot()
+    assert snapshot['lines_total'] == 3 and snapshot['queue_depth'] == 7
+    assert snapshot['latency_seconds'] == {'count': 5, 'sum': 5.605, 'p50': 0.1, 'p99': float('inf')}
+    assert metrics['latency_seconds'].quantile(0.2) == 0.01
+    assert Metrics().histogram('empty', '').quantile(0.5) == 0.0
+
+
+def test_metrics_server_serves_metrics():
+    metrics = sample_metrics()
+
+    async def scenario():
+        server = MetricsServer(metrics, port=0)
+        await server.start()
+        loop = asyncio.get_running_loop()
+        try:
+            def get(path):
+                try:
+                    with urllib.request.urlopen(f'http://127.0.0.1:{server.port}{path}', timeout=5) as response:
+                        return response.status, response.read().decode('utf-8')
+                except urllib.error.HTTPError as e:
+                    return e.code, e.read().decode('utf-8')
+
+            ok = await loop.run_in_executor(None, get, '/metrics')
+            metrics['lines_total'].inc()
+            again = await loop.run_in_executor(None, get, '/metrics?x=1')
+            missing = await loop.run_in_executor(None, get, '/other')
+        finally:
+            await server.stop()
+        return ok, again, missing
+
+    ok, again, missing = asyncio.run(scenario())
+    assert ok == (200, metrics.render().replace('chatbot_lines_total 4', 'chatbot_lines_total 3'))
+    assert 'chatbot_lines_total 4' in again[1]
+    assert missing == (404, 'not found\n')
@@ -0,0 +1,95 @@
+import asyncio
+
+from irc_parser import parse_message
+from mock_irc import MockIrcServer, PROBE_COMMAND, PROBE_REPLY, percentile
+
+
+class Client:
+    """Простейший клиент IRC вместо бота"""
+
+    async def connect(self, server, channels):
+        self.reader, self.writer = await asyncio.open_connection(server.host, server.port)
+        self.send('CAP REQ :twitch.tv/tags', 'PASS oauth:token', 'NICK bot',
+                  f"JOIN {','.join('#' + channel for channel in channels)}")
+        return [await self.readline() for _ in range(2 + len(channels))]
+
+    def send(self, *lines):
+        self.writer.write(''.join(f'{line}\r\n' for line in lines).encode('utf-8'))
+
+    async def readline(self):
+        return (await asyncio.wait_for(self.reader.readline(), 5)).decode('utf-8').rstrip('\r\n')
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 0.5) == 50
+    assert percentile(values, 0.99) == 99
+    assert percentile([7], 0.9) == 7
+    assert percentile([], 0.5) == 0.0
+
+
+def test_handshake_and_replay_with_probes():
+    lines = [':viewer!viewer@viewer.tmi.twitch.tv PRIVMSG #a :Kappa привет',
+             ':other!other@other.tmi.twitch.tv PRIVMSG #a :!sens']
+    server = MockIrcServer(lines, 6000, ['a', 'b', 'c'], probe_every=4, record=True)
+
+    async def scenario():
+        await server.start()
+        client = Client()
+        greeting = await client.connect(server, ['a', 'b'])
+        # Канал c бот не занял - строки для него теряются
+        server.joined.set()
+        replay = asyncio.create_task(server.replay(0.12))
+        received = []
+        while len(received) < 8:
+            line = await client.readline()
+            received.append(line)
+            msg = parse_message(line)
+            word, _, seq = msg.text.partition(' ')
+            if word == f'!{PROBE_COMMAND}':
+                client.send(f"PRIVMSG #{msg.channel} :{PROBE_REPLY} {seq}")
+        await replay
+        lost = await server.wait_replies(5)
+        client.send('PART #a')
+        await asyncio.sleep(0.05)
+        members = sorted(server._members)
+        client.writer.close()
+        await server.stop()
+        return greeting, received, lost, members
+
+    greeting, received, lost, members = asyncio.run(scenario())
+    assert greeting == [':tmi.twitch.tv CAP * ACK :twitch.tv/tags', ':tmi.twitch.tv 001 bot :Welcome, GLHF!',
+                        ':bot!bot@bot.tmi.twitch.tv JOIN #a', ':bot!bot@bot.tmi.twitch.tv JOIN #b']
+    assert server.received[:2] == [(1, 'CAP REQ :twitch.tv/tags'), (1, 'PASS oauth:token')]
+
+    # 12 строк по кругу в каналы a, b, c; каждая четвертая - проба
+    assert received[:2] == [lines[0], lines[1].replace(' #a ', ' #b ')]
+    assert received[2].startswith('@display-name=probe;') and received[2].endswith(' PRIVMSG #a :!ping 0')
+    assert len(received) == 8
+    results = server.results()
+    assert results['sent'] == 8 and results['missed'] == 4
+    assert results['probes'] == results['replies'] == 2 and lost == 0
+    assert 0 < results['p50'] <= results['max']
+    assert results['connections'] == results['max_clients'] == 1
+    assert members == ['b']
+
+
+def test_refused_connections_are_closed():
+    server = MockIrcServer([], 60, 'chan')
+
+    async def scenario():
+        await server.start()
+        server._refusing = 1
+        reader, writer = await asyncio.open_connection(server.host, server.port)
+        closed = await asyncio.wait_for(reader.read(), 5)
+        writer.close()
+        client = Client()
+        greeting = await client.connect(server, ['chan'])
+        client.writer.close()
+        await server.stop()
+        return closed, greeting
+
+    closed, greeting = asyncio.run(scenario())
+    assert closed == b''
+    assert greeting[-1] == ':bot!bot@bot.tmi.twitch.tv JOIN #chan'
+    assert server.connections == 1
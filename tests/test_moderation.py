@@ -0,0 +1,45 @@
+from chat_handler import MODERATE, moderation_action
+from irc_parser import parse_message
+from moderation import AhoCorasick, Moderator, Verdict, chat_command
+
+
+def privmsg(text, nick='viewer', channel='chan', tags='id=m1;user-id=42;room-id=7'):
+    prefix = f"@{tags} " if tags else ''
+    return parse_message(f"{prefix}:{nick}!{nick}@{nick}.tmi.twitch.tv PRIVMSG #{channel} :{text}")
+
+
+def test_aho_corasick_finds_overlapping_patterns():
+    matcher = AhoCorasick(['he', 'she', 'his', 'hers', ''])
+    assert len(matcher) == 4
+    found = sorted((start, end, matcher.patterns[index]) for start, end, index in matcher.search('ushers'))
+    assert found == [(1, 4, 'she'), (2, 4, 'he'), (2, 6, 'hers')]
+
+
+def test_aho_corasick_casefolds_patterns():
+    matcher = AhoCorasick(['СПАМ'])
+    assert [end for _, end, _ in matcher.search('купи спам')] == [9]
+    assert list(matcher.search('чистый текст')) == []
+
+
+def test_broadcaster_is_exempt_without_tags():
+    moderator = Moderator({'enabled': True, 'banned_phrases': {'list': ['спам']}})
+    assert moderator.check(privmsg('спам', nick='chan', tags=''), 'chan', 'спам') is None
+    assert moderator.check(privmsg('спам', tags=''), 'chan', 'спам') is not None
+
+
+def test_moderation_action_uses_tags():
+    msg = privmsg('спам')
+    assert moderation_action(msg, Verdict('phrase', 'delete', 600, 'фраза')) == \
+        (MODERATE, 'delete', 'viewer', '42', '7', 'm1', None, 'фраза')
+    assert moderation_action(msg, Verdict('caps', 'timeout', 60, 'капс')) == \
+        (MODERATE, 'timeout', 'viewer', '42', '7', 'm1', 60, 'капс')
+    assert moderation_action(msg, Verdict('link', 'ban', 600, 'ссылка'))[1:3] == ('ban', 'viewer')
+    # Без id сообщения удалить нечего - таймаут на секунду
+    assert moderation_action(privmsg('спам', tags=''), Verdict('phrase', 'delete', 600, 'фраза'))[1:7] == \
+        ('timeout', 'viewer', None, None, None, 1)
+
+
+def test_chat_command():
+    assert chat_command('delete', 'viewer', 'm1', None, 'фраза') == '/delete m1'
+    assert chat_command('timeout', 'viewer', 'm1', 60, 'капс') == '/timeout viewer 60 капс'
+    assert chat_command('ban', 'viewer', None, None, 'ссылка') == '/ban viewer ссылка'
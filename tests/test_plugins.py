@@ -0,0 +1,125 @@
+import sys
+import threading
+import time
+
+import pytest
+
+from irc_engine import IrcEngine
+from log_buffer import ERROR, WARNING
+from plugins import PluginContext, PluginManager
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.fixture
+def engine():
+    engine = IrcEngine()
+    engine.start()
+    yield engine
+    engine.stop()
+
+
+@pytest.fixture
+def manager(engine):
+    sent = []
+    logs = []
+    manager = PluginManager(engine, lambda channel, lines, received_at: sent.append((channel, lines)),
+                            on_log=lambda message, level: logs.append((level, message)))
+    manager.sent = sent
+    manager.logs = logs
+    yield manager
+    manager.stop()
+
+
+def run(manager, command, *args, channel='chan'):
+    context = PluginContext(manager, channel, 'viewer', command=command, args=args)
+    manager.engine.call_soon(manager.run_command, command, context)
+
+
+def test_string_target_imported_on_first_call(manager, tmp_path, monkeypatch):
+    (tmp_path / 'lazy_dice_plugin.py').write_text(
+        "def roll(context):\n    return 'выпало ' + context.args[0]\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, 'lazy_dice_plugin', raising=False)
+
+    handler = manager.add('command', 'roll', 'lazy_dice_plugin:roll')
+    assert handler.plugin == 'lazy_dice_plugin'
+    assert not handler.loaded
+    assert 'lazy_dice_plugin' not in sys.modules
+
+    run(manager, 'roll', '6')
+    assert wait_for(lambda: manager.sent)
+    assert manager.sent == [('chan', ['выпало 6'])]
+    assert handler.loaded and 'lazy_dice_plugin' in sys.modules
+    monkeypatch.delitem(sys.modules, 'lazy_dice_plugin')
+
+
+def test_call_over_budget_counts_as_timeout(manager):
+    release = threading.Event()
+    handler = manager.command('slow', lambda context: release.wait(5) and 'поздно', budget=0.05)
+
+    run(manager, 'slow')
+    assert wait_for(lambda: handler.timeouts == 1)
+    release.set()
+    # Ответ после таймаута не отправляется
+    assert wait_for(lambda: manager._threads[handler.plugin].pending == 0)
+    assert manager.sent == []
+    assert any(level == WARNING and 'бюджет' in message for level, message in manager.logs)
+
+
+def test_busy_plugin_skips_calls_over_queue_limit(manager):
+    manager.queue_limit = 2
+    release = threading.Event()
+    handler = manager.command('busy', lambda context: release.wait(5) and 'готово', budget=5)
+
+    for _ in range(4):
+        run(manager, 'busy')
+    assert wait_for(lambda: handler.skipped == 2)
+    release.set()
+    assert wait_for(lambda: len(manager.sent) == 2)
+    assert handler.calls == 2
+    assert manager._threads[handler.plugin].pending == 0
+
+
+def test_failing_handler_disabled_after_max_failures(manager):
+    manager.max_failures = 2
+
+    def broken(context):
+        raise RuntimeError('сломан')
+
+    handler = manager.command('broken', broken)
+    for errors in (1, 2):
+        run(manager, 'broken')
+        assert wait_for(lambda: handler.errors == errors)
+    assert wait_for(lambda: handler.disabled_until > time.monotonic() + manager.disable_for - 5)
+    assert any(level == ERROR and 'отключен' in message for level, message in manager.logs)
+
+    run(manager, 'broken')
+    assert wait_for(lambda: handler.skipped == 1)
+    assert handler.calls == 2
+
+
+def test_hung_plugin_does_not_block_engine_or_other_plugins(manager, engine):
+    release = threading.Event()
+    hung = manager.add('command', 'hang', lambda context: release.wait(10), plugin='hung', budget=0.05)
+    manager.add('command', 'ping', lambda context: 'pong', plugin='fast')
+
+    run(manager, 'hang')
+    assert wait_for(lambda: hung.timeouts == 1)
+    run(manager, 'ping')
+    assert wait_for(lambda: manager.sent == [('chan', ['pong'])])
+    # Цикл движка свободен, хотя поток плагина "hung" все еще занят
+    assert engine.submit(_echo(1)).result(1) == 1
+    assert not release.is_set()
+    release.set()
+
+
+async def _echo(value):
+    return value
@@ -0,0 +1,110 @@
+import bisect
+import time
+
+import rate_limit
+from rate_limit import ACCOUNT_TIERS, OutboundQueue, PRIORITY_REPLY, PRIORITY_SYSTEM, SlidingWindow
+
+
+def max_in_window(times, period):
+    """Наибольшее число событий в любом окне длиной period секунд"""
+    times = sorted(times)
+    return max((bisect.bisect_left(times, t + period) - i for i, t in enumerate(times)), default=0)
+
+
+def test_sliding_window_never_exceeds_capacity():
+    window = SlidingWindow(20, 30)
+    now = 0.0
+    sent = []
+    while now < 300:
+        delay = window.delay(now)
+        if delay:
+            now += delay
+            continue
+        window.take(now)
+        sent.append(now)
+        now += 0.01
+    assert max_in_window(sent, 30) <= 20
+    # Лимит используется полностью, а не с запасом
+    assert len(sent) >= 20 * 10
+
+
+def test_sliding_window_delay_is_until_oldest_expires():
+    window = SlidingWindow(2, 10)
+    window.take(0.0)
+    window.take(4.0)
+    assert window.delay(5.0) == 5.0
+    assert window.delay(10.0) == 0.0
+
+
+def test_outbound_queue_respects_tier_limits(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(rate_limit.time, 'monotonic', lambda: clock[0])
+    for tier in ('normal', 'moderator'):
+        capacity, period = ACCOUNT_TIERS[tier]['messages']
+        queue = OutboundQueue(tier, max_size=1000, max_wait=3600)
+        for i in range(capacity * 4):
+            assert queue.put(f"PRIVMSG #chan :message {i}", PRIORITY_REPLY, 'chan')
+
+        sent = []
+        end = clock[0] + period * 3
+        while clock[0] < end:
+            line, _, delay = queue.pop_ready()
+            if line is not None:
+                sent.append(clock[0])
+            elif delay:
+                clock[0] += delay
+            else:
+                break
+        assert max_in_window(sent, period) <= capacity
+        assert len(sent) >= capacity * 3
+
+
+def test_join_limit():
+    window = SlidingWindow(*ACCOUNT_TIERS['normal']['joins'])
+    joins = []
+    now = 0.0
+    while len(joins) < 100:
+        delay = window.delay(now)
+        if delay:
+            now += delay
+        else:
+            window.take(now)
+            joins.append(now)
+    assert max_in_window(joins, 10) <= 20
+
+
+def test_put_skips_pending_duplicates():
+    queue = OutboundQueue()
+    assert queue.put('PRIVMSG #chan :hi', PRIORITY_REPLY, 'chan')
+    assert not queue.put('PRIVMSG #chan :hi', PRIORITY_REPLY, 'chan')
+    assert queue.put('PRIVMSG #other :hi', PRIORITY_REPLY, 'other')
+    # Служебные строки (PONG, JOIN) не отбрасываются как повторы
+    assert queue.put('PONG :tmi', PRIORITY_SYSTEM) and queue.put('PONG :tmi', PRIORITY_SYSTEM)
+    assert len(queue) == 4 and queue.dropped == 1
+
+
+def test_put_many_is_all_or_nothing():
+    queue = OutboundQueue(max_size=3)
+    assert queue.put('PRIVMSG #chan :a', PRIORITY_REPLY, 'chan')
+    assert not queue.put_many(['PRIVMSG #chan :b', 'PRIVMSG #chan :c', 'PRIVMSG #chan :d'], PRIORITY_REPLY, 'chan')
+    assert len(queue) == 1 and queue.dropped == 3
+    # Уже ждущие строки не добавляются повторно и не мешают остальным
+    assert queue.put_many(['PRIVMSG #chan :a', 'PRIVMSG #chan :b'], PRIORITY_REPLY, 'chan')
+    assert len(queue) == 2
+    assert not queue.put_many(['PRIVMSG #chan :a', 'PRIVMSG #chan :b'], PRIORITY_REPLY, 'chan')
+
+
+def test_requeue_last_restores_position_and_wait():
+    queue = OutboundQueue()
+    now = time.monotonic()
+    queue.put('PRIVMSG #chan :first', PRIORITY_REPLY, 'chan', queued_at=now - 2)
+    queue.put('PRIVMSG #chan :second', PRIORITY_REPLY, 'chan', queued_at=now - 1)
+    line, _, _ = queue.pop_ready()
+    assert line == 'PRIVMSG #chan :first' and queue.sent == 1
+    assert queue.requeue_last()
+    # Повторно вернуть ту же строку нельзя
+    assert not queue.requeue_last()
+    assert queue.sent == 0
+    assert [entry[2] for entry in sorted(queue._heap)] == [now - 2, now - 1]
+    assert not queue.put('PRIVMSG #chan :first', PRIORITY_REPLY, 'chan')
+    assert queue.pop_ready()[0] == 'PRIVMSG #chan :first'
@@ -0,0 +1,25 @@
+from metrics import Histogram
+from scheduler import Scheduler
+
+
+def test_pop_due_reports_lateness(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr('scheduler.time.monotonic', lambda: now[0])
+    lateness = Histogram('lateness', '')
+    scheduler = Scheduler(lambda key: None, lateness=lateness)
+    scheduler.schedule('a', 5)
+    scheduler.schedule('b', 1)
+    scheduler.schedule('c', 10)
+    # Перепланирование заменяет прежний срок
+    scheduler.schedule('b', 3)
+    assert scheduler.next_delay() == 3
+
+    now[0] = 105.5
+    assert scheduler.pop_due() == ['b', 'a']
+    assert lateness.count == 2
+    assert lateness.sum == 2.5 + 0.5
+
+    scheduler.cancel('c')
+    now[0] = 200.0
+    assert scheduler.pop_due() == [] and scheduler.next_delay() is None
+    assert len(scheduler) == 0
@@ -0,0 +1,92 @@
+import json
+
+from bot_core import BotCore
+from storage import SqliteDatabase, SqliteStore, WriteBehindStore
+
+
+def test_store_writes_only_changed_keys(tmp_path):
+    database = SqliteDatabase(str(tmp_path / 'bot.db'))
+    data = {'a': {'response': '1'}, 'b': {'response': '2'}, 'c': {'response': '3'}}
+    store = SqliteStore(database, 'commands', data, delay=60)
+    store.save()
+
+    data['b']['response'] = '22'
+    del data['c']
+    data['d'] = {'response': '4'}
+    for key in ('b', 'c', 'd'):
+        store.mark_dirty(key)
+    # Запись 'a' в обход хранилища: неизмененный ключ не перезаписывается
+    database.write('commands', {'a': {'response': 'извне'}}, ['a'])
+    store.close()
+    database.close()
+
+    database = SqliteDatabase(str(tmp_path / 'bot.db'))
+    loaded = database.load('commands')
+    assert loaded == {'a': {'response': 'извне'}, 'b': {'response': '22'}, 'd': {'response': '4'}}
+    # Обновленная запись остается на своем месте
+    assert list(loaded) == ['a', 'b', 'd']
+    database.close()
+
+
+def test_full_write_removes_missing_keys(tmp_path):
+    database = SqliteDatabase(str(tmp_path / 'bot.db'))
+    database.write('auto_messages', {'1': {'message': 'x'}, '2': {'message': 'y'}, '3': {'message': 'z'}})
+    database.write('auto_messages', {'3': {'message': 'z!'}, '1': {'message': 'x'}})
+    assert list(database.load('auto_messages').items()) == [('1', {'message': 'x'}), ('3', {'message': 'z!'})]
+    database.close()
+
+
+def test_migration_runs_once(tmp_path):
+    json_path = tmp_path / 'commands.json'
+    json_path.write_text(json.dumps({'sens': {'response': '800 dpi'}, 'hi': {'response': 'привет'}}))
+    database = SqliteDatabase(str(tmp_path / 'bot.db'))
+    assert database.migrate_json('commands', str(json_path)) == 2
+    assert list(database.load('commands')) == ['sens', 'hi']
+
+    # Таблицу очистили, JSON изменился - повторного переноса все равно нет
+    database.write('commands', {})
+    json_path.write_text(json.dumps({'new': {'response': '!'}}))
+    assert database.migrate_json('commands', str(json_path)) == 0
+    database.close()
+
+    database = SqliteDatabase(str(tmp_path / 'bot.db'))
+    assert database.migrate_json('commands', str(json_path)) == 0
+    assert database.load('commands') == {}
+    database.close()
+
+
+def _core(tmp_path, config):
+    (tmp_path / 'config.json').write_text(json.dumps(config))
+    (tmp_path / 'commands.json').write_text(json.dumps({'sens': {'response': '800 dpi', 'usage_count': 0}}))
+    core = BotCore(config_path=str(tmp_path / 'config.json'), commands_path=str(tmp_path / 'commands.json'),
+                   auto_messages_path=str(tmp_path / 'auto_messages.json'))
+    core.on_log = lambda message: None
+    return core
+
+
+def test_core_uses_sqlite_and_migrates(tmp_path):
+    core = _core(tmp_path, {'storage': 'sqlite'})
+    assert isinstance(core.commands_store, SqliteStore)
+    assert core.commands['sens']['response'] == '800 dpi'
+    core.commands['sens']['usage_count'] = 5
+    core.commands_store.mark_dirty('sens')
+    core.close_storage()
+
+    database = SqliteDatabase(str(tmp_path / 'chatbot.db'))
+    assert database.load('commands')['sens']['usage_count'] == 5
+    database.close()
+    # JSON-файл остается резервной копией и не меняется
+    assert json.loads((tmp_path / 'commands.json').read_text())['sens']['usage_count'] == 0
+
+
+def test_core_falls_back_to_json(tmp_path):
+    # Каталог вместо файла базы - SQLite его не откроет
+    (tmp_path / 'broken.db').mkdir()
+    core = _core(tmp_path, {'storage': 'sqlite', 'database': str(tmp_path / 'broken.db')})
+    assert core.database is None
+    assert type(core.commands_store) is WriteBehindStore
+    assert core.commands['sens']['response'] == '800 dpi'
+    core.commands['sens']['usage_count'] = 3
+    core.commands_store.mark_dirty('sens')
+    core.close_storage()
+    assert json.loads((tmp_path / 'commands.json').read_text())['sens']['usage_count'] == 3
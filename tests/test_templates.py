@@ -0,0 +1,36 @@
+import random
+
+from templates import compile_template, format_duration, RANDOM
+
+
+def test_static_template():
+    template = compile_template('800 dpi {unknown} {{user}}')
+    assert template.static == '800 dpi {unknown} {user}'
+    assert compile_template('').render({}) == ''
+
+
+def test_variables():
+    template = compile_template('{user}: #{COUNT} {args}{ uptime }')
+    assert template.static is None
+    assert template.render({'user': 'viewer', 'count': 3, 'args': 'a b', 'uptime': '5 с'}) == 'viewer: #3 a b5 с'
+    assert template.render({}) == ': # '
+
+
+def test_unclosed_and_unknown_placeholders():
+    assert compile_template('{user').static == '{user'
+    assert compile_template('{user:x} }').static == '{user:x} }'
+    assert compile_template('{{{user}}}').render({'user': 'v'}) == '{v}'
+
+
+def test_random_choice(monkeypatch):
+    template = compile_template('{random: a | b|c }!')
+    assert template.parts[0] == (RANDOM, ('a', 'b', 'c'))
+    monkeypatch.setattr(random, 'choice', lambda choices: choices[-1])
+    assert template.render({}) == 'c!'
+
+
+def test_format_duration():
+    assert format_duration(-5) == '0 с'
+    assert format_duration(59.9) == '59 с'
+    assert format_duration(61) == '1 мин 1 с'
+    assert format_duration(2 * 3600 + 5 * 60 + 7) == '2 ч 5 мин'
@@ -0,0 +1,110 @@
+from tree_view import KeyedTreeView
+
+
+class StubTree:
+    """Заглушка ttk.Treeview: строки, вызовы set() и отложенные after()"""
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.rows = {}
+        self.calls = []
+        self.pending = {}
+        self._next = 0
+
+    def __getitem__(self, option):
+        assert option == 'columns'
+        return self.columns
+
+    def after(self, ms, func):
+        self._next += 1
+        handle = f'after#{self._next}'
+        self.pending[handle] = func
+        return handle
+
+    def after_cancel(self, handle):
+        self.pending.pop(handle, None)
+
+    def run_pending(self):
+        for handle in list(self.pending):
+            self.pending.pop(handle)()
+
+    def insert(self, parent, index, values):
+        self._next += 1
+        iid = f'I{self._next}'
+        self.rows[iid] = dict(zip(self.columns, values))
+        self.calls.append(('insert', iid))
+        return iid
+
+    def set(self, iid, column, value):
+        self.rows[iid][column] = value
+        self.calls.append(('set', iid, column))
+
+    def delete(self, iid):
+        del self.rows[iid]
+        self.calls.append(('delete', iid))
+
+    def selection(self):
+        return ()
+
+
+def row(key, data):
+    return key, data['response'], data.get('usage_count', 0)
+
+
+def make_view(data):
+    tree = StubTree(('name', 'response', 'count'))
+    view = KeyedTreeView(tree, data, row)
+    view.repaint()
+    tree.calls = []
+    return tree, view
+
+
+def test_burst_of_updates_is_one_repaint():
+    data = {'sens': {'response': '800 dpi', 'usage_count': 0}}
+    tree, view = make_view(data)
+    iid = view._iids['sens']
+    repaints = view.repaints
+
+    for _ in range(100):
+        data['sens']['usage_count'] += 1
+        view.invalidate('sens')
+    assert len(tree.pending) == 1
+    tree.run_pending()
+    assert view.repaints == repaints + 1
+    # Меняется только ячейка счетчика
+    assert tree.calls == [('set', iid, 'count')]
+    assert tree.rows[iid] == {'name': 'sens', 'response': '800 dpi', 'count': 100}
+
+
+def test_unchanged_rows_are_not_touched():
+    data = {'a': {'response': '1'}, 'b': {'response': '2'}}
+    tree, view = make_view(data)
+    assert len(tree.rows) == 2
+
+    view.invalidate()
+    view.repaint()
+    assert tree.calls == []
+    assert not tree.pending
+
+
+def test_new_and_deleted_rows():
+    data = {'a': {'response': '1'}, 'b': {'response': '2'}}
+    tree, view = make_view(data)
+    iid_a, iid_b = view._iids['a'], view._iids['b']
+    assert view.key_for(iid_b) == 'b'
+
+    del data['a']
+    data['c'] = {'response': '3'}
+    view.invalidate('a')
+    view.invalidate('c')
+    tree.run_pending()
+    assert ('delete', iid_a) in tree.calls and len(tree.calls) == 2
+    assert set(tree.rows) == {iid_b, view._iids['c']}
+    assert view.key_for(iid_a) is None
+
+    # Полная перерисовка находит и удаленные в обход invalidate(key) строки
+    del data['b']
+    view.invalidate()
+    tree.run_pending()
+    assert list(tree.rows.values()) == [{'name': 'c', 'response': '3', 'count': 0}]
+    assert view.key_for(iid_b) is None
@@ -0,0 +1,58 @@
+import queue
+import threading
+
+from chat_handler import REPLY, COOLDOWN, MODERATE
+from workers import worker_main, LINE, CONFIG, COUNTS
+
+
+def line(text, channel='chan', nick='viewer'):
+    return f"@id=msg-{nick};display-name={nick} :{nick}!{nick}@{nick}.tmi.twitch.tv PRIVMSG #{channel} :{text}"
+
+
+class Worker:
+    """worker_main в потоке с обычными очередями вместо процесса"""
+
+    def __init__(self, commands, config):
+        self.inbox = queue.Queue()
+        self.results = queue.Queue()
+        self.thread = threading.Thread(target=worker_main, args=(0, commands, config, self.inbox, self.results))
+        self.thread.start()
+
+    def run(self, *items):
+        self.inbox.put(list(items))
+        _, output = self.results.get(timeout=5)
+        return [action[0] for _, _, _, actions in output for action in actions]
+
+    def stop(self):
+        self.inbox.put(None)
+        self.thread.join(5)
+
+
+def test_worker_applies_config_updates():
+    commands = {'sens': {'response': '800 dpi', 'usage_count': 0}}
+    worker = Worker(commands, {})
+    try:
+        assert worker.run((LINE, line('!sens'), 0.0), (LINE, line('!sens'), 0.0)) == [REPLY, REPLY]
+
+        config = {'global_cooldown': 30, 'command_prefixes': ['?'],
+                  'moderation': {'enabled': True, 'banned_phrases': {'list': ['спам']}}}
+        assert worker.run((CONFIG, config), (LINE, line('?sens'), 0.0), (LINE, line('?sens'), 0.0),
+                          (LINE, line('купи спам'), 0.0)) == [REPLY, COOLDOWN, MODERATE]
+    finally:
+        worker.stop()
+
+
+def test_core_counts_override_worker_estimate():
+    commands = {'sens': {'response': 'раз {count}', 'usage_count': 0}}
+    worker = Worker(commands, {})
+    try:
+        worker.inbox.put([(LINE, line('!sens'), 0.0), (LINE, line('!sens', nick='other'), 0.0)])
+        _, output = worker.results.get(timeout=5)
+        assert [actions[0][2] for _, _, _, actions in output] == [['раз 1'], ['раз 2']]
+
+        # Ядро приняло в очередь только один ответ - счетчик процесса уменьшается
+        worker.inbox.put([(COUNTS, {'sens': 1}), (LINE, line('!sens', nick='third'), 0.0)])
+        _, output = worker.results.get(timeout=5)
+        assert output[0][3][0][2] == ['раз 2']
+    finally:
+        worker.stop()
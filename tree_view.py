@@ -0,0 +1,91 @@
+class KeyedTreeView:
+    """Связка словаря данных и ttk.Treeview с обновлением по ключам
+
+    Каждая строка таблицы привязана к ключу словаря (имя команды, id
+    автосообщения). invalidate() только запоминает измененный ключ, а
+    перерисовка выполняется один раз за кадр: вставляются новые строки,
+    удаляются исчезнувшие и меняются только те ячейки, значение которых
+    действительно изменилось.
+    """
+
+    def __init__(self, tree, data, row_func, frame_ms=16):
+        self.tree = tree
+        self.data = data
+        self.row_func = row_func
+        self.frame_ms = frame_ms
+        self.columns = tuple(tree['columns'])
+
+        self._iids = {}
+        self._keys = {}
+        self._values = {}
+        self._dirty = set()
+        self._full = True
+        self._scheduled = None
+
+        # Счетчики для отладки: сколько перерисовок и измененных ячеек
+        self.repaints = 0
+        self.cells_updated = 0
+
+    def invalidate(self, key=None):
+        """Пометить строку (или всю таблицу, если key=None) для перерисовки"""
+        if key is None:
+            self._full = True
+        else:
+            self._dirty.add(key)
+        if self._scheduled is None:
+            self._scheduled = self.tree.after(self.frame_ms, self.repaint)
+
+    def key_for(self, iid):
+        """Ключ данных по идентификатору строки Treeview"""
+        return self._keys.get(iid)
+
+    def selected_key(self):
+        """Ключ выделенной строки или None"""
+        selected = self.tree.selection()
+        return self._keys.get(selected[0]) if selected else None
+
+    def repaint(self):
+        """Применение накопленных изменений к таблице"""
+        if self._scheduled is not None:
+            self.tree.after_cancel(self._scheduled)
+            self._scheduled = None
+
+        if self._full:
+            # Порядок словаря сохраняется для новых строк
+            keys = list(self.data) + [key for key in self._iids if key not in self.data]
+        else:
+            keys = self._dirty
+        self._full = False
+        self._dirty = set()
+
+        for key in keys:
+            self._sync_row(key)
+        self.repaints += 1
+
+    def _sync_row(self, key):
+        data = self.data.get(key)
+        iid = self._iids.get(key)
+
+        if data is None:
+            if iid is not None:
+                self.tree.delete(iid)
+                del self._iids[key], self._keys[iid], self._values[key]
+            return
+
+        values = tuple(self.row_func(key, data))
+        if iid is None:
+            iid = self.tree.insert('', 'end', values=values)
+            self._iids[key] = iid
+            self._keys[iid] = key
+            self._values[key] = values
+            self.cells_updated += len(values)
+            return
+
+        old = self._values[key]
+        if values == old:
+            return
+        for column, value, old_value in zip(self.columns, values, old):
+            if value != old_value:
+                self.tree.set(iid, column, value)
+                self.cells_updated += 1
+        self._values[key] = values
@@ -0,0 +1,239 @@
+import multiprocessing
+import os
+import threading
+import zlib
+
+from chat_handler import ChatHandler, REPLY, LOG
+from irc_parser import parse_message
+from log_buffer import ERROR
+from moderation import Moderator
+
+
+# Сообщения в очереди обработчика
+LINE = 'line'            # (LINE, строка IRC, time.monotonic() получения)
+COMMAND = 'command'      # (COMMAND, имя, данные или None для удаленной)
+COMMANDS = 'commands'    # (COMMANDS, вся таблица команд)
+COUNTS = 'counts'        # (COUNTS, {имя: usage_count})
+SETTING = 'setting'      # (SETTING, имя атрибута ChatHandler, значение)
+CONFIG = 'config'        # (CONFIG, вся конфигурация после сохранения)
+
+
+def worker_count(value):
+    """Число процессов из конфигурации: число или "auto" (ядра минус одно)"""
+    if value == 'auto':
+        return max(1, (os.cpu_count() or 2) - 1)
+    return max(0, int(value or 0))
+
+
+def worker_main(index, commands, config, inbox, results, plugin_commands=None):
+    """Процесс-обработчик: разбор строк своих каналов, модерация и команды
+
+    Пачка строк из inbox превращается в одну пачку результатов
+    (канал, ник, received_at, действия) в results. None - выход.
+    """
+    errors = []
+    try:
+        moderator = Moderator(config.get('moderation'))
+    except Exception as e:
+        errors.append((LOG, ERROR, f"Ошибка загрузки настроек модерации в обработчике {index + 1}: {e}"))
+        moderator = Moderator()
+    chat = ChatHandler(commands, config, moderator, plugin_commands)
+    debug = False
+    if errors:
+        results.put((index, [(None, None, None, errors)]))
+
+    while True:
+        batch = inbox.get()
+        if batch is None:
+            break
+        output = []
+        for item in batch:
+            kind = item[0]
+            if kind == LINE:
+                try:
+                    msg = parse_message(item[1])
+                    channel = msg.channel
+                    if not channel or len(msg.params) < 2:
+                        continue
+                    actions = chat.evaluate(msg, channel, msg.text.strip(), debug)
+                except Exception as e:
+                    output.append((None, None, None, [(LOG, ERROR, f"❌ Ошибка в обработчике {index + 1}: {e}")]))
+                    continue
+                if actions:
+                    for action in actions:
+                        if action[0] == REPLY and action[1] in chat.commands:
+                            # Свой счетчик для {count} до следующего COUNTS; ядро считает
+                            # только ответы, принятые в очередь, и его значение главнее
+                            data = chat.commands[action[1]]
+                            data['usage_count'] = data.get('usage_count', 0) + 1
+                    output.append((channel, msg.nick, item[2], actions))
+            elif kind == COMMAND:
+                _, name, data = item
+                if data is None:
+                    chat.commands.pop(name, None)
+                else:
+                    chat.commands[name] = data
+                chat.command_changed(name)
+            elif kind == COMMANDS:
+                chat.commands.clear()
+                chat.commands.update(item[1])
+                chat.command_changed()
+            elif kind == COUNTS:
+                for name, count in item[1].items():
+                    data = chat.commands.get(name)
+                    if data is not None:
+                        data['usage_count'] = count
+            elif kind == CONFIG:
+                try:
+                    chat.apply_config(item[1])
+                except Exception as e:
+                    output.append((None, None, None, [
+                        (LOG, ERROR, f"Ошибка загрузки настроек модерации в обработчике {index + 1}: {e}")]))
+            elif kind == SETTING:
+                if item[1] == 'debug':
+                    debug = item[2]
+                elif item[1] == 'plugin_commands':
+                    chat.set_plugin_commands(item[2])
+                else:
+                    setattr(chat, item[1], item[2])
+        if output:
+            results.put((index, output))
+
+
+class WorkerPool:
+    """Обработка сообщений чата в нескольких процессах
+
+    Канал всегда попадает в один и тот же процесс (crc32 имени по модулю
+    числа процессов), поэтому порядок сообщений канала, кулдауны и индекс
+    повторов модерации остаются точными. Строки копятся в потоке движка и
+    уходят в очередь процесса одной пачкой за оборот цикла (или по
+    batch_size). Результаты читает отдельный поток и передает в цикл
+    движка через on_results(список результатов).
+
+    Команды плагинов (plugin_commands) процессы только распознают: вызов
+    плагина возвращается ядру действием PLUGIN.
+
+    Все методы, кроме broadcast(), вызываются из потока движка.
+    """
+
+    def __init__(self, count, commands, config, loop, on_results, on_error=None, batch_size=512,
+                 plugin_commands=None):
+        self.count = count
+        self.loop = loop
+        self.on_results = on_results
+        self.on_error = on_error
+        self.batch_size = batch_size
+
+        # spawn одинаково работает в Windows, macOS и Linux и не копирует потоки родителя
+        context = multiprocessing.get_context('spawn')
+        self._results = context.Queue()
+        self._inboxes = [context.Queue() for _ in range(count)]
+        self._processes = [
+            context.Process(target=worker_main,
+                            args=(i, commands, config, inbox, self._results, plugin_commands),
+                            name=f'chat-worker-{i + 1}', daemon=True)
+            for i, inbox in enumerate(self._inboxes)]
+        self._pending = [[] for _ in range(count)]
+        self._counts = [{} for _ in range(count)]
+        self._alive = [True] * count
+        self._flush_scheduled = False
+        self._receiver = None
+
+        self.lines_dispatched = 0
+        self.batches_sent = 0
+        self.results_received = 0
+
+    @property
+    def alive(self):
+        return sum(self._alive)
+
+    def start(self):
+        for process in self._processes:
+            process.start()
+        self._receiver = threading.Thread(target=self._receive, name='chat-workers-results', daemon=True)
+        self._receiver.start()
+
+    def stop(self, timeout=5):
+        """Остановка процессов (необработанные строки в их очередях теряются)"""
+        for inbox in self._inboxes:
+            try:
+                inbox.put(None)
+            except Exception:
+                pass
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self._results.put(None)
+        if self._receiver:
+            self._receiver.join(timeout)
+            self._receiver = None
+
+    def shard(self, channel):
+        return zlib.crc32(channel.encode('utf-8')) % self.count
+
+    def dispatch(self, channel, line, received_at):
+        """Строка в очередь процесса канала; False - процесс упал, обработать на месте"""
+        shard = self.shard(channel)
+        if not self._alive[shard]:
+            return False
+        pending = self._pending[shard]
+        pending.append((LINE, line, received_at))
+        self.lines_dispatched += 1
+        if len(pending) >= self.batch_size:
+            self._send(shard)
+        elif not self._flush_scheduled:
+            self._flush_scheduled = True
+            self.loop.call_soon(self.flush)
+        return True
+
+    def broadcast(self, item):
+        """Сообщение всем процессам (из любого потока) - в порядке с уже принятыми строками"""
+        self.loop.call_soon_threadsafe(self._broadcast, item)
+
+    def _broadcast(self, item):
+        for shard, pending in enumerate(self._pending):
+            pending.append(item)
+            self._send(shard)
+
+    def count_changed(self, command, count):
+        """Новый счетчик использований команды уйдет процессам со следующей пачкой"""
+        for counts in self._counts:
+            counts[command] = count
+
+    def flush(self):
+        self._flush_scheduled = False
+        for shard, pending in enumerate(self._pending):
+            if pending:
+                self._send(shard)
+
+    def _send(self, shard):
+        batch = self._pending[shard]
+        if not batch:
+            return
+        self._pending[shard] = []
+        if not self._alive[shard] or self._processes[shard].exitcode is not None:
+            self._mark_dead(shard)
+            return
+        counts = self._counts[shard]
+        if counts:
+            batch.insert(0, (COUNTS, counts))
+            self._counts[shard] = {}
+        self._inboxes[shard].put(batch)
+        self.batches_sent += 1
+
+    def _mark_dead(self, shard):
+        if self._alive[shard]:
+            self._alive[shard] = False
+            if self.on_error:
+                self.on_error(f"процесс {self._processes[shard].name} завершился "
+                              f"(код {self._processes[shard].exitcode}), его каналы обрабатываются в основном")
+
+    def _receive(self):
+        while True:
+            item = self._results.get()
+            if item is None:
+                return
+            _, output = item
+            self.results_received += len(output)
+            self.loop.call_soon_threadsafe(self.on_results, output)